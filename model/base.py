@@ -1,4 +1,5 @@
 from validation.feat_importance import display_mdi_feat_importance
+from categorical import CategoricalFeatures
 from abc import ABC, abstractmethod
 from typing import Literal, Union
 import math
@@ -61,16 +62,22 @@ class ConfusionMatrix:
                 f"TN={self.true_negatives}, FN={self.false_negatives})")
 
 
-class BaseModel(ABC):
+class BaseModel(CategoricalFeatures, ABC):
     """
     Abstract class for a model. All models should inherit from this class.
 
     Args:
         X: Features
         y: Target values
-        undersample_method: Method for undersampling the dataset. Options are 'random' and 'nearmiss'.
+        categorical_features: Columns of X that are categories, e.g. the hour, weekday, node_id and population
+            columns of preprocess.encode_categorical instead of their dummies. X and its splits keep the values,
+            the model gets them as integer codes with the categories seen here, see model_input, and models that
+            set native_categoricals get them as pandas categoricals. test takes new data with the values as well.
+            See CategoricalFeatures.
     """
-    def __init__(self, X, y):
+
+    def __init__(self, X, y, categorical_features=None):
+        super().__init__(X, categorical_features)
         self.has_trained = False
         self.X = X
         self.X_pre_len = len(X)
@@ -95,6 +102,9 @@ class BaseModel(ABC):
 
     @abstractmethod
     def test(self, X) -> list[bool]:
+        """
+        Predictions for X, new data with the values of the categorical features, e.g. node_id 4144.
+        """
         pass
 
     @abstractmethod
@@ -111,7 +121,7 @@ class BaseModel(ABC):
     def default_stratified_grid_search(self, param_grid: dict[str, list], num_folds=5):
         stratified_cv = StratifiedKFold(n_splits=num_folds, shuffle=True, random_state=42)
         grid_search = GridSearchCV(estimator=self.model, param_grid=param_grid, cv=stratified_cv, scoring='f1')
-        grid_search.fit(self.X_train, self.y_train)
+        grid_search.fit(self.model_input(self.X_train), self.y_train)
 
         best_params = grid_search.best_params_
         print("Best Hyperparameters:", best_params)
@@ -187,6 +197,7 @@ class BaseModel(ABC):
         """
         assert cfm is not None
         return (cfm.true_positives + cfm.true_negatives) / (cfm.true_positives + cfm.true_negatives +
+                                                            cfm.false_positives + cfm.false_negatives)
 
     def _precision(self, cfm: ConfusionMatrix) -> float:
         """
@@ -243,7 +254,7 @@ class BaseModel(ABC):
 
         baseline = (self.y_test == True).sum() / len(self.y_test)
 
-        PrecisionRecallDisplay.from_estimator(estimator, self.X_test, self.y_test)
+        PrecisionRecallDisplay.from_estimator(estimator, self.model_input(self.X_test), self.y_test)
         plt.plot([0, 1], [baseline, baseline], linestyle='--', label='Baseline')
         if save is not None:
             plt.savefig(save)
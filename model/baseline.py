@@ -8,15 +8,15 @@ from models.ada_boost import ABClassifier
 from models.svc import SVClassifier
 from validation.feat_importance import display_mdi_feat_importance, display_perm_importance, calculate_SHAP
 from sklearn.inspection import permutation_importance
-import pandas as pd 
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "preprocessing"))
+import feature_cache
 
 
-df = pd.read_csv("./oslo_3_month_aggregated_proc.csv")
 # The first measurements will contain NaN for certain rtt metrics as there are no previous
-# measurements to calculate the from
-df = df.dropna()
-
-X = df.drop(columns=[
+# measurements to calculate the from, they are dropped. X and y are float32 from the feature cache.
+X, y = feature_cache.load_features("./oslo_3_month_aggregated_proc.csv", drop_columns=[
     'Unnamed: 0',
     'is_fault',
     'ts', 
@@ -72,7 +72,6 @@ X = df.drop(columns=[
     # 'weekday_Tuesday', 
     # 'weekday_Wednesday'
     ])
-y = df['is_fault']
 
 
 model = CatBoostClassifierModel(X, y)
@@ -0,0 +1,69 @@
+from base import ModelDriver
+from models.cat_boost import CatBoostClassifierModel
+from models.light_gbm import LGBMClassifierModel
+from models.xg_boost import XGBClassifierModel
+import argparse
+import pandas as pd
+
+# Compares one-hot encoded categories with the native categorical features of the gradient boosting models.
+# The dataset has to be processed with --categorical (see preprocessing/preprocess.encode_categorical), the
+# dummies are built from the integer codes here so both variants train on the same rows, e.g.
+#
+#   cd ../preprocessing && python pipeline.py combined --categorical && cd ../model
+#   python benchmark_categorical.py ../preprocessing/oslo_3_month_aggregated_proc.csv --models catboost,lightgbm
+
+MODELS = {
+    "catboost": CatBoostClassifierModel,
+    "lightgbm": LGBMClassifierModel,
+    "xgboost": XGBClassifierModel,
+}
+
+# See preprocess.CATEGORICAL_COLUMNS
+CATEGORICAL_COLUMNS = ["node_id", "population", "hour", "weekday"]
+
+
+def benchmark(model_class, X, y, categorical_features, samples=10_000, runs=10):
+    model = model_class(X, y, categorical_features=categorical_features)
+    driver = ModelDriver(model)
+    train_time = model.train(take_time=True)
+    _, _, _, _, _, f1_score, _, _ = model.validate()
+    _, compute_per_analysis, disk, ram = driver.std_benchmark(samples=min(samples, len(model.X_test)), runs=runs)
+    return {
+        "Columns": model.X_train.shape[1],
+        "X_train MB": model.model_input(model.X_train).memory_usage(deep=True).sum() / 1024 ** 2,
+        "Train Time": train_time,
+        "F1 Score": f1_score,
+        "Compute per Analysis": compute_per_analysis,
+        "Disk MB": disk / 1024 ** 2,
+        "RAM MB": ram / 1024 ** 2,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train time, Disk and RAM of dummies against native categoricals")
+    parser.add_argument("dataset", help="Processed csv with integer coded categorical columns")
+    parser.add_argument("--models", default=",".join(MODELS), help="Comma separated, default all")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.dataset)
+    # The first measurements will contain NaN for the rtt means
+    df = df.dropna()
+    X = df.drop(columns=['Unnamed: 0', 'is_fault', 'ts'], errors='ignore')
+    y = df['is_fault']
+    categorical_features = [column for column in CATEGORICAL_COLUMNS if column in X.columns]
+    X_dummies = pd.get_dummies(X, columns=categorical_features)
+
+    results = {}
+    for name in args.models.split(","):
+        print(f"Training {name}")
+        results[(name, "dummies")] = benchmark(MODELS[name], X_dummies, y, None)
+        results[(name, "native")] = benchmark(MODELS[name], X, y, categorical_features)
+
+    results = pd.DataFrame.from_dict(results, orient="index")
+    results.index.names = ["Model", "Features"]
+    print(results.to_string(float_format="{:.4g}".format))
+
+    # native / dummies of every model, below 1 is an improvement except for the F1 score
+    change = results.xs("native", level="Features") / results.xs("dummies", level="Features")
+    print("\nNative / dummies")
+    print(change.to_string(float_format="{:.3f}".format))
@@ -0,0 +1,50 @@
+import pandas as pd
+
+
+class CategoricalFeatures:
+    """
+    The categorical features of a model, see BaseModel. Only needs pandas, so the encoding can be used and tested
+    without the libraries of the models.
+
+    Args:
+        X: Features, the categories are the values of the categorical features seen here
+        categorical_features: Columns of X that are categories
+    """
+    # Whether the model is trained on pandas categoricals, see model_input
+    native_categoricals = False
+
+    def __init__(self, X, categorical_features=None):
+        self.categorical_features = list(categorical_features or [])
+        self.categories = {
+            column: pd.Index(X[column].dropna().unique()).sort_values() for column in self.categorical_features}
+
+    def encode_categorical(self, X):
+        """
+        Replaces the categorical features by their codes, the position of the value in the sorted values of the
+        features of the model. Values it has not seen become -1. Values are matched by number, so the float32
+        node ids of the feature cache get the codes of int node ids.
+        """
+        if not self.categorical_features:
+            return X
+        X = X.copy()
+        for column in self.categorical_features:
+            X[column] = pd.Categorical(X[column], categories=self.categories[column]).codes
+        return X
+
+    def categorical_frame(self, X):
+        """
+        The encoded X with pandas categoricals for the categorical features, -1 is missing.
+        """
+        X = X.copy()
+        for column in self.categorical_features:
+            X[column] = pd.Categorical.from_codes(X[column], categories=range(len(self.categories[column])))
+        return X
+
+    def model_input(self, X):
+        """
+        X in the form the model is trained on, with the categorical features encoded, see encode_categorical.
+        """
+        X = self.encode_categorical(X)
+        if self.native_categoricals and self.categorical_features:
+            return self.categorical_frame(X)
+        return X
@@ -1,5 +1,7 @@
-import pandas as pd
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "preprocessing"))
+import feature_cache
 from models.random_forest import RFClassifier
 from base import ModelDriver
 
@@ -11,16 +13,7 @@ for file_name in file_list:
     file_path = os.path.join(data_directory, file_name)
     print(f"Processing file: {file_path}")
 
-    df = pd.read_csv(file_path)
-
-    df = df.dropna()
-
-    X = df.drop(columns=[
-        'Unnamed: 0',
-        'is_fault',
-        'ts',
-    ])
-    y = df['is_fault']
+    X, y = feature_cache.load_features(file_path)
 
     model = RFClassifier(X, y)
     
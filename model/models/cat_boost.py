@@ -17,8 +17,9 @@ class CatBoostClassifierModel(BaseModel):
             subsample=0.8,
             objective='Logloss',
             random_state=None,
-            verbosity=0):
-        super().__init__(X, y)
+            verbosity=0,
+            categorical_features=None):
+        super().__init__(X, y, categorical_features)
         self.model = CatBoostClassifier(
             iterations=n_estimators,
             learning_rate=learning_rate,
@@ -28,13 +29,14 @@ class CatBoostClassifierModel(BaseModel):
             subsample=subsample,
             objective=objective,
             random_state=random_state,
-            verbose=verbosity)
+            verbose=verbosity,
+            cat_features=self.categorical_features or None)
 
     def train_impl(self):
-        self.model.fit(self.X_train, self.y_train)
+        self.model.fit(self.model_input(self.X_train), self.y_train)
 
     def test(self, X) -> list[bool]:
-        return self.model.predict(X).astype(bool)
+        return self.model.predict(self.model_input(X)).astype(bool)
 
     def grid_search(self):
         param_grid = {
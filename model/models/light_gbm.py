@@ -4,6 +4,8 @@ import pickle
 
 
 class LGBMClassifierModel(BaseModel, LGBMClassifier):
+    native_categoricals = True
+
     def __init__(
             self,
             X,
@@ -22,8 +24,9 @@ class LGBMClassifierModel(BaseModel, LGBMClassifier):
             objective='binary',
             n_jobs=-1,
             random_state=None,
-            verbosity=-1):
-        BaseModel.__init__(self, X, y)
+            verbosity=-1,
+            categorical_features=None):
+        BaseModel.__init__(self, X, y, categorical_features)
         self.model = LGBMClassifier(
             n_estimators=n_estimators,
             learning_rate=learning_rate,
@@ -41,10 +44,10 @@ class LGBMClassifierModel(BaseModel, LGBMClassifier):
             verbosity=verbosity)
     
     def train_impl(self):
-        self.model.fit(self.X_train, self.y_train)
+        self.model.fit(self.model_input(self.X_train), self.y_train)
 
     def test(self, X) -> list[bool]:
-        return self.model.predict(X).astype(bool)
+        return self.model.predict(self.model_input(X)).astype(bool)
 
     def grid_search(self):
         param_grid = {
@@ -5,6 +5,8 @@ import pickle
 
 
 class XGBClassifierModel(BaseModel, XGBClassifier):
+    native_categoricals = True
+
     def __init__(
             self,
             X,
@@ -22,8 +24,9 @@ class XGBClassifierModel(BaseModel, XGBClassifier):
             objective='binary:logistic',
             n_jobs=-1,
             random_state=None,
-            verbosity=0):
-        BaseModel.__init__(self, X, y)
+            verbosity=0,
+            categorical_features=None):
+        BaseModel.__init__(self, X, y, categorical_features)
         self.model = XGBClassifier(
             n_estimators=n_estimators,
             learning_rate=learning_rate,
@@ -37,13 +40,14 @@ class XGBClassifierModel(BaseModel, XGBClassifier):
             objective=objective,
             n_jobs=n_jobs,
             random_state=random_state,
-            verbosity=verbosity)
+            verbosity=verbosity,
+            enable_categorical=bool(self.categorical_features))
     
     def train_impl(self):
-        self.model.fit(self.X_train, self.y_train)
+        self.model.fit(self.model_input(self.X_train), self.y_train)
 
     def test(self, X) -> list[bool]:
-        return self.model.predict(X)
+        return self.model.predict(self.model_input(X))
 
     def grid_search(self):
         param_grid = {
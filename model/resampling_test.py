@@ -1,12 +1,12 @@
 from base import ModelDriver
 from models.random_forest import RFClassifier
-import pandas as pd
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "preprocessing"))
+import feature_cache
 
-df = pd.read_csv("./interval_data/4144_interval_1_3_months_aggregated_proc.csv")
-df = df.iloc[600:]
-
-X = df.drop(columns=['ts', 'is_fault', 'Unnamed: 0'])
-y = df['is_fault']
+X, y = feature_cache.load_features("./interval_data/4144_interval_1_3_months_aggregated_proc.csv",
+                                   dropna=False, start=600)
 
 resampling_methods = ['none', 'random', 'nearmiss', 'smote', 'adasyn', 
                       'borderline_smote', 'random_os']
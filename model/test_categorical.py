@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+for module in ['sklearn', 'imblearn', 'seaborn', 'psutil']:
+    pytest.importorskip(module)
+
+from base import ModelDriver
+
+MODELS = {
+    'catboost': ('models.cat_boost', 'CatBoostClassifierModel'),
+    'lightgbm': ('models.light_gbm', 'LGBMClassifierModel'),
+    'xgboost': ('models.xg_boost', 'XGBClassifierModel'),
+}
+
+
+@pytest.fixture
+def raw_data():
+    rng = np.random.default_rng(7)
+    n = 2000
+    X = pd.DataFrame({
+        'rtt': rng.uniform(10, 60, n),
+        'node_id': rng.choice([4120, 4144, 4147], n),
+        'hour': rng.integers(0, 24, n),
+    })
+    # Node 4144 is slower than the others
+    y = (X['rtt'] + 20 * (X['node_id'] == 4144)) > 50
+    return X, y
+
+
+@pytest.mark.parametrize('name', list(MODELS))
+def test_predicts_on_raw_values(raw_data, name):
+    module_name, class_name = MODELS[name]
+    pytest.importorskip(name)
+    model_class = getattr(__import__(module_name, fromlist=[class_name]), class_name)
+    X, y = raw_data
+    model = model_class(X, y, n_estimators=20, categorical_features=['node_id', 'hour'])
+
+    # The splits keep the node ids, only the model sees the codes
+    assert set(model.X_train['node_id']) == {4120, 4144, 4147}
+    predictions = np.asarray(ModelDriver(model).pred(X)).astype(bool)
+    assert len(predictions) == len(X)
+    assert (predictions == y).mean() > 0.9
+
+    # Node ids the model has not seen are coded as missing
+    assert len(model.test(X.assign(node_id=4999))) == len(X)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from categorical import CategoricalFeatures
+
+
+class Model(CategoricalFeatures):
+    # The encoding of BaseModel without the libraries of a model
+    pass
+
+
+class NativeModel(CategoricalFeatures):
+    native_categoricals = True
+
+
+@pytest.fixture
+def X():
+    return pd.DataFrame({
+        'rtt': [20.5, 31.0, 44.2, 18.9],
+        'node_id': [4147, 4120, 4144, 4120],
+        'hour': [23, 0, 5, 0],
+    })
+
+
+def test_codes_of_sorted_values(X):
+    model = Model(X, categorical_features=['node_id', 'hour'])
+    encoded = model.encode_categorical(X)
+    assert list(encoded['node_id']) == [2, 0, 1, 0]
+    assert list(encoded['hour']) == [2, 0, 1, 0]
+    # Other columns and X itself are unchanged
+    pd.testing.assert_series_equal(encoded['rtt'], X['rtt'])
+    assert list(X['node_id']) == [4147, 4120, 4144, 4120]
+
+
+def test_unseen_values_are_missing(X):
+    model = Model(X, categorical_features=['node_id', 'hour'])
+    encoded = model.encode_categorical(X.assign(node_id=[4999, 4120, np.nan, 4144], hour=[12, 0, 5, 23]))
+    assert list(encoded['node_id']) == [-1, 0, -1, 1]
+    assert list(encoded['hour']) == [-1, 0, 1, 2]
+
+
+def test_float_node_ids_of_the_feature_cache(X):
+    # The feature cache stores X as float32, the codes are the same as for the int node ids
+    cached = X.astype(np.float32)
+    model = Model(cached, categorical_features=['node_id', 'hour'])
+    pd.testing.assert_frame_equal(model.encode_categorical(X), Model(X, ['node_id', 'hour']).encode_categorical(X),
+                                  check_dtype=False)
+    assert list(model.encode_categorical(cached)['node_id']) == [2, 0, 1, 0]
+    assert list(Model(X, ['node_id']).encode_categorical(cached)['node_id']) == [2, 0, 1, 0]
+
+
+def test_categorical_frame(X):
+    model = NativeModel(X, categorical_features=['node_id'])
+    frame = model.categorical_frame(model.encode_categorical(X.assign(node_id=[4147, 4999, 4144, 4120])))
+    assert isinstance(frame['node_id'].dtype, pd.CategoricalDtype)
+    assert list(frame['node_id'].cat.categories) == [0, 1, 2]
+    assert frame['node_id'].isna().tolist() == [False, True, False, False]
+    assert list(frame['node_id'].cat.codes) == [2, -1, 1, 0]
+
+
+def test_model_input(X):
+    # Codes for the models that take numbers, categoricals for the ones that take categories
+    assert list(Model(X, ['node_id']).model_input(X)['node_id']) == [2, 0, 1, 0]
+    native = NativeModel(X, ['node_id']).model_input(X)
+    assert isinstance(native['node_id'].dtype, pd.CategoricalDtype)
+    assert list(native['node_id'].cat.codes) == [2, 0, 1, 0]
+    # Without categorical features X is used as it is
+    assert Model(X).model_input(X) is X
+    assert NativeModel(X).model_input(X) is X
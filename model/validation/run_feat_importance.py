@@ -6,12 +6,12 @@ from sklearn.model_selection import train_test_split, StratifiedShuffleSplit
 import feat_importance as fi
 import time
 import threading
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "preprocessing"))
+import feature_cache
 
-df = pd.read_csv("../../interval_data/4144_interval_1_3_months_aggregated_proc.csv")
-df = df.dropna()
-
-X = df.drop(columns=['Unnamed: 0', 'is_fault', 'ts'])
-y = df['is_fault']
+X, y = feature_cache.load_features("../../interval_data/4144_interval_1_3_months_aggregated_proc.csv")
 
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=420)
 
@@ -1,6 +1,17 @@
+import argparse
 import importlib.metadata
+import os
+import shutil
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Optional
+import dataset
+
+# Radio metrics attached to the RTT data (both events and 1 minute bins)
+METADATA_KEYS = ["rssi", "rsrq", "rsrp"]
+
+# Metadata is joined per node and network
+KEY_COLUMNS = ["node_id", "network_id"]
 
 # You should be running pandas 2.0.3
 def print_pandas_version():
@@ -10,24 +21,17 @@ def print_pandas_version():
     print(f"Pandas version {version}")
 
 
-def series_to_list(column_series: pd.Series) -> tuple:
-    """There can be multiple events in one second, use this to map stuff
-
-    Args:
-        column_series (pd.Series): A column in the pandas dataframe
-
-    Returns:
-        Tuple: Wrapped hashable, needed for pandas to work
-    """
-    return tuple(column_series.to_list())
-
-
-def load_event_for_key(folder_name: str, metadata_key: str, event_key: str) -> pd.DataFrame:
+def load_event_for_key(
+    folder_name: str, metadata_key: str, event_key: str, node_ids: Optional[list] = None, start=None, end=None
+) -> pd.DataFrame:
     """Method to load event data for a specific key
 
     Args:
         metadata_key (str): e.g rssi
         event_key (str): e.g event_rssi
+        node_ids (Optional[list]): Only load events of these nodes
+        start: Only load events with ts >= start
+        end: Only load events with ts < end
 
     Returns:
         pd.DataFrame: events_rdf
@@ -35,8 +39,8 @@ def load_event_for_key(folder_name: str, metadata_key: str, event_key: str) -> p
     # Load dataframe
     # Prepare your filtered dataframe this is only example
     # Change string pattern to match your files
-    event_rdf = pd.read_csv(
-        f"./{folder_name}/metadata_{metadata_key}_events.csv")
+    event_rdf = dataset.read_frame(
+        f"./{folder_name}/metadata_{metadata_key}_events.csv", node_ids=node_ids, start=start, end=end)
     # Convert timestamp to datetime object
     event_rdf["ts"] = pd.to_datetime(event_rdf["ts"])
     # FLOOR timestamp to second frequency for matching (DO NOT USE ROUND!)
@@ -48,75 +52,45 @@ def load_event_for_key(folder_name: str, metadata_key: str, event_key: str) -> p
     return event_rdf
 
 
-def merge_events_to_dataframe(
-    rtt_1sec: pd.DataFrame, event_rdf: pd.DataFrame, event_key: str, event_count_key: str
-) -> pd.DataFrame:
-    """Merges the dataframes together using event_ts and node_id, network_id
-    Fills blanks with previous value
-    Removes leading NA values 
+def summarize_events(event_rdf: pd.DataFrame, event_key: str, event_count_key: str) -> pd.DataFrame:
+    """There can be multiple events in one second, reduce them to one row per node and second
 
     Args:
-        rtt_1sec (pd.DataFrame): dataframe with rtt measurement
         event_rdf (pd.DataFrame): dataframe with events
         event_key (str): e.g: "event_rssi"
         event_count_key (str): e.g. "event_count_rssi"
 
     Returns:
-        pd.DataFrame: dataframe with mapped columns
+        pd.DataFrame: last value, count, min and max of the events in each second,
+            indexed by node_id, network_id, event_ts
     """
-    # Do left merge
-    rtt_1sec_merged = rtt_1sec.copy(deep=True).merge(
-        right=event_rdf, on=["event_ts", "node_id", "network_id"], how="left"
-    )
-
-    # Fill subsequent values with value (if there is multiple changes, it will fill it with last value
-    rtt_1sec_merged[event_key] = rtt_1sec_merged[event_key].fillna(
-        method="ffill")
-
-    # Reset index
-    rtt_1sec_merged.reset_index(drop=True, inplace=True)
-    # Drop leading NA values
-    rtt_1sec_merged.dropna(inplace=True)
-
-    # Flat listing of recors if there are two identical rows it will match them and create tupe (first_val,second_val,...)
-    # It will also tuple all single values, bins does not have this issue
-    rtt_1sec_merged = (
-        rtt_1sec_merged.groupby(by=rtt_1sec.columns.to_list(), as_index=False)
-        .agg(
-            values=pd.NamedAgg(column=event_key, aggfunc=series_to_list),
-            count=pd.NamedAgg(column=event_key, aggfunc="count"),
-        )
-        .reset_index(drop=True)
-    )
-
-    # Rename columns to unique names, so you can do this in iterative manner
-    rtt_1sec_merged.rename(
-        columns={"values": event_key, "count": event_count_key}, inplace=True
+    summary = (
+        event_rdf.groupby(by=KEY_COLUMNS + ["event_ts"], sort=False)[event_key]
+        .agg(["last", "count", "min", "max"])
     )
-    # Reset index for next function
-    rtt_1sec = rtt_1sec_merged.reset_index(drop=True)
-    # Drop event dataframe you do not need it
-    del event_rdf
-    # Return value
-    return rtt_1sec
+    return summary.rename(columns={
+        "last": event_key, "count": event_count_key, "min": f"{event_key}_min", "max": f"{event_key}_max"})
 
 
 def load_bin_for_key(
-    folder_name: str, metadata_key: str, bin_key: str
+    folder_name: str, metadata_key: str, bin_key: str, node_ids: Optional[list] = None, start=None, end=None
 ) -> pd.DataFrame:
     """Loads bin file for metadatakey
 
     Args:
         metadata_key (str): e.g. "rssi"
         bin_key (_type_): e.g "bin_rssi"
+        node_ids (Optional[list]): Only load bins of these nodes
+        start: Only load bins with ts >= start
+        end: Only load bins with ts < end
 
     Returns:
         pd.DataFrame: bin_rdf containing 1 minute normalized bins
     """
     # Load file
     # This is example, you may need to change it for your data
-    bin_rdf = pd.read_csv(
-        f"./{folder_name}/metadata_{metadata_key}_1min_bin.csv")
+    bin_rdf = dataset.read_frame(
+        f"./{folder_name}/metadata_{metadata_key}_1min_bin.csv", node_ids=node_ids, start=start, end=end)
     # Convert to timestamp
     bin_rdf["ts"] = pd.to_datetime(bin_rdf["ts"])
     # We do not trust data, normalize them
@@ -128,10 +102,121 @@ def load_bin_for_key(
     return bin_rdf
 
 
+def build_event_timeline(events: list) -> pd.DataFrame:
+    """Puts the per second summaries of all metadata keys on one timeline per node
+    A key without events in a second carries its previous value forward, counted once
+
+    Args:
+        events (list): (event_rdf, event_key, event_count_key) for every metadata key
+
+    Returns:
+        pd.DataFrame: timeline with an event_second column, sorted by event_second
+    """
+    timeline = pd.concat(
+        [summarize_events(event_rdf, event_key, event_count_key) for event_rdf, event_key, event_count_key in events],
+        axis=1,
+    ).sort_index()
+
+    for _, event_key, event_count_key in events:
+        last = timeline[event_key].groupby(level=KEY_COLUMNS).ffill()
+        timeline[event_key] = last
+        timeline[event_count_key] = timeline[event_count_key].fillna(1).where(last.notna())
+        timeline[f"{event_key}_min"] = timeline[f"{event_key}_min"].fillna(last)
+        timeline[f"{event_key}_max"] = timeline[f"{event_key}_max"].fillna(last)
+
+    timeline = timeline.reset_index().rename(columns={"event_ts": "event_second"})
+    return timeline.sort_values(by="event_second", kind="stable").reset_index(drop=True)
+
+
+def build_bin_timeline(bins: list) -> pd.DataFrame:
+    """Puts the 1 minute bins of all metadata keys on one timeline per node
+    A key without a bin in a minute carries its previous value forward
+
+    Args:
+        bins (list): (bin_rdf, bin_key) for every metadata key
+
+    Returns:
+        pd.DataFrame: timeline with a bin_minute column, sorted by bin_minute
+    """
+    timeline = pd.concat(
+        [bin_rdf.groupby(by=KEY_COLUMNS + ["bin_ts"], sort=False)[bin_key].last() for bin_rdf, bin_key in bins],
+        axis=1,
+    ).sort_index()
+    timeline = timeline.groupby(level=KEY_COLUMNS).ffill()
+
+    timeline = timeline.reset_index().rename(columns={"bin_ts": "bin_minute"})
+    return timeline.sort_values(by="bin_minute", kind="stable").reset_index(drop=True)
+
+
+def merge_metadata_to_dataframe(rtt_1sec: pd.DataFrame, events: list, bins: list) -> pd.DataFrame:
+    """Attaches the events and bins of any number of metadata keys in one sweep over the RTT data
+    The events of all keys are as-of joined on event_ts and the bins on bin_ts, per node_id, network_id
+    Removes leading NA values
+
+    For every event key it adds event_key (last value in the second), event_count_key (number of
+    events in the second) and f"{event_key}_min", f"{event_key}_max" (smallest and largest value
+    in the second). For every bin key it adds bin_key.
+
+    Args:
+        rtt_1sec (pd.DataFrame): dataframe with rtt measurement, sorted by ts
+        events (list): (event_rdf, event_key, event_count_key) for every metadata key
+        bins (list): (bin_rdf, bin_key) for every metadata key
+
+    Returns:
+        pd.DataFrame: dataframe with mapped columns
+    """
+    # merge_asof needs the keys to have the exact same dtype on both sides
+    key_dtypes = {key: rtt_1sec[key].dtype for key in KEY_COLUMNS}
+
+    if events:
+        timeline = build_event_timeline(events).astype(key_dtypes)
+        # Both sides are sorted by time, so this is a single linear pass over the rtt data
+        rtt_1sec = pd.merge_asof(
+            rtt_1sec, timeline, left_on="event_ts", right_on="event_second", by=KEY_COLUMNS)
+        # The timeline row is from an earlier second, so every key is carried forward
+        carried = rtt_1sec["event_second"] != rtt_1sec["event_ts"]
+        for _, event_key, event_count_key in events:
+            last = rtt_1sec[event_key]
+            rtt_1sec[event_count_key] = rtt_1sec[event_count_key].mask(carried & last.notna(), 1)
+            rtt_1sec[f"{event_key}_min"] = rtt_1sec[f"{event_key}_min"].mask(carried, last)
+            rtt_1sec[f"{event_key}_max"] = rtt_1sec[f"{event_key}_max"].mask(carried, last)
+        rtt_1sec.drop(columns=["event_second"], inplace=True)
+
+    if bins:
+        timeline = build_bin_timeline(bins).astype(key_dtypes)
+        rtt_1sec = pd.merge_asof(
+            rtt_1sec, timeline, left_on="bin_ts", right_on="bin_minute", by=KEY_COLUMNS)
+        rtt_1sec.drop(columns=["bin_minute"], inplace=True)
+
+    # Drop leading NA values
+    rtt_1sec.dropna(inplace=True)
+    for _, _, event_count_key in events:
+        rtt_1sec[event_count_key] = rtt_1sec[event_count_key].astype("int64")
+    # Reset index for next function
+    return rtt_1sec.reset_index(drop=True)
+
+
+def merge_events_to_dataframe(
+    rtt_1sec: pd.DataFrame, event_rdf: pd.DataFrame, event_key: str, event_count_key: str
+) -> pd.DataFrame:
+    """Attaches the events of a single metadata key, see merge_metadata_to_dataframe
+
+    Args:
+        rtt_1sec (pd.DataFrame): dataframe with rtt measurement, sorted by ts
+        event_rdf (pd.DataFrame): dataframe with events
+        event_key (str): e.g: "event_rssi"
+        event_count_key (str): e.g. "event_count_rssi"
+
+    Returns:
+        pd.DataFrame: dataframe with mapped columns
+    """
+    return merge_metadata_to_dataframe(rtt_1sec, events=[(event_rdf, event_key, event_count_key)], bins=[])
+
+
 def merge_bins_to_dataframe(
     rtt_1sec: pd.DataFrame, bin_rdf: pd.DataFrame, bin_key: str
 ) -> pd.DataFrame:
-    """Added "bin_column to dataframe"
+    """Attaches the bins of a single metadata key, see merge_metadata_to_dataframe
 
     Args:
         rtt_1sec (pd.DataFrame): RTT data
@@ -141,31 +226,26 @@ def merge_bins_to_dataframe(
     Returns:
         pd.DataFrame: RTT data with new bin_key column
     """
-    # Left merge
-    rtt_1sec_merged = rtt_1sec.merge(
-        right=bin_rdf, on=["bin_ts", "node_id", "network_id"], how="left"
-    )
-    # Fill subsequent values
-    rtt_1sec_merged[bin_key] = rtt_1sec_merged[bin_key].fillna(method="ffill")
-    # Reset index before drop
-    rtt_1sec_merged.reset_index(drop=True, inplace=True)
-    # Drop values without bin
-    rtt_1sec_merged.dropna(inplace=True)
-    # Reset index after drop
-    rtt_1sec = rtt_1sec_merged.reset_index(drop=True)
-    # Dispose of bins that are already mapped
-    del bin_rdf
-    # Return new RTT data
-    return rtt_1sec
+    return merge_metadata_to_dataframe(rtt_1sec, events=[], bins=[(bin_rdf, bin_key)])
 
 
 def filter_and_aggregate(
-    df: pd.DataFrame, folder_name: str, drop_columns: Optional[list] = ["network_id", "service_id"]
+    df: pd.DataFrame,
+    folder_name: str,
+    drop_columns: Optional[list] = ["network_id", "service_id"],
+    node_ids: Optional[list] = None,
+    start=None,
+    end=None,
+    metadata_keys: list = METADATA_KEYS,
 ) -> pd.DataFrame:
     """Filter and aggregate the data
 
     Args:
         df (pd.DataFrame): The pandas dataframe of 1 second RTT data
+        metadata_keys (list): Metadata keys to attach, e.g. ["rssi", "rsrq", "rsrp"]
+        node_ids (Optional[list]): Only load metadata of these nodes, e.g. the nodes in df
+        start: Only load metadata with ts >= start
+        end: Only load metadata with ts < end
 
     Returns: -> pd.DataFrame
         pd.DataFrame: The aggregated dataframe
@@ -179,31 +259,27 @@ def filter_and_aggregate(
 
     # Specify keys that you want to import (both bins and events)
     # Make sure that you have proper files in proper folder etc.
-    for metadata_key in ["rssi", "rsrq", "rsrp"]:
+    events = []
+    bins = []
+    for metadata_key in metadata_keys:
         # Define all keys that are going to extend dataframe in one go
         event_key = f"event_{metadata_key}"
-        event_count_key = event_count_key = f"event_count_{metadata_key}"
+        event_count_key = f"event_count_{metadata_key}"
         bin_key = f"bin_{metadata_key}"
 
         # Fetch event data
         event_rdf = load_event_for_key(
-            folder_name=folder_name, metadata_key=metadata_key, event_key=event_key)
-        # Map event data
-        df = merge_events_to_dataframe(
-            rtt_1sec=df,
-            event_rdf=event_rdf,
-            event_key=event_key,
-            event_count_key=event_count_key,
-        )
+            folder_name=folder_name, metadata_key=metadata_key, event_key=event_key,
+            node_ids=node_ids, start=start, end=end)
+        events.append((event_rdf, event_key, event_count_key))
 
         # Fetch bin data
-        bin_rdf = load_bin_for_key(folder_name=folder_name, metadata_key=metadata_key, bin_key=bin_key)
+        bin_rdf = load_bin_for_key(folder_name=folder_name, metadata_key=metadata_key, bin_key=bin_key,
+                                   node_ids=node_ids, start=start, end=end)
+        bins.append((bin_rdf, bin_key))
 
-        # Map bin data
-        df = merge_bins_to_dataframe(
-            rtt_1sec=df, bin_rdf=bin_rdf, bin_key=bin_key
-        )
-        print(metadata_key)
+    # Map event and bin data of every key at once
+    df = merge_metadata_to_dataframe(rtt_1sec=df, events=events, bins=bins)
 
     df = df.drop(columns=["bin_ts", "event_ts"])
 
@@ -212,7 +288,134 @@ def filter_and_aggregate(
 
     return df
 
-df = pd.read_csv("./oslo_3_month_packetloss_rtt_rawdata_1sec_bins.csv")
-df = filter_and_aggregate(df, "data")
 
-df.to_csv("./oslo_3_month_aggregated.csv")
\ No newline at end of file
+def as_dataset(path: str) -> str:
+    """Converts a csv file to a node/day partitioned dataset unless that was done already
+
+    Args:
+        path (str): e.g. "./data/metadata_rssi_events.csv"
+
+    Returns:
+        str: The dataset directory
+    """
+    path = dataset.resolve_path(path)
+    if dataset.is_dataset(path):
+        return path
+    print(f"Partitioning {path}")
+    return dataset.csv_to_dataset(path)
+
+
+def aggregate_partition(
+    partition: tuple,
+    rtt_root: str,
+    folder_name: str,
+    out_root: str,
+    drop_columns: Optional[list] = ["network_id", "service_id"],
+    lookback: str = "1D",
+    metadata_keys: list = METADATA_KEYS,
+) -> int:
+    """Aggregates a single node or node-day and appends the result to out_root
+
+    Args:
+        partition (tuple): (node_id, None) for a whole node or (node_id, "2023-11-01") for a single day
+        rtt_root (str): Dataset with the 1 second RTT data
+        out_root (str): Dataset the aggregated rows are written to
+        lookback (str): How far back metadata is loaded for a node-day, so the first seconds
+            of the day still get the last event/bin of the day before
+
+    Returns:
+        int: Number of rows written
+    """
+    node_id, day = partition
+    start = end = metadata_start = None
+    if day is not None:
+        start = pd.Timestamp(day)
+        end = start + pd.Timedelta(days=1)
+        metadata_start = start - pd.Timedelta(lookback)
+
+    df = dataset.read_dataset(rtt_root, node_ids=[node_id], start=start, end=end)
+    if df.empty:
+        return 0
+
+    df = filter_and_aggregate(
+        df, folder_name, drop_columns, node_ids=[node_id], start=metadata_start, end=end,
+        metadata_keys=metadata_keys)
+
+    if not df.empty:
+        dataset.write_dataset(df, out_root)
+    return len(df)
+
+
+def filter_and_aggregate_partitioned(
+    rtt_path: str,
+    folder_name: str,
+    out_root: str,
+    drop_columns: Optional[list] = ["network_id", "service_id"],
+    by_day: bool = False,
+    workers: Optional[int] = None,
+    lookback: str = "1D",
+    metadata_keys: list = METADATA_KEYS,
+) -> int:
+    """Out-of-core version of filter_and_aggregate. The RTT, event and bin files are partitioned by
+    node and day once, then every node (or node-day) is aggregated on its own in a process pool and
+    written to out_root as soon as it is done. Peak memory is roughly workers times one partition.
+
+    Args:
+        rtt_path (str): The 1 second RTT csv file or dataset
+        folder_name (str): Folder with the metadata files
+        out_root (str): Dataset the aggregated rows are written to
+        by_day (bool): Use node-days instead of nodes as partitions
+        workers (Optional[int]): Number of processes, defaults to the number of CPUs
+        lookback (str): See aggregate_partition
+        metadata_keys (list): Metadata keys to attach, e.g. ["rssi", "rsrq", "rsrp"]
+
+    Returns:
+        int: Number of rows written
+    """
+    rtt_root = as_dataset(rtt_path)
+    for metadata_key in metadata_keys:
+        as_dataset(f"./{folder_name}/metadata_{metadata_key}_events.csv")
+        as_dataset(f"./{folder_name}/metadata_{metadata_key}_1min_bin.csv")
+
+    partitions = dataset.list_partitions(rtt_root)
+    if not by_day:
+        partitions = sorted({(node_id, None) for node_id, _ in partitions})
+
+    if dataset.is_dataset(out_root):
+        shutil.rmtree(out_root)
+
+    total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                aggregate_partition, partition, rtt_root, folder_name, out_root, drop_columns, lookback,
+                metadata_keys
+            ): partition
+            for partition in partitions
+        }
+        for future in as_completed(futures):
+            node_id, day = futures[future]
+            rows = future.result()
+            total_rows += rows
+            print(f"Aggregated node {node_id}{'' if day is None else ' ' + day}: {rows} rows")
+
+    return total_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streaming", action="store_true",
+                        help="Aggregate one partition at a time instead of loading the whole RTT file")
+    parser.add_argument("--by-day", action="store_true", help="Partition by node-day instead of node")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes used when streaming")
+    args = parser.parse_args()
+
+    if args.streaming:
+        filter_and_aggregate_partitioned(
+            "./oslo_3_month_packetloss_rtt_rawdata_1sec_bins.csv", "data", "./oslo_3_month_aggregated",
+            by_day=args.by_day, workers=args.workers)
+    else:
+        df = dataset.read_frame("./oslo_3_month_packetloss_rtt_rawdata_1sec_bins.csv")
+        df = filter_and_aggregate(df, "data")
+
+        dataset.write_frame(df, "./oslo_3_month_aggregated")
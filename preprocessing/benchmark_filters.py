@@ -0,0 +1,322 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+from functools import partial
+from filter import PeriodMask, build_interval_index, find_bad_time_periods, keep_rows, search_bad_periods
+from parallel_filter import filter_file
+
+# Benchmarks the C filters (c_filters/main) against filter.py on synthetic operator files, as the
+# real dataset can not be shared. The files have the schemas the C filters parse (see
+# c_filters/src/main.c), e.g.
+#
+#   python benchmark_filters.py generate --dir bench --nodes 30 --hours 24
+#   python benchmark_filters.py run --dir bench --families packetloss,rsrp,ipaddr
+
+C_FILTERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "c_filters", "main")
+
+MODE_FILENAME = "metadata_mode_events.csv"
+START = pd.Timestamp("2023-11-01")
+NETWORK_ID = 2
+FIRST_NODE_ID = 4120
+
+# Value columns of every file: ("int", low, high), ("float", low, high) or ("updown",)
+PACKETLOSS_COLUMNS = {"service_id": ("int", 2, 2), "scnt": ("int", 1, 1), "rcnt": ("int", 0, 1)}
+METADATA_COLUMNS = {
+    "band": {"band": ("int", 1, 71)},
+    "celevel": {"celevel": ("int", 0, 3)},
+    "cid": {"cid": ("int", -32768, 32767)},
+    "device_state": {"device_state": ("int", 0, 10)},
+    "earfcn": {"earfcn": ("int", 0, 65535)},
+    "imsi": {"imsi": ("int", 242000000000000, 242999999999999)},
+    "ipaddr": {"ipaddr_state": ("updown",)},
+    "lac": {"lac": ("int", 0, 65535)},
+    "lte_freq": {"lte_freq": ("int", 700, 2600)},
+    "oper": {"operator": ("int", 24201, 24214)},
+    "rsrp": {"rsrp": ("int", -140, -44)},
+    "rsrq": {"rsrq": ("int", -20, -3)},
+    "rssi": {"rssi": ("int", -120, -25)},
+    "submode": {"submode": ("int", 0, 20)},
+    "tx_power": {"tx_power": ("int", -50, 23)},
+}
+
+# family -> [(file name, rows of a node, value columns)], the rows are "1sec", "5min", "1min" or
+# "events" (see generate_file). The families are the -f families of c_filters/main.
+FILES = {
+    "usbmodem": [("metadata_usbmodem_events.csv", "events",
+                  {"usbmodem_state": ("updown",), "usbmodem_value": ("float", -100, 100)})],
+    "packetloss": [
+        ("packetloss_rtt_rawdata_1sec_bins.csv", "1sec", {**PACKETLOSS_COLUMNS, "rtt": ("float", 0.01, 2)}),
+        ("packetloss_rtt_rawdata_5min_bins.csv", "5min",
+         {**PACKETLOSS_COLUMNS, "scnt": ("int", 300, 300), "rcnt": ("int", 250, 300), "rtt_avg": ("float", 0.01, 2)}),
+        ("packetloss_rtt_5min_bins.csv", "5min",
+         {**PACKETLOSS_COLUMNS, "scnt": ("int", 300, 300), "rcnt": ("int", 250, 300), "rtt_avg": ("float", 0.01, 2)}),
+    ],
+    **{family: [(f"metadata_{family}_1min_bin.csv", "1min", columns), (f"metadata_{family}_events.csv", "events", columns)]
+       for family, columns in METADATA_COLUMNS.items()},
+}
+
+BIN_SECONDS = {"1sec": 1, "1min": 60, "5min": 300}
+
+IMPLEMENTATIONS = ["c", "python", "cffi"]
+
+
+def random_values(rng, spec, n):
+    if spec[0] == "int":
+        return rng.integers(spec[1], spec[2], n, endpoint=True)
+    if spec[0] == "float":
+        return rng.uniform(spec[1], spec[2], n).round(6)
+    return np.where(rng.random(n) < 0.9, "UP", "DOWN")
+
+
+def random_times(rng, nodes, hours, rows, events_per_hour):
+    """Timestamps and node ids of a file sorted by time, a row per node per bin with a random offset
+    into the bin, or events_per_hour events per node at random times"""
+    seconds = hours * 3600
+    node_ids = np.arange(FIRST_NODE_ID, FIRST_NODE_ID + nodes, dtype=np.int64)
+    if rows == "events":
+        n = int(nodes * hours * events_per_hour)
+        offsets = rng.uniform(0, seconds, n)
+        node_id = rng.choice(node_ids, n)
+    else:
+        bin_seconds = BIN_SECONDS[rows]
+        bins = np.arange(0, seconds, bin_seconds, dtype=np.float64)
+        offsets = (bins[:, None] + rng.uniform(0, bin_seconds, (len(bins), nodes))).ravel()
+        node_id = np.tile(node_ids, len(bins))
+
+    order = np.argsort(offsets, kind="stable")
+    ts = START + pd.to_timedelta((offsets[order] * 1e6).astype(np.int64), unit="us")
+    return ts, node_id[order]
+
+
+def write_csv(path, ts, node_id, values):
+    df = pd.DataFrame({"ts": ts, "node_id": node_id, "network_id": NETWORK_ID, **values})
+    df.to_csv(path, index=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+    return len(df)
+
+
+def generate_file(path, rows, columns, nodes, hours, events_per_hour, rng):
+    ts, node_id = random_times(rng, nodes, hours, rows, events_per_hour)
+    values = {column: random_values(rng, spec, len(ts)) for column, spec in columns.items()}
+    return write_csv(path, ts, node_id, values)
+
+
+def generate_mode_file(path, nodes, hours, events_per_hour, rng):
+    """Mode 3 events with downtime starting at mode 0 and ending at mode 6, about a third of the time
+    of a node is in a downtime period. Some nodes end the file down."""
+    ts, node_id = random_times(rng, nodes, hours, "events", events_per_hour)
+    mode = rng.choice([0, 3, 3, 3, 6], len(ts))
+    return write_csv(path, ts, node_id, {"mode": mode})
+
+
+def generate(directory, nodes=30, hours=24, events_per_hour=12, mode_events_per_hour=2, families=None, seed=0):
+    """Writes the mode file and the files of the families to <directory>/operator
+
+    Args:
+        directory (str): Directory of the benchmark
+        nodes (int): Number of nodes, every 1sec file has nodes * hours * 3600 rows
+        hours (int): Hours of data from 2023-11-01
+        events_per_hour (float): Events per node per hour of the _events files
+        mode_events_per_hour (float): Events per node per hour of the mode file
+        families (list): The families to write, None for all of FILES
+        seed (int): Seed of the random values
+
+    Returns:
+        dict: File name -> number of rows
+    """
+    rng = np.random.default_rng(seed)
+    operator_dir = os.path.join(directory, "operator")
+    os.makedirs(operator_dir, exist_ok=True)
+
+    rows = {MODE_FILENAME: generate_mode_file(
+        os.path.join(operator_dir, MODE_FILENAME), nodes, hours, mode_events_per_hour, rng)}
+    for family in families or FILES:
+        for file_name, file_rows, columns in FILES[family]:
+            rows[file_name] = generate_file(
+                os.path.join(operator_dir, file_name), file_rows, columns, nodes, hours, events_per_hour, rng)
+    return rows
+
+
+def count_rows(path):
+    with open(path, "rb") as file:
+        return sum(block.count(b"\n") for block in iter(lambda: file.read(1 << 20), b"")) - 1
+
+
+def numpy_keep_rows(chunk, interval_index):
+    return ~search_bad_periods(chunk, interval_index)
+
+
+def filter_python(in_dir, out_dir, file_names, use_cffi=False):
+    """What filter.py does for the files: find the downtime periods of the mode file and drop the rows
+    in them. Without use_cffi the periods are searched with numpy even when the C library is built."""
+    periods = find_bad_time_periods(os.path.join(in_dir, MODE_FILENAME))
+    interval_index = build_interval_index(periods)
+    if use_cffi:
+        keep = partial(keep_rows, interval_index=PeriodMask(interval_index))
+    else:
+        keep = partial(numpy_keep_rows, interval_index=interval_index)
+    os.makedirs(out_dir, exist_ok=True)
+    for file_name in file_names:
+        filter_file(os.path.join(in_dir, file_name), os.path.join(out_dir, file_name), keep)
+
+
+# Runs a command in a fork of a bare interpreter and prints its peak RSS in kB and exit code. The command
+# can not be started by the benchmark process itself: the peak RSS of a process counts the memory of the
+# process it was exec'ed from, the benchmark with its dataframes, while a fork of this one adds ~5 MB.
+LAUNCHER = """
+import os, sys
+pid = os.fork()
+if pid == 0:
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    os.execv(sys.argv[1], sys.argv[1:])
+_, status, usage = os.wait4(pid, 0)
+print(usage.ru_maxrss, os.waitstatus_to_exitcode(status))
+"""
+
+
+def measure(args):
+    """Runs a command, returns its wall time in seconds, peak RSS in MB and exit code"""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-S", "-c", LAUNCHER, *args], capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"Could not run {args[0]}: {process.stderr}")
+    peak_rss_kb, returncode = map(int, process.stdout.split())
+    if returncode != 0:
+        sys.stderr.write(process.stderr)
+    return seconds, peak_rss_kb / 1024, returncode
+
+
+def command(implementation, family, in_dir, out_dir, threads):
+    if implementation == "c":
+        # -d of a directory that does not exist, so the periods are found in the mode file like filter.py does
+        return [C_FILTERS_PATH, "-f", family, "-i", in_dir, "-o", out_dir, "-d", os.path.join(in_dir, "no_downtime"),
+                "-t", str(threads), "-j", "1"]
+    file_names = [file_name for file_name, _, _ in FILES[family]]
+    return [sys.executable, os.path.abspath(__file__), "filter", "--in-dir", in_dir, "--out-dir", out_dir,
+            *(["--cffi"] if implementation == "cffi" else []), *file_names]
+
+
+def available(implementation):
+    if implementation == "c":
+        return os.access(C_FILTERS_PATH, os.X_OK)
+    if implementation == "cffi":
+        try:
+            import cfilters  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+def same_rows(path, other_path):
+    """True if two filtered files have the same rows, the C filters format numbers and timestamps
+    differently from pandas so the values are compared instead of the text"""
+    left, right = pd.read_csv(path), pd.read_csv(other_path)
+    for df in (left, right):
+        df["ts"] = pd.to_datetime(df["ts"], format="ISO8601")
+    try:
+        pd.testing.assert_frame_equal(left, right, check_dtype=False)
+    except AssertionError:
+        return False
+    return True
+
+
+def run(directory, families=None, implementations=None, threads=0):
+    """Filters the files of every family with every implementation, each in its own process
+
+    Args:
+        directory (str): Directory of generate, the output of an implementation goes to <directory>/<implementation>
+        families (list): The families to filter, None for all that have been generated
+        implementations (list): Some of IMPLEMENTATIONS, None for the ones that are available
+        threads (int): Threads of the C filters, 0 for one per CPU
+
+    Returns:
+        list: A dict per family and implementation with rows, seconds, rows_per_second, peak_rss_mb and
+            equal, whether the output is the same as the one of the first implementation
+    """
+    in_dir = os.path.join(directory, "operator")
+    if families is None:
+        families = [family for family, files in FILES.items()
+                    if all(os.path.exists(os.path.join(in_dir, file_name)) for file_name, _, _ in files)]
+    if implementations is None:
+        implementations = [implementation for implementation in IMPLEMENTATIONS if available(implementation)]
+
+    results = []
+    for family in families:
+        file_names = [file_name for file_name, _, _ in FILES[family]]
+        rows = sum(count_rows(os.path.join(in_dir, file_name)) for file_name in file_names)
+        for implementation in implementations:
+            out_dir = os.path.join(directory, implementation)
+            os.makedirs(out_dir, exist_ok=True)
+            seconds, peak_rss_mb, returncode = measure(command(implementation, family, in_dir, out_dir, threads))
+            if returncode != 0:
+                raise RuntimeError(f"{implementation} failed on {family} with exit code {returncode}")
+
+            reference_dir = os.path.join(directory, implementations[0])
+            equal = all(same_rows(os.path.join(reference_dir, file_name), os.path.join(out_dir, file_name))
+                        for file_name in file_names)
+            results.append({
+                "family": family,
+                "implementation": implementation,
+                "rows": rows,
+                "seconds": seconds,
+                "rows_per_second": rows / seconds,
+                "peak_rss_mb": peak_rss_mb,
+                "equal": equal,
+            })
+    return results
+
+
+def format_results(results):
+    lines = [f"{'family':<14}{'implementation':<16}{'rows':>12}{'seconds':>10}{'rows/s':>14}{'peak RSS MB':>13}  equal"]
+    for result in results:
+        lines.append(f"{result['family']:<14}{result['implementation']:<16}{result['rows']:>12,}"
+                     f"{result['seconds']:>10.2f}{result['rows_per_second']:>14,.0f}{result['peak_rss_mb']:>13.1f}"
+                     f"  {'yes' if result['equal'] else 'NO'}")
+    return "\n".join(lines)
+
+
+def split_list(value):
+    return value.split(",") if value else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the C filters against filter.py on synthetic files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Write synthetic files to <dir>/operator")
+    generate_parser.add_argument("--dir", default="benchmark")
+    generate_parser.add_argument("--nodes", type=int, default=30)
+    generate_parser.add_argument("--hours", type=int, default=24)
+    generate_parser.add_argument("--events-per-hour", type=float, default=12)
+    generate_parser.add_argument("--mode-events-per-hour", type=float, default=2)
+    generate_parser.add_argument("--families", type=split_list, default=None, help="Comma separated, default all")
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = subparsers.add_parser("run", help="Filter the files of <dir>/operator and report the results")
+    run_parser.add_argument("--dir", default="benchmark")
+    run_parser.add_argument("--families", type=split_list, default=None, help="Comma separated, default all generated")
+    run_parser.add_argument("--implementations", type=split_list, default=None,
+                            help=f"Comma separated of {','.join(IMPLEMENTATIONS)}, default the available ones")
+    run_parser.add_argument("--threads", type=int, default=0, help="Threads of the C filters")
+
+    # Used by run, the Python implementations in a process of their own so their peak RSS can be measured
+    filter_parser = subparsers.add_parser("filter")
+    filter_parser.add_argument("--in-dir", required=True)
+    filter_parser.add_argument("--out-dir", required=True)
+    filter_parser.add_argument("--cffi", action="store_true")
+    filter_parser.add_argument("files", nargs="+")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        rows = generate(args.dir, args.nodes, args.hours, args.events_per_hour, args.mode_events_per_hour,
+                        args.families, args.seed)
+        for file_name, file_rows in rows.items():
+            print(f"{file_name}: {file_rows:,} rows")
+    elif args.command == "run":
+        print(format_results(run(args.dir, args.families, args.implementations, args.threads)))
+    else:
+        filter_python(args.in_dir, args.out_dir, args.files, args.cffi)
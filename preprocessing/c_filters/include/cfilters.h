@@ -0,0 +1,72 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#ifndef CFILTERS_H
+#define CFILTERS_H
+
+/*
+ * The interface of libcfilters.so (make lib) for cfilters.py. It only takes plain C types and
+ * opaque pointers, CDEF in cfilters.py repeats these declarations for cffi.
+ */
+
+#include <csv.h>
+#include <datatype.h>
+#include <stddef.h>
+#include <stdint.h>
+
+/* Where cf_parse writes the fields of a row into a numpy structured array */
+typedef struct cf_layout_t {
+    size_t itemsize;
+    size_t ts_offset;
+    size_t node_id_offset;
+    size_t network_id_offset;
+    /* Offsets of the float64 fields of the columns after ts,node_id,network_id */
+    const size_t *value_offsets;
+    size_t values_len;
+} CfLayout;
+
+/* Opens a csv file, NULL if it can not be read */
+MappedFile *cf_open(const char *path);
+
+/* Upper bound of the rows cf_parse writes, the number of lines after the header */
+size_t cf_rows(const MappedFile *file);
+
+void cf_close(MappedFile *file);
+
+/*
+ * Parses the rows of a "ts,node_id,network_id,..." file into out, which has room for cf_rows rows.
+ * A value that is not a number is stored as NaN. Rows of other networks than network_id (all if
+ * it is negative) and rows inside one of the periods (none if NULL) are skipped. Returns the
+ * number of rows written.
+ */
+size_t cf_parse(const MappedFile *file, const CfLayout *layout, const PeriodIndex *periods,
+                int32_t network_id, char *out);
+
+/* Parses len "YYYY-MM-DD HH:MM:SS[.fraction]" strings of a numpy bytes array, width bytes each and
+ * padded with '\0', to epoch nanoseconds */
+void cf_parse_timestamps(const char *strings, size_t width, size_t len, int64_t *out);
+
+/* Downtime periods [start, end) of nodes, overlapping periods are merged */
+PeriodIndex *cf_period_index(const uint16_t *node_id, const int64_t *start, const int64_t *end,
+                             size_t len);
+
+void cf_period_index_free(PeriodIndex *periods);
+
+/* See filter_bad_times_mask */
+void cf_mask_bad_periods(const int64_t *ts, const uint16_t *node_id, size_t len,
+                         const PeriodIndex *periods, uint32_t threads, uint8_t *keep);
+
+#endif // CFILTERS_H
@@ -19,14 +19,43 @@
 
 #include <datatype.h>
 #include <stdbool.h>
+#include <stddef.h>
 
-#define MODE_LINES_IN_FILE 42044
-#define MODE_FILENAME "operator/metadata_mode_events.csv"
+/* Inside the input directory */
+#define MODE_FILENAME "metadata_mode_events.csv"
+/* Where filter.py writes node_id,start_time,end_time per downtime period, one file per mode file
+ * named by its sha256, see load_bad_time_periods */
+#define DOWNTIME_DIR "downtime"
+#define PERIODS_FILENAME_FORMAT "%s/periods-%s.csv"
 
-typedef void (*parse_func_t)(char *line, void *data, int i);
+/* A csv file mapped into memory. The data always ends with '\n', a file without a trailing newline
+ * is read into a buffer instead so the parsers never have to check for the end of the data. */
+typedef struct mapped_file_t {
+    const char *data;
+    size_t size;
+    bool mapped;
+} MappedFile;
 
-NodeDownTimeLen *parse_mode_file();
+int mapped_file_open(MappedFile *file, const char *const filename);
 
-int csv_parse_file(const char *const filename, void **data, parse_func_t parse_func);
+void mapped_file_close(MappedFile *file);
+
+/* First byte after the header line */
+const char *mapped_file_rows(const MappedFile *file);
+
+/* Number of lines after the header line */
+size_t mapped_file_count_rows(const MappedFile *file);
+
+NodeDownTimeLen *parse_mode_file(const char *const filename);
+
+NodeDownTimeLen *parse_downtime_file(const char *const filename);
+
+/* Writes the path of the periods filter.py has found for mode_file into path, inside downtime_dir
+ * and named by the sha256 of mode_file. Returns false if mode_file can not be read, the file at
+ * path may not exist. */
+bool downtime_file_path(char *path, size_t len, const char *const downtime_dir,
+                        const char *const mode_file);
+
+void node_down_time_len_free(NodeDownTimeLen *dt_data);
 
 #endif // CSV_H
\ No newline at end of file
@@ -19,7 +19,9 @@
 
 /* Note that as all data processed is from service_id 2, I just don't save it! */
 
+#include <stdatomic.h>
 #include <stdbool.h>
+#include <stddef.h>
 #include <stdint.h>
 
 #include <datetime.h>
@@ -27,6 +29,8 @@
 
 typedef struct mode_event_data_t {
     DateTime dt;
+    /* Position in the file, the last key of the sort */
+    uint32_t line;
     uint16_t node_id;
     uint8_t mode;
 } ModeEventData;
@@ -37,23 +41,31 @@ typedef struct node_down_time_t {
     uint16_t node_id;
 } NodeDownTime;
 
+/* Sorted by node and start */
 typedef struct node_down_time_len_t {
     uint32_t len;
-    NodeDownTime **arr;
+    NodeDownTime *arr;
 } NodeDownTimeLen;
 
-typedef struct abstract_data_t {
-    DateTime dt;
-    uint16_t node_id;
-} AbstractData;
+/* The merged downtime periods of every node, the periods of node n are
+ * start[offset[n]] .. start[offset[n + 1] - 1], sorted and not overlapping */
+typedef struct period_index_t {
+    uint32_t offset[UINT16_MAX + 2];
+    DateTime *start;
+    DateTime *end;
+} PeriodIndex;
 
 typedef struct filter_thread_data_t {
-    uint16_t start;
-    uint16_t end;
-    size_t len;
-    void **data;
-    NodeDownTimeLen *dt_data;
-    List *new_rows;
+    const DateTime *dt;
+    const PeriodIndex *periods;
+    /* Row numbers bucketed by node, the rows of node n are rows[row_offset[n]] .. */
+    const size_t *rows;
+    const size_t *row_offset;
+    const uint16_t *nodes;
+    size_t nodes_len;
+    /* Next entry of nodes that has not been picked up by a thread */
+    atomic_size_t *next_node;
+    uint8_t *keep;
 } FilterThreadData;
 
 #endif // DATATYPE_H
\ No newline at end of file
@@ -17,22 +17,50 @@
 #ifndef DATETIME_H
 #define DATETIME_H
 
+#include <stddef.h>
 #include <stdint.h>
 
-typedef struct datetime_t {
-    uint16_t year;
-    uint8_t month;
-    uint8_t day;
-    uint8_t hour;
-    uint8_t minute;
-    uint8_t second;
-    uint64_t nanosecond;
-} DateTime;
+/* Nanoseconds since 1970-01-01 00:00:00, the timestamps of the operator files have no time zone */
+typedef int64_t DateTime;
 
-int compare_datetime(const DateTime *const restrict a, const DateTime *const restrict b);
+#define NS_PER_SECOND 1000000000LL
+#define SECONDS_PER_DAY 86400LL
+
+/* "YYYY-MM-DD HH:MM:SS.fffffffff" and the terminator */
+#define DATETIME_STRING_LEN 32
+
+static inline int compare_datetime(const DateTime *const restrict a, const DateTime *const restrict b)
+{
+    return (*a > *b) - (*a < *b);
+}
+
+/* Days since 1970-01-01 of a proleptic Gregorian date */
+static inline int64_t days_from_civil(int64_t year, unsigned month, unsigned day)
+{
+    year -= month <= 2;
+    const int64_t era = (year >= 0 ? year : year - 399) / 400;
+    const unsigned yoe = (unsigned)(year - era * 400);
+    const unsigned doy = (153 * (month + (month > 2 ? -3 : 9)) + 2) / 5 + day - 1;
+    const unsigned doe = yoe * 365 + yoe / 4 - yoe / 100 + doy;
+    return era * 146097 + (int64_t)doe - 719468;
+}
+
+static inline DateTime make_datetime(int64_t year, unsigned month, unsigned day, unsigned hour,
+                                     unsigned minute, unsigned second, uint32_t nanosecond)
+{
+    const int64_t seconds =
+        days_from_civil(year, month, day) * SECONDS_PER_DAY + hour * 3600 + minute * 60 + second;
+    return seconds * NS_PER_SECOND + nanosecond;
+}
 
 int parse_date_time(DateTime *restrict dt, char *const datestr);
 
-void date_time_to_string(const DateTime *const restrict dt, char *restrict datestr);
+/*
+ * Writes dt as "YYYY-MM-DD HH:MM:SS" followed by digits (at most 9) fraction digits, without the
+ * '.' if digits is 0, to datestr, which must hold DATETIME_STRING_LEN characters. With the digits
+ * from parse_date_time_digits this is the string dt was parsed from. Returns the length.
+ */
+size_t date_time_to_string(const DateTime *const restrict dt, uint8_t digits,
+                           char *restrict datestr);
 
-#endif // DATETIME_H
\ No newline at end of file
+#endif // DATETIME_H
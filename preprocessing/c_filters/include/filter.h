@@ -0,0 +1,50 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#ifndef FILTER_H
+#define FILTER_H
+
+#include <datatype.h>
+#include <datetime.h>
+#include <lib/list.h>
+#include <stddef.h>
+#include <stdint.h>
+
+PeriodIndex *period_index_build(const NodeDownTimeLen *dt_data);
+
+/* Builds the index from a contiguous array of periods, which is sorted in place */
+PeriodIndex *period_index_from_periods(NodeDownTime *periods, uint32_t periods_len);
+
+void period_index_free(PeriodIndex *index);
+
+/* Whether dt is inside one of the periods of node_id, i.e. start <= dt < end */
+bool period_index_contains(const PeriodIndex *index, uint16_t node_id, const DateTime *dt);
+
+/*
+ * Sets keep[i] to 0 for the rows inside a downtime period of their node and to 1 for all others.
+ * Nodes are filtered in parallel on threads threads, 0 uses one thread per online CPU.
+ */
+void filter_bad_times_mask(const DateTime *dt, const uint16_t *node_id, size_t len,
+                           const PeriodIndex *periods, uint32_t threads, uint8_t *keep);
+
+/*
+ * Appends the row numbers of the rows that are not inside a downtime period of their node to
+ * new_rows, in the order of the rows. See filter_bad_times_mask for threads.
+ */
+void filter_bad_times(const DateTime *dt, const uint16_t *node_id, size_t len,
+                      const NodeDownTimeLen *dt_data, uint32_t threads, List *new_rows);
+
+#endif // FILTER_H
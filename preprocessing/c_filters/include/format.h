@@ -0,0 +1,135 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#ifndef FORMAT_H
+#define FORMAT_H
+
+/*
+ * Field formatters writing into the buffer of a BufferedWriter, the counterpart of parse.h. Every
+ * formatter takes a pointer to where the field starts and returns a pointer past its last
+ * character, nothing is terminated. The output is the same as printf's %d, %lu and %f.
+ */
+
+#include <math.h>
+#include <parse.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+
+/* Longest field any formatter writes, a %f of DBL_MAX is 316 characters */
+#define FORMAT_FIELD_MAX 320
+
+static inline char *format_u64(char *p, uint64_t value)
+{
+    char digits[20];
+    int len = 0;
+    do {
+        digits[len++] = '0' + value % 10;
+        value /= 10;
+    } while (value > 0);
+    while (len > 0)
+        *p++ = digits[--len];
+    return p;
+}
+
+static inline char *format_i64(char *p, int64_t value)
+{
+    if (value < 0) {
+        *p++ = '-';
+        return format_u64(p, -(uint64_t)value);
+    }
+    return format_u64(p, value);
+}
+
+/* %f, six decimals */
+static inline char *format_f64(char *p, double value)
+{
+    /* The value in millionths is exact enough to round like printf as long as it is not close to
+     * halfway between two millionths, the rest goes to snprintf */
+    double scaled = fabs(value) * 1e6;
+    if (scaled < 9e15) {
+        double rounded = nearbyint(scaled);
+        if (fabs(scaled - rounded) < 0.25) {
+            uint64_t millionths = rounded;
+            if (signbit(value))
+                *p++ = '-';
+            p = format_u64(p, millionths / 1000000);
+            *p++ = '.';
+            uint32_t fraction = millionths % 1000000;
+            for (int i = 5; i >= 0; i--) {
+                p[i] = '0' + fraction % 10;
+                fraction /= 10;
+            }
+            return p + 6;
+        }
+    }
+    return p + snprintf(p, FORMAT_FIELD_MAX, "%f", value);
+}
+
+/* Column formatters used by GEN_STRUCT, named after the column type */
+
+static inline char *uint8_t_format(char *p, uint8_t value)
+{
+    return format_u64(p, value);
+}
+
+static inline char *uint16_t_format(char *p, uint16_t value)
+{
+    return format_u64(p, value);
+}
+
+static inline char *uint64_t_format(char *p, uint64_t value)
+{
+    return format_u64(p, value);
+}
+
+static inline char *int16_t_format(char *p, int16_t value)
+{
+    return format_i64(p, value);
+}
+
+static inline char *int64_t_format(char *p, int64_t value)
+{
+    return format_i64(p, value);
+}
+
+static inline char *double_format(char *p, double value)
+{
+    return format_f64(p, value);
+}
+
+static inline char *updown_format(char *p, updown value)
+{
+    if (value) {
+        memcpy(p, "UP", 2);
+        return p + 2;
+    }
+    memcpy(p, "DOWN", 4);
+    return p + 4;
+}
+
+/* numpy dtype strings of the column types, for the columnar output */
+#define uint8_t_dtype "|u1"
+#define uint16_t_dtype "<u2"
+#define uint64_t_dtype "<u8"
+#define int16_t_dtype "<i2"
+#define int64_t_dtype "<i8"
+#define double_dtype "<f8"
+#define updown_dtype "|b1"
+#define DateTime_dtype "<M8[ns]"
+
+#endif // FORMAT_H
@@ -0,0 +1,80 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#ifndef JOBS_H
+#define JOBS_H
+
+#include <datatype.h>
+#include <pthread.h>
+#include <stddef.h>
+#include <stdint.h>
+
+#define JOB_PATH_LEN 4096
+
+/* Memory shared by the jobs that run at the same time, a job waits until its tables fit */
+typedef struct memory_budget_t {
+    pthread_mutex_t lock;
+    pthread_cond_t released;
+    size_t total;
+    size_t used;
+} MemoryBudget;
+
+typedef enum output_format_t {
+    OUTPUT_CSV,
+    /* See columnar_write */
+    OUTPUT_COLUMNAR,
+} OutputFormat;
+
+typedef struct job_config_t {
+    const char *in_dir;
+    const char *out_dir;
+    const NodeDownTimeLen *mode_data;
+    /* Threads of the downtime filter of every job, 0 for one per CPU */
+    uint32_t threads;
+    MemoryBudget *budget;
+    OutputFormat format;
+} JobConfig;
+
+typedef int (*job_func_t)(const JobConfig *config);
+
+/* A GEN_FUNCTION, family is the metadata family it is selected by on the command line */
+typedef struct job_t {
+    const char *family;
+    const char *file_name;
+    job_func_t run;
+} Job;
+
+void memory_budget_init(MemoryBudget *budget, size_t total);
+
+void memory_budget_destroy(MemoryBudget *budget);
+
+/* Blocks until bytes fit in the budget. A job that is larger than the whole budget is let in once
+ * nothing else holds memory, so it runs alone instead of never. */
+void memory_budget_acquire(MemoryBudget *budget, size_t bytes);
+
+void memory_budget_release(MemoryBudget *budget, size_t bytes);
+
+/* <out_dir>/file_name, with the extension replaced by .bin for the columnar output */
+void job_output_path(const JobConfig *config, const char *file_name, char *path, size_t len);
+
+/* Half the physical memory */
+size_t memory_budget_default(void);
+
+/* Runs the jobs on concurrent threads, the largest input files first so the long jobs do not
+ * start last. Returns the number of jobs that failed. */
+size_t run_jobs(const Job *const *jobs, size_t len, const JobConfig *config, uint32_t concurrent);
+
+#endif // JOBS_H
@@ -17,9 +17,16 @@
 #ifndef MACROS_H
 #define MACROS_H
 
+#include <csv.h>
 #include <datetime.h>
+#include <filter.h>
+#include <jobs.h>
+#include <format.h>
+#include <parse.h>
+#include <stdbool.h>
 #include <stdint.h>
 #include <stdlib.h>
+#include <writer.h>
 
 #define EVAL0(...) __VA_ARGS__
 #define EVAL1(...) EVAL0(EVAL0(EVAL0(__VA_ARGS__)))
@@ -40,107 +47,229 @@
 
 #define MAP_TWO_ARGS(F, ...) __VA_OPT__(EVAL(MAP_POP_TWO_ARGS0(F, __VA_ARGS__)))
 
-uint8_t uint8_t_from_string(char *str)
-{
-    return (uint8_t)atoi(str);
-}
-
-uint16_t uint16_t_from_string(char *str)
-{
-    return (uint16_t)atoi(str);
-}
-
-int16_t int16_t_from_string(char *str)
-{
-    return (int16_t)atoi(str);
-}
-
-int64_t int64_t_from_string(char *str)
-{
-    return (int64_t)atoll(str);
-}
-
-uint64_t uint64_t_from_string(char *str)
-{
-    return (uint64_t)atoll(str);
-}
-
-double double_from_string(char *str)
-{
-    return atof(str);
-}
-
-#define GEN_FROM_STRING_LINE(struct_member_type, struct_member) \
-    l_data[i]->struct_member = struct_member_type##_from_string(strtok_r(NULL, ",", &save_ptr));
-
-#define GEN_LINE_PARSE_FUNC(struct_name, ...)                      \
-    void parse_##struct_name##_line(char *line, void *data, int i) \
-    {                                                              \
-        struct_name **l_data = (struct_name **)data;               \
-        char *save_ptr = NULL;                                     \
-        char *date = strtok_r(line, ",", &save_ptr);               \
-        parse_date_time(&l_data[i]->dt, date);                     \
-        char *node_id = strtok_r(NULL, ",", &save_ptr);            \
-        l_data[i]->node_id = atoi(node_id);                        \
-        strtok_r(NULL, ",", &save_ptr);                            \
-        MAP_TWO_ARGS(GEN_FROM_STRING_LINE, __VA_ARGS__)            \
-    }
+/* Columns are aligned to 8 bytes inside the arena */
+#define ARENA_ALIGN(size) (((size) + 7) & ~(size_t)7)
+
+#define COLUMN_LINE(type, name) type *name;
+
+#define COLUMN_SIZE(type, name) +ARENA_ALIGN(cap * sizeof(type))
+
+#define COLUMN_ROW_SIZE(type, name) +sizeof(type)
+
+#define COLUMN_COUNT(type, name) +1
+
+#define COLUMN_DESCRIPTOR(type, name) \
+    columns[len++] = (Column){ #name, type##_dtype, sizeof(type), table->name };
 
-#define STRUCT_LINE(type, name) type name;
+#define COLUMN_FORMAT(type, name) \
+    *p++ = ',';                   \
+    p = type##_format(p, table->name[row]);
 
-#define GEN_STRUCT(struct_name, ...)           \
-    typedef struct {                           \
-        DateTime dt;                           \
-        uint16_t node_id;                      \
-        MAP_TWO_ARGS(STRUCT_LINE, __VA_ARGS__) \
-    } struct_name;                             \
-    GEN_LINE_PARSE_FUNC(struct_name, __VA_ARGS__)
+#define COLUMN_CARVE(type, name)         \
+    table->name = (type *)cursor;        \
+    cursor += ARENA_ALIGN(cap * sizeof(type));
 
-#define GEN_FUNCTION(func_name, struct_name, file_name, out_file_name, file_len, csv_header_line, \
-                     parse_func, ...)                                                             \
-    int func_name(NodeDownTimeLen *mode_data)                                                     \
+#define COLUMN_COPY(type, name) memcpy(grown.name, table->name, table->len * sizeof(type));
+
+#define COLUMN_PARSE(type, name)                 \
+    p = type##_parse(p, &table->name[table->len]); \
+    p = skip_field(p);
+
+/*
+ * A table of rows stored as one array per column (struct of arrays). All columns live in a single
+ * allocation, the arena, so a table of any size costs one malloc.
+ */
+#define GEN_STRUCT(struct_name, ...)                                                           \
+    typedef struct {                                                                           \
+        size_t len;                                                                            \
+        size_t cap;                                                                            \
+        uint8_t *arena;                                                                        \
+        DateTime *dt;                                                                          \
+        uint8_t *dt_digits;                                                                    \
+        uint16_t *node_id;                                                                     \
+        MAP_TWO_ARGS(COLUMN_LINE, __VA_ARGS__)                                                 \
+    } struct_name;                                                                             \
+                                                                                               \
+    bool struct_name##_alloc(struct_name *table, size_t cap)                                   \
+    {                                                                                          \
+        size_t size = ARENA_ALIGN(cap * sizeof(DateTime)) + ARENA_ALIGN(cap * sizeof(uint8_t)) + \
+                      ARENA_ALIGN(cap * sizeof(uint16_t))                                      \
+                      MAP_TWO_ARGS(COLUMN_SIZE, __VA_ARGS__);                                  \
+        table->arena = malloc(size ? size : 1);                                                \
+        if (!table->arena)                                                                     \
+            return false;                                                                      \
+        table->len = 0;                                                                        \
+        table->cap = cap;                                                                      \
+        uint8_t *cursor = table->arena;                                                        \
+        COLUMN_CARVE(DateTime, dt)                                                             \
+        COLUMN_CARVE(uint8_t, dt_digits)                                                       \
+        COLUMN_CARVE(uint16_t, node_id)                                                        \
+        MAP_TWO_ARGS(COLUMN_CARVE, __VA_ARGS__)                                                \
+        return true;                                                                           \
+    }                                                                                          \
+                                                                                               \
+    /* Grows the table to at least cap rows, doubling the capacity to keep appends linear */   \
+    bool struct_name##_reserve(struct_name *table, size_t cap)                                 \
+    {                                                                                          \
+        if (cap <= table->cap)                                                                 \
+            return true;                                                                       \
+        if (cap < 2 * table->cap)                                                              \
+            cap = 2 * table->cap;                                                              \
+        struct_name grown;                                                                     \
+        if (!struct_name##_alloc(&grown, cap))                                                 \
+            return false;                                                                      \
+        grown.len = table->len;                                                                \
+        memcpy(grown.dt, table->dt, table->len * sizeof(DateTime));                            \
+        memcpy(grown.dt_digits, table->dt_digits, table->len);                                 \
+        memcpy(grown.node_id, table->node_id, table->len * sizeof(uint16_t));                  \
+        MAP_TWO_ARGS(COLUMN_COPY, __VA_ARGS__)                                                 \
+        free(table->arena);                                                                    \
+        *table = grown;                                                                        \
+        return true;                                                                           \
+    }                                                                                          \
+                                                                                               \
+    void struct_name##_free(struct_name *table)                                                \
+    {                                                                                          \
+        free(table->arena);                                                                    \
+    }                                                                                          \
+                                                                                               \
+    /* Bytes of one row over all columns */                                                    \
+    size_t struct_name##_row_size(void)                                                        \
+    {                                                                                          \
+        return sizeof(DateTime) + sizeof(uint8_t) + sizeof(uint16_t)                           \
+               MAP_TWO_ARGS(COLUMN_ROW_SIZE, __VA_ARGS__);                                     \
+    }                                                                                          \
+                                                                                               \
+    /* The columns for columnar_write, at most COLUMNS_MAX */                                  \
+    size_t struct_name##_columns(const struct_name *table, Column *columns)                    \
+    {                                                                                          \
+        size_t len = 0;                                                                        \
+        columns[len++] = (Column){ "ts", DateTime_dtype, sizeof(DateTime), table->dt };        \
+        columns[len++] = (Column){ "node_id", uint16_t_dtype, sizeof(uint16_t), table->node_id }; \
+        MAP_TWO_ARGS(COLUMN_DESCRIPTOR, __VA_ARGS__)                                           \
+        return len;                                                                            \
+    }                                                                                          \
+                                                                                               \
+    /* Longest line struct_name##_format_line writes */                                        \
+    size_t struct_name##_line_max(void)                                                        \
+    {                                                                                          \
+        return DATETIME_STRING_LEN + 16 +                                                      \
+               (0 MAP_TWO_ARGS(COLUMN_COUNT, __VA_ARGS__)) * (FORMAT_FIELD_MAX + 1);          \
+    }                                                                                          \
+                                                                                               \
+    /* ts,node_id,network_id,<columns>\n of a row, network_id is always 2 */                    \
+    char *struct_name##_format_line(const struct_name *table, size_t row, char *p)             \
+    {                                                                                          \
+        p += date_time_to_string(&table->dt[row], table->dt_digits[row], p);                   \
+        *p++ = ',';                                                                            \
+        p = uint16_t_format(p, table->node_id[row]);                                           \
+        memcpy(p, ",2", 2);                                                                    \
+        p += 2;                                                                                \
+        MAP_TWO_ARGS(COLUMN_FORMAT, __VA_ARGS__)                                               \
+        *p++ = '\n';                                                                           \
+        return p;                                                                              \
+    }                                                                                          \
+                                                                                               \
+    /* ts,node_id,network_id,<columns> */                                                      \
+    const char *parse_##struct_name##_line(const char *p, const char *end, struct_name *table) \
+    {                                                                                          \
+        p = parse_date_time_digits(p, &table->dt[table->len], &table->dt_digits[table->len]);  \
+        p = skip_field(p);                                                                     \
+        p = uint16_t_parse(p, &table->node_id[table->len]);                                    \
+        p = skip_field(p);                                                                     \
+        p = skip_field(p);                                                                     \
+        MAP_TWO_ARGS(COLUMN_PARSE, __VA_ARGS__)                                                \
+        table->len++;                                                                          \
+        return next_line(p, end);                                                              \
+    }
+
+/*
+ * Defines func_name, which filters <in_dir>/file_name into <out_dir>/file_name, or a .bin file for
+ * the columnar output, and func_name_file with the file name for the job table. The memory of the
+ * tables is taken from the budget once the number of rows is known: the columns, the bucketed row
+ * numbers and keep mask of the filter, the list of kept rows and the write buffer.
+ */
+#define GEN_FUNCTION(func_name, struct_name, file_name, csv_header_line, parse_func)              \
+    const char func_name##_file[] = file_name;                                                    \
+    int func_name(const JobConfig *config)                                                        \
     {                                                                                             \
         struct timespec start, end;                                                               \
         double elapsed = 0.0;                                                                     \
         clock_gettime(CLOCK_MONOTONIC_RAW, &start);                                               \
-        const size_t file_size = file_len;                                                        \
-        struct_name **arr = malloc(file_size * sizeof(struct_name *));                            \
-        for (size_t i = 0; i < file_size; i++) {                                                  \
-            arr[i] = malloc(sizeof(struct_name));                                                 \
-        }                                                                                         \
-        if (csv_parse_file(file_name, (void **)arr, parse_func) == 0) {                           \
-            printf("Successfully parsed file %s!\n", file_name);                                  \
-        } else {                                                                                  \
-            fprintf(stderr, "Error parsing file %s :(!\n", file_name);                            \
+        char in_path[JOB_PATH_LEN];                                                               \
+        char out_path[JOB_PATH_LEN];                                                              \
+        snprintf(in_path, sizeof(in_path), "%s/%s", config->in_dir, file_name);                   \
+        job_output_path(config, file_name, out_path, sizeof(out_path));                           \
+        MappedFile file;                                                                          \
+        if (mapped_file_open(&file, in_path) != 0) {                                              \
+            fprintf(stderr, "Error parsing file %s :(!\n", in_path);                              \
             return 1;                                                                             \
         }                                                                                         \
-        List out_list;                                                                            \
-        list_init_prealloc(&out_list, sizeof(struct_name *), (int)(file_size * 0.8));             \
-        filter_bad_times((void **)arr, mode_data, &out_list, file_size);                          \
-        FILE *fp = fopen(out_file_name, "w");                                                     \
-        if (!fp) {                                                                                \
-            fprintf(stderr, "Error opening file with name %s!\n", out_file_name);                 \
-            return 1;                                                                             \
+        size_t rows = mapped_file_count_rows(&file);                                              \
+        size_t memory = rows * (struct_name##_row_size() + 2 * sizeof(size_t) + 1) +              \
+                        (file.mapped ? 0 : file.size) + WRITER_BUFFER_SIZE;                       \
+        memory_budget_acquire(config->budget, memory);                                            \
+        int ret = 1;                                                                              \
+        struct_name t;                                                                            \
+        if (!struct_name##_alloc(&t, rows)) {                                                     \
+            mapped_file_close(&file);                                                             \
+            goto release;                                                                         \
+        }                                                                                         \
+        const char *file_end = file.data + file.size;                                             \
+        for (const char *p = mapped_file_rows(&file); p < file_end;) {                            \
+            if (*p == '\n') {                                                                     \
+                p++;                                                                              \
+                continue;                                                                         \
+            }                                                                                     \
+            if (t.len == t.cap && !struct_name##_reserve(&t, t.cap + 1)) {                        \
+                mapped_file_close(&file);                                                         \
+                goto free_table;                                                                  \
+            }                                                                                     \
+            p = parse_func(p, file_end, &t);                                                      \
         }                                                                                         \
-        fprintf(fp, csv_header_line);                                                             \
-        char date[50] = { 0 };                                                                    \
-        for (size_t i = 0; i < out_list.size; i++) {                                              \
-            struct_name **row = list_get(&out_list, i);                                           \
-            date_time_to_string(&(*row)->dt, date);                                               \
-            fprintf(fp, __VA_ARGS__);                                                             \
+        mapped_file_close(&file);                                                                 \
+        printf("Successfully parsed file %s!\n", in_path);                                        \
+        List out_list;                                                                            \
+        list_init_prealloc(&out_list, sizeof(size_t), t.len * 0.8 + 1);                           \
+        filter_bad_times(t.dt, t.node_id, t.len, config->mode_data, config->threads, &out_list);  \
+        const size_t *kept = (const size_t *)out_list.items;                                      \
+        bool written;                                                                             \
+        if (config->format == OUTPUT_COLUMNAR) {                                                  \
+            Column columns[COLUMNS_MAX];                                                          \
+            size_t columns_len = struct_name##_columns(&t, columns);                              \
+            written = columnar_write(out_path, csv_header_line, columns, columns_len, kept,       \
+                                     out_list.size);                                              \
+        } else {                                                                                  \
+            BufferedWriter writer;                                                                \
+            written = writer_open(&writer, out_path);                                             \
+            if (written) {                                                                        \
+                writer_write(&writer, csv_header_line, strlen(csv_header_line));                  \
+                const size_t line_max = struct_name##_line_max();                                 \
+                for (size_t i = 0; i < out_list.size; i++) {                                      \
+                    char *p = writer_reserve(&writer, line_max);                                  \
+                    writer_commit(&writer, struct_name##_format_line(&t, kept[i], p));            \
+                }                                                                                 \
+                written = writer_close(&writer);                                                  \
+            }                                                                                     \
         }                                                                                         \
-        fclose(fp);                                                                               \
-        for (size_t i = 0; i < file_size; i++) {                                                  \
-            free(arr[i]);                                                                         \
+        if (!written) {                                                                           \
+            fprintf(stderr, "Error writing file with name %s!\n", out_path);                      \
+            list_free(&out_list);                                                                 \
+            goto free_table;                                                                      \
         }                                                                                         \
-        free(arr);                                                                                \
+        list_free(&out_list);                                                                     \
+        ret = 0;                                                                                  \
         clock_gettime(CLOCK_MONOTONIC_RAW, &end);                                                 \
         elapsed = (end.tv_sec - start.tv_sec);                                                    \
         elapsed += (end.tv_nsec - start.tv_nsec) / 1000000000.0;                                  \
         printf("----------------------------------\n");                                           \
-        printf("Time used to parse and filter %s: %f s \n", file_name, elapsed);                  \
+        printf("Time used to parse and filter %s: %f s \n", in_path, elapsed);                    \
         printf("----------------------------------\n");                                           \
-        return 0;                                                                                 \
+    free_table:                                                                                   \
+        struct_name##_free(&t);                                                                   \
+    release:                                                                                      \
+        memory_budget_release(config->budget, memory);                                            \
+        return ret;                                                                               \
     }
 
-#endif // MACROS_H
\ No newline at end of file
+#endif // MACROS_H
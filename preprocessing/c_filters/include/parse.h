@@ -0,0 +1,226 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#ifndef PARSE_H
+#define PARSE_H
+
+/*
+ * Field parsers working directly on the mapped csv buffer. Every parser takes a pointer to the
+ * start of a field and returns a pointer to the first character it did not consume, which is the
+ * delimiter for well formed input. No parser consumes a '\n' (or the '\0' of a string), so a
+ * short or blank line stops them at its end, and since lines always end in '\n' (see MappedFile)
+ * none can run past the end of the buffer.
+ */
+
+#include <datetime.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+/* "UP" or "DOWN" */
+typedef bool updown;
+
+static inline bool is_digit(char c)
+{
+    return (unsigned char)(c - '0') < 10;
+}
+
+static inline bool is_line_end(char c)
+{
+    return c == '\n' || c == '\0';
+}
+
+/* Steps over the separator at p, unless the line ends there */
+static inline const char *skip_separator(const char *p)
+{
+    return is_line_end(*p) ? p : p + 1;
+}
+
+static inline const char *skip_field(const char *p)
+{
+    while (*p != ',' && !is_line_end(*p))
+        p++;
+    return *p == ',' ? p + 1 : p;
+}
+
+static inline const char *next_line(const char *p, const char *end)
+{
+    const char *nl = memchr(p, '\n', end - p);
+    return nl ? nl + 1 : end;
+}
+
+static inline const char *parse_u64(const char *p, uint64_t *out)
+{
+    uint64_t value = 0;
+    while (is_digit(*p))
+        value = value * 10 + (*p++ - '0');
+    *out = value;
+    return p;
+}
+
+static inline const char *parse_i64(const char *p, int64_t *out)
+{
+    bool negative = *p == '-';
+    if (*p == '-' || *p == '+')
+        p++;
+    uint64_t value;
+    p = parse_u64(p, &value);
+    *out = negative ? -(int64_t)value : (int64_t)value;
+    return p;
+}
+
+static inline const char *parse_f64(const char *p, double *out)
+{
+    static const double pow10[] = { 1e0,  1e1,  1e2,  1e3,  1e4,  1e5,  1e6,  1e7,
+                                    1e8,  1e9,  1e10, 1e11, 1e12, 1e13, 1e14, 1e15,
+                                    1e16, 1e17, 1e18, 1e19, 1e20, 1e21, 1e22 };
+    const char *start = p;
+    bool negative = *p == '-';
+    if (*p == '-' || *p == '+')
+        p++;
+
+    uint64_t mantissa = 0;
+    int digits = 0;
+    int exponent = 0;
+    while (is_digit(*p)) {
+        mantissa = mantissa * 10 + (*p++ - '0');
+        digits++;
+    }
+    if (*p == '.') {
+        p++;
+        while (is_digit(*p)) {
+            mantissa = mantissa * 10 + (*p++ - '0');
+            digits++;
+            exponent--;
+        }
+    }
+    if (*p == 'e' || *p == 'E') {
+        int64_t e;
+        p = parse_i64(p + 1, &e);
+        exponent += e;
+    }
+
+    /* Exact as long as the mantissa fits in a double and the power of ten is exact, which covers
+     * everything the operator files contain. Anything else (nan, inf, long mantissas) goes to
+     * strtod, on a copy of the field, since strtod skips leading newlines and would not stop at
+     * the end of the buffer */
+    if (digits == 0 || digits > 15 || exponent < -22 || exponent > 22) {
+        char field[64];
+        size_t len = 0;
+        while (len < sizeof(field) - 1 && start[len] != ',' && !is_line_end(start[len])) {
+            field[len] = start[len];
+            len++;
+        }
+        field[len] = '\0';
+        char *stop;
+        *out = strtod(field, &stop);
+        return stop > field ? start + (stop - field) : p;
+    }
+    double value = (double)mantissa;
+    value = exponent < 0 ? value / pow10[-exponent] : value * pow10[exponent];
+    *out = negative ? -value : value;
+    return p;
+}
+
+/*
+ * "YYYY-MM-DD HH:MM:SS[.fraction]", fraction digits past nanoseconds are dropped. The number of
+ * fraction digits that are kept goes to digits, date_time_to_string writes the same number back.
+ */
+static inline const char *parse_date_time_digits(const char *p, DateTime *dt, uint8_t *digits)
+{
+    uint64_t year, month, day, hour, minute, second;
+    p = parse_u64(p, &year);
+    p = parse_u64(skip_separator(p), &month);
+    p = parse_u64(skip_separator(p), &day);
+    p = parse_u64(skip_separator(p), &hour);
+    p = parse_u64(skip_separator(p), &minute);
+    p = parse_u64(skip_separator(p), &second);
+
+    uint32_t nanosecond = 0;
+    uint8_t kept = 0;
+    if (*p == '.') {
+        p++;
+        for (; is_digit(*p); p++) {
+            if (kept < 9) {
+                nanosecond = nanosecond * 10 + (*p - '0');
+                kept++;
+            }
+        }
+        for (uint8_t i = kept; i < 9; i++) {
+            nanosecond *= 10;
+        }
+    }
+
+    *dt = make_datetime(year, month, day, hour, minute, second, nanosecond);
+    *digits = kept;
+    return p;
+}
+
+static inline const char *parse_date_time_field(const char *p, DateTime *dt)
+{
+    uint8_t digits;
+    return parse_date_time_digits(p, dt, &digits);
+}
+
+/* Column parsers used by GEN_STRUCT, named after the column type */
+
+static inline const char *uint8_t_parse(const char *p, uint8_t *out)
+{
+    uint64_t value;
+    p = parse_u64(p, &value);
+    *out = value;
+    return p;
+}
+
+static inline const char *uint16_t_parse(const char *p, uint16_t *out)
+{
+    uint64_t value;
+    p = parse_u64(p, &value);
+    *out = value;
+    return p;
+}
+
+static inline const char *uint64_t_parse(const char *p, uint64_t *out)
+{
+    return parse_u64(p, out);
+}
+
+static inline const char *int16_t_parse(const char *p, int16_t *out)
+{
+    int64_t value;
+    p = parse_i64(p, &value);
+    *out = value;
+    return p;
+}
+
+static inline const char *int64_t_parse(const char *p, int64_t *out)
+{
+    return parse_i64(p, out);
+}
+
+static inline const char *double_parse(const char *p, double *out)
+{
+    return parse_f64(p, out);
+}
+
+static inline const char *updown_parse(const char *p, updown *out)
+{
+    *out = p[0] == 'U' && p[1] == 'P';
+    return p;
+}
+
+#endif // PARSE_H
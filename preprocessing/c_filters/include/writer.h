@@ -0,0 +1,97 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#ifndef WRITER_H
+#define WRITER_H
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+
+/* Rows are formatted into a buffer of this size, which is written out with one write() once full */
+#define WRITER_BUFFER_SIZE ((size_t)4 << 20)
+
+typedef struct buffered_writer_t {
+    int fd;
+    char *buf;
+    size_t len;
+    size_t cap;
+    /* A write failed, the rest of the output is dropped */
+    bool failed;
+} BufferedWriter;
+
+bool writer_open(BufferedWriter *writer, const char *const path);
+
+void writer_flush(BufferedWriter *writer);
+
+/* Flushes and closes the file, false if anything could not be written */
+bool writer_close(BufferedWriter *writer);
+
+void writer_write(BufferedWriter *writer, const void *data, size_t size);
+
+/* Room for size bytes at the end of the buffer, formatters write there and writer_commit the end */
+static inline char *writer_reserve(BufferedWriter *writer, size_t size)
+{
+    if (writer->cap - writer->len < size)
+        writer_flush(writer);
+    return writer->buf + writer->len;
+}
+
+static inline void writer_commit(BufferedWriter *writer, const char *end)
+{
+    writer->len = end - writer->buf;
+}
+
+/*
+ * The columnar output, made to be read with numpy.memmap (see columnar.py). All numbers are little
+ * endian.
+ *
+ *   char     magic[8]            COLUMNAR_MAGIC
+ *   uint32   version             COLUMNAR_VERSION
+ *   uint32   ncols
+ *   uint64   nrows
+ *   ncols times:
+ *     char   name[32]            '\0' padded
+ *     char   dtype[16]           numpy dtype string, e.g. "<i2", '\0' padded
+ *     uint64 offset              of the column from the start of the file, a multiple of 8
+ *
+ * followed by the columns, nrows values each.
+ */
+#define COLUMNAR_MAGIC "CFCOLUMN"
+#define COLUMNAR_VERSION 1
+#define COLUMNAR_NAME_LEN 32
+#define COLUMNAR_DTYPE_LEN 16
+
+/* A column of a GEN_STRUCT table */
+typedef struct column_t {
+    const char *name;
+    const char *dtype;
+    size_t size;
+    const void *data;
+} Column;
+
+/* Most columns a GEN_STRUCT table can have, ts and node_id included */
+#define COLUMNS_MAX 16
+
+/*
+ * Writes the values at rows of the columns to path. The columns are named after the fields of the
+ * csv header, skipping network_id which the tables do not store, or after the columns themselves
+ * if header is NULL.
+ */
+bool columnar_write(const char *const path, const char *header, const Column *columns,
+                    size_t columns_len, const size_t *rows, size_t rows_len);
+
+#endif // WRITER_H
@@ -0,0 +1,124 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#include <cfilters.h>
+#include <csv.h>
+#include <filter.h>
+#include <math.h>
+#include <parse.h>
+#include <stdlib.h>
+#include <string.h>
+
+MappedFile *cf_open(const char *path)
+{
+    MappedFile *file = malloc(sizeof(MappedFile));
+    if (mapped_file_open(file, path) != 0) {
+        free(file);
+        return NULL;
+    }
+    return file;
+}
+
+size_t cf_rows(const MappedFile *file)
+{
+    return mapped_file_count_rows(file);
+}
+
+void cf_close(MappedFile *file)
+{
+    mapped_file_close(file);
+    free(file);
+}
+
+size_t cf_parse(const MappedFile *file, const CfLayout *layout, const PeriodIndex *periods,
+                int32_t network_id, char *out)
+{
+    const char *end = file->data + file->size;
+    size_t len = 0;
+    for (const char *p = mapped_file_rows(file); p < end; p = next_line(p, end)) {
+        if (*p == '\n')
+            continue;
+
+        DateTime dt;
+        uint16_t node_id, network;
+        p = parse_date_time_field(p, &dt);
+        p = uint16_t_parse(skip_separator(p), &node_id);
+        p = uint16_t_parse(skip_separator(p), &network);
+
+        if (network_id >= 0 && network != network_id)
+            continue;
+        if (periods && period_index_contains(periods, node_id, &dt))
+            continue;
+
+        char *row = out + len * layout->itemsize;
+        memcpy(row + layout->ts_offset, &dt, sizeof(dt));
+        memcpy(row + layout->node_id_offset, &node_id, sizeof(node_id));
+        memcpy(row + layout->network_id_offset, &network, sizeof(network));
+        for (size_t i = 0; i < layout->values_len; i++) {
+            double value = NAN;
+            if (*p == ',') {
+                const char *field = p + 1;
+                p = parse_f64(field, &value);
+                if (p == field || (*p != ',' && *p != '\n')) {
+                    value = NAN;
+                    for (p = field; *p != ',' && *p != '\n'; p++)
+                        ;
+                }
+            }
+            memcpy(row + layout->value_offsets[i], &value, sizeof(value));
+        }
+        len++;
+    }
+    return len;
+}
+
+void cf_parse_timestamps(const char *strings, size_t width, size_t len, int64_t *out)
+{
+    /* The longest strings fill their slot without a '\0', so every string is parsed from a copy
+     * that ends in one */
+    char *field = calloc(width + 1, 1);
+    for (size_t i = 0; i < len; i++) {
+        memcpy(field, strings + i * width, width);
+        parse_date_time_field(field, &out[i]);
+    }
+    free(field);
+}
+
+PeriodIndex *cf_period_index(const uint16_t *node_id, const int64_t *start, const int64_t *end,
+                             size_t len)
+{
+    NodeDownTime *periods = malloc((len + 1) * sizeof(NodeDownTime));
+    for (size_t i = 0; i < len; i++) {
+        periods[i].node_id = node_id[i];
+        periods[i].start_dt = start[i];
+        periods[i].end_dt = end[i];
+    }
+
+    PeriodIndex *index = period_index_from_periods(periods, len);
+    free(periods);
+    return index;
+}
+
+void cf_period_index_free(PeriodIndex *periods)
+{
+    period_index_free(periods);
+}
+
+void cf_mask_bad_periods(const int64_t *ts, const uint16_t *node_id, size_t len,
+                         const PeriodIndex *periods, uint32_t threads, uint8_t *keep)
+{
+    filter_bad_times_mask(ts, node_id, len, periods, threads, keep);
+}
@@ -16,63 +16,190 @@
  */
 #include <csv.h>
 #include <datetime.h>
+#include <fcntl.h>
+#include <parse.h>
+#include <sha256.h>
 #include <stdbool.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
 #include <sys/types.h>
+#include <unistd.h>
 
-int qsort_cmp(const void *a, const void *b)
+/* By node, then time, then line, so events at the same time keep the order of the file */
+int mode_event_cmp(const void *a, const void *b)
 {
-    return ((ModeEventData *)a)->node_id - ((ModeEventData *)b)->node_id;
+    const ModeEventData *x = a;
+    const ModeEventData *y = b;
+    if (x->node_id != y->node_id)
+        return x->node_id - y->node_id;
+    if (x->dt != y->dt)
+        return compare_datetime(&x->dt, &y->dt);
+    return (x->line > y->line) - (x->line < y->line);
 }
 
-int csv_parse_file(const char *const filename, void **data, parse_func_t parse_func)
+int downtime_cmp(const void *a, const void *b)
 {
-    FILE *fp = fopen(filename, "r");
-    if (!fp) {
+    const NodeDownTime *x = a;
+    const NodeDownTime *y = b;
+    if (x->node_id != y->node_id)
+        return x->node_id - y->node_id;
+    return compare_datetime(&x->start_dt, &y->start_dt);
+}
+
+int mapped_file_open(MappedFile *file, const char *const filename)
+{
+    int fd = open(filename, O_RDONLY);
+    if (fd < 0) {
         fprintf(stderr, "Error opening file with name %s!\n", filename);
         return 1;
     }
 
-    ssize_t read = 0;
-    char *line;
-    size_t len = 0;
-    int i = 0;
-    bool first = true;
+    struct stat st;
+    if (fstat(fd, &st) != 0) {
+        close(fd);
+        return 1;
+    }
 
-    while ((read = getline(&line, &len, fp)) != -1) {
-        if (first) {
-            first = false;
+    file->size = st.st_size;
+    file->mapped = false;
+
+    if (file->size == 0) {
+        char *empty = malloc(1);
+        empty[0] = '\n';
+        file->data = empty;
+        file->size = 1;
+        close(fd);
+        return 0;
+    }
+
+    char *data = mmap(NULL, file->size, PROT_READ, MAP_PRIVATE, fd, 0);
+    if (data == MAP_FAILED) {
+        fprintf(stderr, "Error mapping file with name %s!\n", filename);
+        close(fd);
+        return 1;
+    }
+    posix_madvise(data, file->size, POSIX_MADV_SEQUENTIAL);
+
+    if (data[file->size - 1] == '\n') {
+        file->data = data;
+        file->mapped = true;
+    } else {
+        char *copy = malloc(file->size + 1);
+        memcpy(copy, data, file->size);
+        copy[file->size++] = '\n';
+        munmap(data, st.st_size);
+        file->data = copy;
+    }
+
+    close(fd);
+    return 0;
+}
+
+void mapped_file_close(MappedFile *file)
+{
+    if (file->mapped)
+        munmap((void *)file->data, file->size);
+    else
+        free((void *)file->data);
+}
+
+const char *mapped_file_rows(const MappedFile *file)
+{
+    const char *nl = memchr(file->data, '\n', file->size);
+    return nl + 1;
+}
+
+size_t mapped_file_count_rows(const MappedFile *file)
+{
+    const char *end = file->data + file->size;
+    size_t rows = 0;
+    for (const char *p = mapped_file_rows(file); p < end; rows++) {
+        p = memchr(p, '\n', end - p) + 1;
+    }
+    return rows;
+}
+
+NodeDownTimeLen *parse_mode_file(const char *const filename)
+{
+    MappedFile file;
+    if (mapped_file_open(&file, filename) != 0)
+        return NULL;
+
+    /* ts,node_id,network_id,mode */
+    const size_t rows = mapped_file_count_rows(&file);
+    ModeEventData *events = malloc((rows + 1) * sizeof(ModeEventData));
+    size_t events_len = 0;
+    const char *end = file.data + file.size;
+    for (const char *p = mapped_file_rows(&file); p < end; p = next_line(p, end)) {
+        if (*p == '\n')
             continue;
-        }
+        ModeEventData *event = &events[events_len];
+        p = parse_date_time_field(p, &event->dt);
+        p = uint16_t_parse(skip_field(p), &event->node_id);
+        p = uint8_t_parse(skip_field(skip_field(p)), &event->mode);
+        event->line = events_len++;
+    }
+    mapped_file_close(&file);
+
+    qsort(events, events_len, sizeof(ModeEventData), mode_event_cmp);
 
-        if (line) {
-            parse_func(line, data, i);
-            i++;
+    /* A period per mode 0 event of a node that is up, closed by the next mode 6 event of the node.
+     * The same state machine as filter.pair_mode_events: a 0 while down and a 6 while up do
+     * nothing, so there are at most half as many periods as events. */
+    NodeDownTimeLen *ret = malloc(sizeof(NodeDownTimeLen));
+    ret->arr = malloc((events_len / 2 + 1) * sizeof(NodeDownTime));
+    ret->len = 0;
+    size_t unmatched = 0;
+    for (size_t i = 0; i < events_len;) {
+        const uint16_t node_id = events[i].node_id;
+        bool down = false;
+        DateTime start = 0;
+        for (; i < events_len && events[i].node_id == node_id; i++) {
+            if (events[i].mode == 0 && !down) {
+                down = true;
+                start = events[i].dt;
+            } else if (events[i].mode == 6 && down) {
+                down = false;
+                ret->arr[ret->len++] = (NodeDownTime){ start, events[i].dt, node_id };
+            }
         }
+        /* The node is still down at the end of the file. filter.py does not filter these rows
+         * either, when the period ends is only known once the node is up again */
+        if (down)
+            unmatched++;
     }
 
-    free(line);
-    fclose(fp);
+    if (unmatched > 0)
+        fprintf(stderr, "%zu nodes are still down at the end of %s, their rows are kept!\n",
+                unmatched, filename);
 
-    return 0;
+    free(events);
+    return ret;
+}
+
+void node_down_time_len_free(NodeDownTimeLen *dt_data)
+{
+    free(dt_data->arr);
+    free(dt_data);
 }
 
-NodeDownTimeLen *parse_mode_file()
+NodeDownTimeLen *parse_downtime_file(const char *const filename)
 {
-    FILE *fp = fopen(MODE_FILENAME, "r");
+    FILE *fp = fopen(filename, "r");
     if (!fp) {
-        fprintf(stderr, "Error opening file with name %s!\n", MODE_FILENAME);
+        fprintf(stderr, "Error opening file with name %s!\n", filename);
         return NULL;
     }
 
-    ModeEventData mode_arr[MODE_LINES_IN_FILE] = { 0 };
+    List periods;
+    list_init(&periods, sizeof(NodeDownTime));
 
     ssize_t read = 0;
-    char *line;
+    char *line = NULL;
     size_t len = 0;
-    int i = 0;
     bool first = true;
 
     while ((read = getline(&line, &len, fp)) != -1) {
@@ -81,50 +208,40 @@ NodeDownTimeLen *parse_mode_file()
             continue;
         }
 
-        if (line) {
-            char *save_ptr = NULL;
-            char *date = strtok_r(line, ",", &save_ptr);
-            parse_date_time(&mode_arr[i].dt, date);
-
-            char *node_id = strtok_r(NULL, ",", &save_ptr);
-            mode_arr[i].node_id = atoi(node_id);
-
-            strtok_r(NULL, ",", &save_ptr);
+        char *save_ptr = NULL;
+        char *node_id = strtok_r(line, ",", &save_ptr);
+        char *start = strtok_r(NULL, ",", &save_ptr);
+        char *end = strtok_r(NULL, ",\n", &save_ptr);
+        if (!node_id || !start || !end)
+            continue;
 
-            char *mode = strtok_r(NULL, ",", &save_ptr);
-            mode_arr[i].mode = atoi(mode);
-            i++;
-        }
+        NodeDownTime period;
+        period.node_id = atoi(node_id);
+        parse_date_time(&period.start_dt, start);
+        parse_date_time(&period.end_dt, end);
+        list_append(&periods, &period);
     }
 
     free(line);
-
-    qsort(mode_arr, MODE_LINES_IN_FILE, sizeof(ModeEventData), qsort_cmp);
-
-    i = 0;
-
-    NodeDownTime **arr = malloc((MODE_LINES_IN_FILE + 1 / 2) * sizeof(NodeDownTime *));
-    for (int j = 0; j < (MODE_LINES_IN_FILE + 1 / 2); j++) {
-        arr[j] = malloc(sizeof(NodeDownTime));
-    }
-
-    for (int j = 0; j < MODE_LINES_IN_FILE; j++) {
-        if (mode_arr[j].mode == 0) {
-            for (int k = j + 1; k < MODE_LINES_IN_FILE; k++) {
-                if (mode_arr[k].mode == 6 && mode_arr[j].node_id == mode_arr[k].node_id) {
-                    arr[i]->start_dt = mode_arr[j].dt;
-                    arr[i]->end_dt = mode_arr[k].dt;
-                    arr[i]->node_id = mode_arr[k].node_id;
-                    i++;
-                    break;
-                }
-            }
-        }
-    }
+    fclose(fp);
 
     NodeDownTimeLen *ret = malloc(sizeof(NodeDownTimeLen));
-    ret->len = i;
-    ret->arr = arr;
+    ret->len = periods.size;
+    ret->arr = malloc((periods.size + 1) * sizeof(NodeDownTime));
+    memcpy(ret->arr, periods.items, periods.size * sizeof(NodeDownTime));
+    list_free(&periods);
+
+    qsort(ret->arr, ret->len, sizeof(NodeDownTime), downtime_cmp);
 
     return ret;
-}
\ No newline at end of file
+}
+
+bool downtime_file_path(char *path, size_t len, const char *const downtime_dir,
+                        const char *const mode_file)
+{
+    char digest[SHA256_HEX_LEN + 1];
+    if (!sha256_file_hex(mode_file, digest))
+        return false;
+    snprintf(path, len, PERIODS_FILENAME_FORMAT, downtime_dir, digest);
+    return true;
+}
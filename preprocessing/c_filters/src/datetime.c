@@ -15,45 +15,103 @@
  *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
  */
 #include <datetime.h>
-#include <stdio.h>
+#include <parse.h>
+#include <string.h>
 
-int compare_datetime(const DateTime *const restrict a, const DateTime *const restrict b)
+static const char digit_pairs[201] = "00010203040506070809"
+                                     "10111213141516171819"
+                                     "20212223242526272829"
+                                     "30313233343536373839"
+                                     "40414243444546474849"
+                                     "50515253545556575859"
+                                     "60616263646566676869"
+                                     "70717273747576777879"
+                                     "80818283848586878889"
+                                     "90919293949596979899";
+
+static inline char *put_two_digits(char *p, unsigned value)
+{
+    memcpy(p, &digit_pairs[value * 2], 2);
+    return p + 2;
+}
+
+static char *put_digits(char *p, uint32_t value, int digits)
 {
-    if (a->year == b->year) {
-        if (a->month == b->month) {
-            if (a->day == b->day) {
-                if (a->hour == b->hour) {
-                    if (a->minute == b->minute) {
-                        if (a->second == b->second) {
-                            return a->nanosecond - b->nanosecond;
-                        } else {
-                            return a->second - b->second;
-                        }
-                    } else {
-                        return a->minute - b->minute;
-                    }
-                } else {
-                    return a->hour - b->hour;
-                }
-            } else {
-                return a->day - b->day;
-            }
-        } else {
-            return a->month - b->month;
-        }
-    } else {
-        return a->year - b->year;
+    for (int i = digits - 1; i >= 0; i--) {
+        p[i] = '0' + value % 10;
+        value /= 10;
     }
+    return p + digits;
+}
+
+/* "YYYY-MM-DD " of the days since the epoch */
+static void date_prefix(int64_t days, char *prefix)
+{
+    days += 719468;
+    const int64_t era = (days >= 0 ? days : days - 146096) / 146097;
+    const unsigned doe = (unsigned)(days - era * 146097);
+    const unsigned yoe = (doe - doe / 1460 + doe / 36524 - doe / 146096) / 365;
+    const unsigned doy = doe - (365 * yoe + yoe / 4 - yoe / 100);
+    const unsigned mp = (5 * doy + 2) / 153;
+    const unsigned day = doy - (153 * mp + 2) / 5 + 1;
+    const unsigned month = mp < 10 ? mp + 3 : mp - 9;
+    const int64_t year = (int64_t)yoe + era * 400 + (month <= 2);
+
+    char *p = put_digits(prefix, year, 4);
+    *p++ = '-';
+    p = put_two_digits(p, month);
+    *p++ = '-';
+    p = put_two_digits(p, day);
+    *p = ' ';
 }
 
 int parse_date_time(DateTime *restrict dt, char *const datestr)
 {
-    return sscanf(datestr, "%hd-%hhd-%hhd %hhd:%hhd:%hhd.%ld", &dt->year, &dt->month, &dt->day,
-                  &dt->hour, &dt->minute, &dt->second, &dt->nanosecond);
+    parse_date_time_field(datestr, dt);
+    return 0;
 }
 
-void date_time_to_string(const DateTime *const restrict dt, char *restrict datestr)
+size_t date_time_to_string(const DateTime *const restrict dt, uint8_t digits,
+                           char *restrict datestr)
 {
-    snprintf(datestr, 50, "%02d-%02d-%02d %02d:%02d:%02d.%05lu", dt->year, dt->month, dt->day,
-             dt->hour, dt->minute, dt->second, dt->nanosecond);
-}
\ No newline at end of file
+    /* The rows of a file are mostly in time order, so the date rarely changes between calls. Every
+     * thread formats its own file, hence one cache per thread */
+    static _Thread_local int64_t cached_days = INT64_MIN;
+    static _Thread_local char cached_prefix[11];
+
+    int64_t seconds = *dt / NS_PER_SECOND;
+    int64_t nanosecond = *dt % NS_PER_SECOND;
+    if (nanosecond < 0) {
+        nanosecond += NS_PER_SECOND;
+        seconds--;
+    }
+    int64_t days = seconds / SECONDS_PER_DAY;
+    int64_t second_of_day = seconds % SECONDS_PER_DAY;
+    if (second_of_day < 0) {
+        second_of_day += SECONDS_PER_DAY;
+        days--;
+    }
+
+    if (days != cached_days) {
+        date_prefix(days, cached_prefix);
+        cached_days = days;
+    }
+
+    char *p = datestr;
+    memcpy(p, cached_prefix, sizeof(cached_prefix));
+    p += sizeof(cached_prefix);
+    p = put_two_digits(p, second_of_day / 3600);
+    *p++ = ':';
+    p = put_two_digits(p, second_of_day / 60 % 60);
+    *p++ = ':';
+    p = put_two_digits(p, second_of_day % 60);
+    if (digits > 0) {
+        static const uint32_t pow10[] = { 1,      10,      100,      1000,      10000,
+                                          100000, 1000000, 10000000, 100000000, 1000000000 };
+        digits = digits < 9 ? digits : 9;
+        *p++ = '.';
+        p = put_digits(p, nanosecond / pow10[9 - digits], digits);
+    }
+    *p = '\0';
+    return p - datestr;
+}
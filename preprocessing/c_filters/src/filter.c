@@ -0,0 +1,210 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#include <filter.h>
+#include <pthread.h>
+#include <stdatomic.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+#define NODE_COUNT (UINT16_MAX + 1)
+
+static int period_cmp(const void *a, const void *b)
+{
+    const NodeDownTime *x = a;
+    const NodeDownTime *y = b;
+    if (x->node_id != y->node_id)
+        return x->node_id - y->node_id;
+    return compare_datetime(&x->start_dt, &y->start_dt);
+}
+
+PeriodIndex *period_index_from_periods(NodeDownTime *sorted, uint32_t periods_len)
+{
+    PeriodIndex *index = calloc(1, sizeof(PeriodIndex));
+    index->start = malloc((periods_len + 1) * sizeof(DateTime));
+    index->end = malloc((periods_len + 1) * sizeof(DateTime));
+
+    qsort(sorted, periods_len, sizeof(NodeDownTime), period_cmp);
+
+    /* Merge the overlapping periods of a node and drop the empty ones, so at most one period can
+     * start at or before a timestamp and still contain it */
+    uint32_t len = 0;
+    int32_t last_node = -1;
+    for (uint32_t i = 0; i < periods_len; i++) {
+        const NodeDownTime *period = &sorted[i];
+        if (period->start_dt >= period->end_dt)
+            continue;
+        if (last_node == period->node_id && period->start_dt <= index->end[len - 1]) {
+            if (period->end_dt > index->end[len - 1])
+                index->end[len - 1] = period->end_dt;
+            continue;
+        }
+        index->start[len] = period->start_dt;
+        index->end[len] = period->end_dt;
+        index->offset[period->node_id + 1]++;
+        last_node = period->node_id;
+        len++;
+    }
+
+    /* Counts to offsets */
+    for (uint32_t n = 1; n <= NODE_COUNT; n++) {
+        index->offset[n] += index->offset[n - 1];
+    }
+
+    return index;
+}
+
+PeriodIndex *period_index_build(const NodeDownTimeLen *dt_data)
+{
+    NodeDownTime *periods = malloc((dt_data->len + 1) * sizeof(NodeDownTime));
+    memcpy(periods, dt_data->arr, dt_data->len * sizeof(NodeDownTime));
+
+    PeriodIndex *index = period_index_from_periods(periods, dt_data->len);
+    free(periods);
+    return index;
+}
+
+void period_index_free(PeriodIndex *index)
+{
+    free(index->start);
+    free(index->end);
+    free(index);
+}
+
+bool period_index_contains(const PeriodIndex *index, uint16_t node_id, const DateTime *dt)
+{
+    uint32_t lo = index->offset[node_id];
+    uint32_t hi = index->offset[node_id + 1];
+
+    /* Find the first period starting after dt, the one before it is the only candidate */
+    while (lo < hi) {
+        uint32_t mid = lo + (hi - lo) / 2;
+        if (index->start[mid] <= *dt)
+            lo = mid + 1;
+        else
+            hi = mid;
+    }
+
+    return lo > index->offset[node_id] && *dt < index->end[lo - 1];
+}
+
+static void *filter_bad_times_thread(void *args)
+{
+    FilterThreadData *data = (FilterThreadData *)args;
+    size_t i;
+    while ((i = atomic_fetch_add(data->next_node, 1)) < data->nodes_len) {
+        const uint16_t node_id = data->nodes[i];
+        const size_t *rows = data->rows + data->row_offset[node_id];
+        const size_t rows_len = data->row_offset[node_id + 1] - data->row_offset[node_id];
+
+        if (data->periods->offset[node_id] == data->periods->offset[node_id + 1]) {
+            /* A node that was never down keeps every row */
+            for (size_t j = 0; j < rows_len; j++) {
+                data->keep[rows[j]] = 1;
+            }
+            continue;
+        }
+
+        for (size_t j = 0; j < rows_len; j++) {
+            data->keep[rows[j]] =
+                !period_index_contains(data->periods, node_id, &data->dt[rows[j]]);
+        }
+    }
+
+    return NULL;
+}
+
+void filter_bad_times_mask(const DateTime *dt, const uint16_t *node_id, size_t len,
+                           const PeriodIndex *periods, uint32_t threads, uint8_t *keep)
+{
+    /* Counting sort of the row numbers by node, the rows of a node stay in file order */
+    size_t *row_offset = calloc(NODE_COUNT + 1, sizeof(size_t));
+    for (size_t i = 0; i < len; i++) {
+        row_offset[node_id[i] + 1]++;
+    }
+
+    uint16_t *nodes = malloc(NODE_COUNT * sizeof(uint16_t));
+    size_t nodes_len = 0;
+    for (uint32_t n = 0; n < NODE_COUNT; n++) {
+        if (row_offset[n + 1] > 0)
+            nodes[nodes_len++] = n;
+        row_offset[n + 1] += row_offset[n];
+    }
+
+    size_t *rows = malloc((len + 1) * sizeof(size_t));
+    size_t *fill = malloc(NODE_COUNT * sizeof(size_t));
+    memcpy(fill, row_offset, NODE_COUNT * sizeof(size_t));
+    for (size_t i = 0; i < len; i++) {
+        rows[fill[node_id[i]]++] = i;
+    }
+    free(fill);
+
+    if (threads == 0) {
+        long cpus = sysconf(_SC_NPROCESSORS_ONLN);
+        threads = cpus > 0 ? cpus : 1;
+    }
+    if (threads > nodes_len)
+        threads = nodes_len > 0 ? nodes_len : 1;
+
+    atomic_size_t next_node = 0;
+    FilterThreadData data = {
+        .dt = dt,
+        .periods = periods,
+        .rows = rows,
+        .row_offset = row_offset,
+        .nodes = nodes,
+        .nodes_len = nodes_len,
+        .next_node = &next_node,
+        .keep = keep,
+    };
+
+    pthread_t *workers = malloc(threads * sizeof(pthread_t));
+    uint32_t started = 0;
+    for (; started < threads - 1; started++) {
+        if (pthread_create(&workers[started], NULL, filter_bad_times_thread, &data) != 0)
+            break;
+    }
+    /* The calling thread works too, which also covers a failed pthread_create */
+    filter_bad_times_thread(&data);
+    for (uint32_t i = 0; i < started; i++) {
+        pthread_join(workers[i], NULL);
+    }
+
+    free(workers);
+    free(rows);
+    free(nodes);
+    free(row_offset);
+}
+
+void filter_bad_times(const DateTime *dt, const uint16_t *node_id, size_t len,
+                      const NodeDownTimeLen *dt_data, uint32_t threads, List *new_rows)
+{
+    PeriodIndex *periods = period_index_build(dt_data);
+    uint8_t *keep = malloc(len + 1);
+    filter_bad_times_mask(dt, node_id, len, periods, threads, keep);
+
+    /* Collecting the rows in file order keeps the output independent of the thread count */
+    for (size_t i = 0; i < len; i++) {
+        if (keep[i])
+            list_append(new_rows, &i);
+    }
+
+    free(keep);
+    period_index_free(periods);
+}
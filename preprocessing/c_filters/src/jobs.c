@@ -0,0 +1,148 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#include <jobs.h>
+#include <pthread.h>
+#include <stdatomic.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+void memory_budget_init(MemoryBudget *budget, size_t total)
+{
+    pthread_mutex_init(&budget->lock, NULL);
+    pthread_cond_init(&budget->released, NULL);
+    budget->total = total;
+    budget->used = 0;
+}
+
+void memory_budget_destroy(MemoryBudget *budget)
+{
+    pthread_cond_destroy(&budget->released);
+    pthread_mutex_destroy(&budget->lock);
+}
+
+void memory_budget_acquire(MemoryBudget *budget, size_t bytes)
+{
+    pthread_mutex_lock(&budget->lock);
+    while (budget->used > 0 && budget->used + bytes > budget->total) {
+        pthread_cond_wait(&budget->released, &budget->lock);
+    }
+    budget->used += bytes;
+    pthread_mutex_unlock(&budget->lock);
+}
+
+void memory_budget_release(MemoryBudget *budget, size_t bytes)
+{
+    pthread_mutex_lock(&budget->lock);
+    budget->used -= bytes;
+    pthread_cond_broadcast(&budget->released);
+    pthread_mutex_unlock(&budget->lock);
+}
+
+size_t memory_budget_default(void)
+{
+    long pages = sysconf(_SC_PHYS_PAGES);
+    long page_size = sysconf(_SC_PAGESIZE);
+    if (pages <= 0 || page_size <= 0)
+        return (size_t)1 << 30;
+    return (size_t)pages * page_size / 2;
+}
+
+void job_output_path(const JobConfig *config, const char *file_name, char *path, size_t len)
+{
+    if (config->format == OUTPUT_COLUMNAR) {
+        const char *dot = strrchr(file_name, '.');
+        int stem = dot ? (int)(dot - file_name) : (int)strlen(file_name);
+        snprintf(path, len, "%s/%.*s.bin", config->out_dir, stem, file_name);
+    } else {
+        snprintf(path, len, "%s/%s", config->out_dir, file_name);
+    }
+}
+
+typedef struct job_queue_t {
+    const Job **jobs;
+    size_t len;
+    atomic_size_t next;
+    atomic_size_t failed;
+    const JobConfig *config;
+} JobQueue;
+
+typedef struct sized_job_t {
+    const Job *job;
+    off_t size;
+} SizedJob;
+
+static int sized_job_cmp(const void *a, const void *b)
+{
+    const SizedJob *x = a;
+    const SizedJob *y = b;
+    return (x->size < y->size) - (x->size > y->size);
+}
+
+static void *run_jobs_thread(void *args)
+{
+    JobQueue *queue = (JobQueue *)args;
+    size_t i;
+    while ((i = atomic_fetch_add(&queue->next, 1)) < queue->len) {
+        if (queue->jobs[i]->run(queue->config) != 0)
+            atomic_fetch_add(&queue->failed, 1);
+    }
+    return NULL;
+}
+
+size_t run_jobs(const Job *const *jobs, size_t len, const JobConfig *config, uint32_t concurrent)
+{
+    SizedJob *sized = malloc((len + 1) * sizeof(SizedJob));
+    for (size_t i = 0; i < len; i++) {
+        char path[JOB_PATH_LEN];
+        struct stat st;
+        snprintf(path, sizeof(path), "%s/%s", config->in_dir, jobs[i]->file_name);
+        sized[i].job = jobs[i];
+        sized[i].size = stat(path, &st) == 0 ? st.st_size : 0;
+    }
+    qsort(sized, len, sizeof(SizedJob), sized_job_cmp);
+
+    JobQueue queue = { .jobs = malloc((len + 1) * sizeof(Job *)), .len = len, .config = config };
+    atomic_init(&queue.next, 0);
+    atomic_init(&queue.failed, 0);
+    for (size_t i = 0; i < len; i++) {
+        queue.jobs[i] = sized[i].job;
+    }
+    free(sized);
+
+    if (concurrent == 0)
+        concurrent = 1;
+    if (concurrent > len)
+        concurrent = len > 0 ? len : 1;
+
+    pthread_t *workers = malloc(concurrent * sizeof(pthread_t));
+    uint32_t started = 0;
+    for (; started < concurrent - 1; started++) {
+        if (pthread_create(&workers[started], NULL, run_jobs_thread, &queue) != 0)
+            break;
+    }
+    run_jobs_thread(&queue);
+    for (uint32_t i = 0; i < started; i++) {
+        pthread_join(workers[i], NULL);
+    }
+
+    free(workers);
+    free(queue.jobs);
+    return atomic_load(&queue.failed);
+}
@@ -17,6 +17,7 @@
 #include <csv.h>
 #include <datatype.h>
 #include <datetime.h>
+#include <filter.h>
 #include <lib/list.h>
 #include <macros.h>
 #include <pthread.h>
@@ -27,82 +28,14 @@
 #include <string.h>
 #include <sys/types.h>
 #include <time.h>
-
-void *filter_bad_times_thread(void *args)
-{
-    FilterThreadData *data = (FilterThreadData *)args;
-    const uint16_t node_id = data->dt_data->arr[data->start]->node_id;
-    for (size_t i = 0; i < data->len; i++) {
-        if (((AbstractData *)data->data[i])->node_id == node_id) {
-            bool add = true;
-            for (uint16_t j = data->start; j < data->end; j++) {
-                if (compare_datetime(&((AbstractData *)data->data[i])->dt,
-                                     &data->dt_data->arr[j]->start_dt) >= 0 &&
-                    compare_datetime(&((AbstractData *)data->data[i])->dt,
-                                     &data->dt_data->arr[j]->end_dt) <= 0) {
-                    add = false;
-                    break;
-                }
-            }
-            if (add) {
-                list_append(data->new_rows, &data->data[i]);
-            }
-        }
-    }
-
-    return NULL;
-}
-
-void filter_bad_times(void **data, NodeDownTimeLen *dt_data, List *new_rows, size_t file_len)
-{
-    NodeDownTime **dt_arr = (dt_data->arr);
-    uint32_t start = 0;
-    uint16_t curr_node_id = (*dt_arr)->node_id;
-    for (uint32_t i = 0; i < dt_data->len; i++) {
-        NodeDownTime *curr = dt_arr[i];
-        if (curr->node_id != curr_node_id) {
-            FilterThreadData *args = malloc(sizeof(FilterThreadData));
-            args->start = start;
-            args->end = i - 1;
-            args->data = data;
-            args->dt_data = dt_data;
-            args->new_rows = new_rows;
-            args->len = file_len;
-            filter_bad_times_thread(args);
-            start = i;
-            curr_node_id = curr->node_id;
-        }
-    }
-}
+#include <unistd.h>
 
 /* USB Modem Events Start */
 
-typedef struct usbmodem_data_t {
-    DateTime dt;
-    uint16_t node_id;
-    bool state;
-    double value;
-} USBModemData;
-
-void parse_usb_modem_line(char *line, void *data, int i)
-{
-    USBModemData **usb_data = (USBModemData **)data;
-    char *save_ptr = NULL;
-    char *date = strtok_r(line, ",", &save_ptr);
-    parse_date_time(&usb_data[i]->dt, date);
-
-    char *node_id = strtok_r(NULL, ",", &save_ptr);
-    usb_data[i]->node_id = atoi(node_id);
-    strtok_r(NULL, ",", &save_ptr);
-    usb_data[i]->state = strcmp(strtok_r(NULL, ",", &save_ptr), "UP") == 0 ? true : false;
-    usb_data[i]->value = atof(strtok_r(NULL, ",", &save_ptr));
-}
+GEN_STRUCT(USBModemData, updown, state, double, value);
 
-GEN_FUNCTION(usbmodem_parse_print, USBModemData, "operator/metadata_usbmodem_events.csv",
-             "time_filtered/metadata_usbmodem_events.csv", 20114,
-             "ts,node_id,network_id,usbmodem_state,usbmodem_value\n", parse_usb_modem_line,
-             "%s,%d,%d,%s,%f\n", date, (*row)->node_id, 2, (*row)->state ? "UP" : "DOWN",
-             (*row)->value);
+GEN_FUNCTION(usbmodem_parse_print, USBModemData, "metadata_usbmodem_events.csv",
+             "ts,node_id,network_id,usbmodem_state,usbmodem_value\n", parse_USBModemData_line);
 
 /* USB Modem Events End */
 
@@ -110,14 +43,11 @@ GEN_FUNCTION(usbmodem_parse_print, USBModemData, "operator/metadata_usbmodem_eve
 
 GEN_STRUCT(BandData, uint16_t, band);
 
-GEN_FUNCTION(band_1min_parse_print, BandData, "operator/metadata_band_1min_bin.csv",
-             "time_filtered/metadata_band_1min_bin.csv", 2126380,
-             "ts,node_id,network_id,band\n", parse_BandData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->band);
+GEN_FUNCTION(band_1min_parse_print, BandData, "metadata_band_1min_bin.csv",
+             "ts,node_id,network_id,band\n", parse_BandData_line);
 
-GEN_FUNCTION(band_events_parse_print, BandData, "operator/metadata_band_events.csv",
-             "time_filtered/metadata_band_events.csv", 53938, "ts,node_id,network_id,band\n",
-             parse_BandData_line, "%s,%d,%d,%d\n", date, (*row)->node_id, 2, (*row)->band);
+GEN_FUNCTION(band_events_parse_print, BandData, "metadata_band_events.csv",
+             "ts,node_id,network_id,band\n", parse_BandData_line);
 
 /* Band End */
 
@@ -125,326 +55,411 @@ GEN_FUNCTION(band_events_parse_print, BandData, "operator/metadata_band_events.c
 GEN_STRUCT(PacketLossData, uint8_t, service_id, uint16_t, scnt, uint16_t, rcnt, double, rtt);
 
 GEN_FUNCTION(packet_loss_raw_1sec_parse_print, PacketLossData,
-             "operator/packetloss_rtt_rawdata_1sec_bins.csv",
-             "time_filtered/packetloss_rtt_rawdata_1sec_bins.csv", 114806375,
-             "ts,node_id,network_id,service_id,scnt,rcnt,rtt\n", parse_PacketLossData_line,
-             "%s,%d,%d,%d,%d,%d,%f\n", date, (*row)->node_id, 2, (*row)->service_id, (*row)->scnt,
-             (*row)->rcnt, (*row)->rtt);
+             "packetloss_rtt_rawdata_1sec_bins.csv",
+             "ts,node_id,network_id,service_id,scnt,rcnt,rtt\n", parse_PacketLossData_line);
 
 GEN_FUNCTION(packet_loss_raw_5min_parse_print, PacketLossData,
-             "operator/packetloss_rtt_rawdata_5min_bins.csv",
-             "time_filtered/packetloss_rtt_rawdata_5min_bins.csv", 386177,
-             "ts,node_id,network_id,service_id,scnt,rcnt,rtt_avg\n", parse_PacketLossData_line,
-             "%s,%d,%d,%d,%d,%d,%f\n", date, (*row)->node_id, 2, (*row)->service_id, (*row)->scnt,
-             (*row)->rcnt, (*row)->rtt);
-
-GEN_FUNCTION(packet_loss_5min_parse_print, PacketLossData, "operator/packetloss_rtt_5min_bins.csv",
-             "time_filtered/packetloss_rtt_5min_bins.csv", 340857,
-             "ts,node_id,network_id,service_id,scnt,rcnt,rtt_avg\n", parse_PacketLossData_line,
-             "%s,%d,%d,%d,%d,%d,%f\n", date, (*row)->node_id, 2, (*row)->service_id, (*row)->scnt,
-             (*row)->rcnt, (*row)->rtt);
+             "packetloss_rtt_rawdata_5min_bins.csv",
+             "ts,node_id,network_id,service_id,scnt,rcnt,rtt_avg\n", parse_PacketLossData_line);
+
+GEN_FUNCTION(packet_loss_5min_parse_print, PacketLossData, "packetloss_rtt_5min_bins.csv",
+             "ts,node_id,network_id,service_id,scnt,rcnt,rtt_avg\n", parse_PacketLossData_line);
 /* Packet Loss End */
 
 /* CE Level Start */
 GEN_STRUCT(CELevelData, int16_t, celevel);
 
-GEN_FUNCTION(celevel_1min_parse_print, CELevelData, "operator/metadata_celevel_1min_bin.csv",
-             "time_filtered/metadata_celevel_1min_bin.csv", 2126385,
-             "ts,node_id,network_id,celevel\n", parse_CELevelData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->celevel);
+GEN_FUNCTION(celevel_1min_parse_print, CELevelData, "metadata_celevel_1min_bin.csv",
+             "ts,node_id,network_id,celevel\n", parse_CELevelData_line);
 
-GEN_FUNCTION(celevel_events_parse_print, CELevelData, "operator/metadata_celevel_events.csv",
-             "time_filtered/metadata_celevel_events.csv", 10094,
-             "ts,node_id,network_id,celevel\n", parse_CELevelData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->celevel);
+GEN_FUNCTION(celevel_events_parse_print, CELevelData, "metadata_celevel_events.csv",
+             "ts,node_id,network_id,celevel\n", parse_CELevelData_line);
 /* CE Level End */
 
 /* Cid Start */
 GEN_STRUCT(CidData, int16_t, cid);
 
-GEN_FUNCTION(cid_1min_parse_print, CidData, "operator/metadata_cid_1min_bin.csv",
-             "time_filtered/metadata_cid_1min_bin.csv", 2126385,
-             "ts,node_id,network_id,cid\n", parse_CidData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->cid);
+GEN_FUNCTION(cid_1min_parse_print, CidData, "metadata_cid_1min_bin.csv",
+             "ts,node_id,network_id,cid\n", parse_CidData_line);
 
-GEN_FUNCTION(cid_events_parse_print, CidData, "operator/metadata_cid_events.csv",
-             "time_filtered/metadata_cid_events.csv", 10115, "ts,node_id,network_id,cid\n",
-             parse_CidData_line, "%s,%d,%d,%d\n", date, (*row)->node_id, 2, (*row)->cid);
+GEN_FUNCTION(cid_events_parse_print, CidData, "metadata_cid_events.csv",
+             "ts,node_id,network_id,cid\n",
+             parse_CidData_line);
 /* Cid Level End */
 
 /* Device State Start */
 GEN_STRUCT(DeviceStateData, uint16_t, device_state);
 
 GEN_FUNCTION(device_state_1min_parse_print, DeviceStateData,
-             "operator/metadata_device_state_1min_bin.csv",
-             "time_filtered/metadata_device_state_1min_bin.csv", 2126380,
-             "ts,node_id,network_id,device_state\n", parse_DeviceStateData_line, "%s,%d,%d,%d\n",
-             date, (*row)->node_id, 2, (*row)->device_state);
+             "metadata_device_state_1min_bin.csv",
+             "ts,node_id,network_id,device_state\n", parse_DeviceStateData_line);
 
 GEN_FUNCTION(device_state_events_parse_print, DeviceStateData,
-             "operator/metadata_device_state_events.csv",
-             "time_filtered/metadata_device_state_events.csv", 38320,
-             "ts,node_id,network_id,device_state\n", parse_DeviceStateData_line, "%s,%d,%d,%d\n",
-             date, (*row)->node_id, 2, (*row)->device_state);
+             "metadata_device_state_events.csv",
+             "ts,node_id,network_id,device_state\n", parse_DeviceStateData_line);
 
 /* Device State End */
 
 /* Earfcn Start */
 GEN_STRUCT(EarfcnData, uint16_t, earfcn);
 
-GEN_FUNCTION(earfcn_1min_parse_print, EarfcnData, "operator/metadata_earfcn_1min_bin.csv",
-             "time_filtered/metadata_earfcn_1min_bin.csv", 2126380,
-             "ts,node_id,network_id,earfcn\n", parse_EarfcnData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->earfcn);
+GEN_FUNCTION(earfcn_1min_parse_print, EarfcnData, "metadata_earfcn_1min_bin.csv",
+             "ts,node_id,network_id,earfcn\n", parse_EarfcnData_line);
 
-GEN_FUNCTION(earfcn_events_parse_print, EarfcnData, "operator/metadata_earfcn_events.csv",
-             "time_filtered/metadata_earfcn_events.csv", 21836,
-             "ts,node_id,network_id,earfcn\n", parse_EarfcnData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->earfcn);
+GEN_FUNCTION(earfcn_events_parse_print, EarfcnData, "metadata_earfcn_events.csv",
+             "ts,node_id,network_id,earfcn\n", parse_EarfcnData_line);
 /* Earfcn End */
 
 /* Imsi Start */
 GEN_STRUCT(ImsiData, uint64_t, imsi);
 
-GEN_FUNCTION(imsi_1min_parse_print, ImsiData, "operator/metadata_imsi_1min_bin.csv",
-             "time_filtered/metadata_imsi_1min_bin.csv", 2126380,
-             "ts,node_id,network_id,imsi\n", parse_ImsiData_line, "%s,%d,%d,%lu\n", date,
-             (*row)->node_id, 2, (*row)->imsi);
+GEN_FUNCTION(imsi_1min_parse_print, ImsiData, "metadata_imsi_1min_bin.csv",
+             "ts,node_id,network_id,imsi\n", parse_ImsiData_line);
 
-GEN_FUNCTION(imsi_events_parse_print, ImsiData, "operator/metadata_imsi_events.csv",
-             "time_filtered/metadata_imsi_events.csv", 10094, "ts,node_id,network_id,imsi\n",
-             parse_ImsiData_line, "%s,%d,%d,%lu\n", date, (*row)->node_id, 2, (*row)->imsi);
+GEN_FUNCTION(imsi_events_parse_print, ImsiData, "metadata_imsi_events.csv",
+             "ts,node_id,network_id,imsi\n",
+             parse_ImsiData_line);
 /* Imsi End */
 
 /* Ipaddr Start */
-typedef struct ipaddr_data_t {
-    DateTime dt;
-    uint16_t node_id;
-    bool state;
-} IpaddrData;
+GEN_STRUCT(IpaddrData, updown, state);
 
-void parse_IpaddrData_line(char *line, void *data, int i)
-{
-    IpaddrData **usb_data = (IpaddrData **)data;
-    char *save_ptr = NULL;
-    char *date = strtok_r(line, ",", &save_ptr);
-    parse_date_time(&usb_data[i]->dt, date);
-
-    char *node_id = strtok_r(NULL, ",", &save_ptr);
-    usb_data[i]->node_id = atoi(node_id);
-    strtok_r(NULL, ",", &save_ptr);
-    usb_data[i]->state = strcmp(strtok_r(NULL, ",", &save_ptr), "UP") == 0 ? true : false;
-}
+GEN_FUNCTION(ipaddr_1min_parse_print, IpaddrData, "metadata_ipaddr_1min_bin.csv",
+             "ts,node_id,network_id,ipaddr_state\n", parse_IpaddrData_line);
 
-GEN_FUNCTION(ipaddr_1min_parse_print, IpaddrData, "operator/metadata_ipaddr_1min_bin.csv",
-             "time_filtered/metadata_ipaddr_1min_bin.csv", 1695169,
-             "ts,node_id,network_id,ipaddr_state\n", parse_IpaddrData_line, "%s,%d,%d, %s\n", date,
-             (*row)->node_id, 2, (*row)->state ? "UP" : "DOWN");
-
-GEN_FUNCTION(ipaddr_events_parse_print, IpaddrData, "operator/metadata_ipaddr_events.csv",
-             "time_filtered/metadata_ipaddr_events.csv", 15661,
-             "ts,node_id,network_id,ipaddr_state\n", parse_IpaddrData_line, "%s,%d,%d,%s\n", date,
-             (*row)->node_id, 2, (*row)->state ? "UP" : "DOWN");
+GEN_FUNCTION(ipaddr_events_parse_print, IpaddrData, "metadata_ipaddr_events.csv",
+             "ts,node_id,network_id,ipaddr_state\n", parse_IpaddrData_line);
 /* Ipaddr End */
 
 /* Lac Start */
 GEN_STRUCT(LacData, uint16_t, lac);
 
-GEN_FUNCTION(lac_1min_parse_print, LacData, "operator/metadata_lac_1min_bin.csv",
-             "time_filtered/metadata_lac_1min_bin.csv", 2126385,
-             "ts,node_id,network_id,lac\n", parse_LacData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->lac);
+GEN_FUNCTION(lac_1min_parse_print, LacData, "metadata_lac_1min_bin.csv",
+             "ts,node_id,network_id,lac\n", parse_LacData_line);
 
-GEN_FUNCTION(lac_events_parse_print, LacData, "operator/metadata_lac_events.csv",
-             "time_filtered/metadata_lac_events.csv", 10094, "ts,node_id,network_id,lac\n",
-             parse_LacData_line, "%s,%d,%d,%d\n", date, (*row)->node_id, 2, (*row)->lac);
+GEN_FUNCTION(lac_events_parse_print, LacData, "metadata_lac_events.csv",
+             "ts,node_id,network_id,lac\n",
+             parse_LacData_line);
 /* Lac End */
 
 /* LTE Frequency Start */
 GEN_STRUCT(LteFrequencyData, uint16_t, lte_frequency);
 
 GEN_FUNCTION(lte_frequency_1min_parse_print, LteFrequencyData,
-             "operator/metadata_lte_freq_1min_bin.csv",
-             "time_filtered/metadata_lte_freq_1min_bin.csv", 2126380,
-             "ts,node_id,network_id,lte_freq\n", parse_LteFrequencyData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->lte_frequency);
+             "metadata_lte_freq_1min_bin.csv",
+             "ts,node_id,network_id,lte_freq\n", parse_LteFrequencyData_line);
 
 GEN_FUNCTION(lte_frequency_events_parse_print, LteFrequencyData,
-             "operator/metadata_lte_freq_events.csv",
-             "time_filtered/metadata_lte_freq_events.csv", 53938,
-             "ts,node_id,network_id,lte_freq\n", parse_LteFrequencyData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->lte_frequency);
+             "metadata_lte_freq_events.csv",
+             "ts,node_id,network_id,lte_freq\n", parse_LteFrequencyData_line);
 /* LTE Frequency End */
 
 /* Operator Start */
 GEN_STRUCT(OperatorData, uint16_t, operator);
 
-GEN_FUNCTION(operator_1min_parse_print, OperatorData, "operator/metadata_oper_1min_bin.csv",
-             "time_filtered/metadata_oper_1min_bin.csv", 2126385,
-             "ts,node_id,network_id,operator\n", parse_OperatorData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->operator);
+GEN_FUNCTION(operator_1min_parse_print, OperatorData, "metadata_oper_1min_bin.csv",
+             "ts,node_id,network_id,operator\n", parse_OperatorData_line);
 
-GEN_FUNCTION(operator_events_parse_print, OperatorData, "operator/metadata_oper_events.csv",
-             "time_filtered/metadata_oper_events.csv", 10094,
-             "ts,node_id,network_id,operator\n", parse_OperatorData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->operator);
+GEN_FUNCTION(operator_events_parse_print, OperatorData, "metadata_oper_events.csv",
+             "ts,node_id,network_id,operator\n", parse_OperatorData_line);
 /* Operator End */
 
 /* RSRP Start */
 GEN_STRUCT(RSRPData, int16_t, rsrp);
 
-GEN_FUNCTION(rsrp_1min_parse_print, RSRPData, "operator/metadata_rsrp_1min_bin.csv",
-             "time_filtered/metadata_rsrp_1min_bin.csv", 1987526,
-             "ts,node_id,network_id,rsrp\n", parse_RSRPData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->rsrp);
+GEN_FUNCTION(rsrp_1min_parse_print, RSRPData, "metadata_rsrp_1min_bin.csv",
+             "ts,node_id,network_id,rsrp\n", parse_RSRPData_line);
 
-GEN_FUNCTION(rsrp_events_parse_print, RSRPData, "operator/metadata_rsrp_events.csv",
-             "time_filtered/metadata_rsrp_events.csv", 14032772,
-             "ts,node_id,network_id,rsrp\n", parse_RSRPData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->rsrp);
+GEN_FUNCTION(rsrp_events_parse_print, RSRPData, "metadata_rsrp_events.csv",
+             "ts,node_id,network_id,rsrp\n", parse_RSRPData_line);
 /* RSRP End */
 
 /* RSRQ Start */
 GEN_STRUCT(RSRQData, int16_t, rsrq);
 
-GEN_FUNCTION(rsrq_1min_parse_print, RSRQData, "operator/metadata_rsrq_1min_bin.csv",
-             "time_filtered/metadata_rsrq_1min_bin.csv", 1987526,
-             "ts,node_id,network_id,rsrq\n", parse_RSRQData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->rsrq);
+GEN_FUNCTION(rsrq_1min_parse_print, RSRQData, "metadata_rsrq_1min_bin.csv",
+             "ts,node_id,network_id,rsrq\n", parse_RSRQData_line);
 
-GEN_FUNCTION(rsrq_events_parse_print, RSRQData, "operator/metadata_rsrq_events.csv",
-             "time_filtered/metadata_rsrq_events.csv", 25497870,
-             "ts,node_id,network_id,rsrq\n", parse_RSRQData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->rsrq);
+GEN_FUNCTION(rsrq_events_parse_print, RSRQData, "metadata_rsrq_events.csv",
+             "ts,node_id,network_id,rsrq\n", parse_RSRQData_line);
 /* RSRQ End */
 
 /* RSSI Start */
 GEN_STRUCT(RSSIData, int16_t, rssi);
 
-GEN_FUNCTION(rssi_1min_parse_print, RSSIData, "operator/metadata_rssi_1min_bin.csv",
-             "time_filtered/metadata_rssi_1min_bin.csv", 2126380,
-             "ts,node_id,network_id,rssi\n", parse_RSSIData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->rssi);
+GEN_FUNCTION(rssi_1min_parse_print, RSSIData, "metadata_rssi_1min_bin.csv",
+             "ts,node_id,network_id,rssi\n", parse_RSSIData_line);
 
-GEN_FUNCTION(rssi_events_parse_print, RSSIData, "operator/metadata_rssi_events.csv",
-             "time_filtered/metadata_rssi_events.csv", 18973659,
-             "ts,node_id,network_id,rssi\n", parse_RSSIData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->rssi);
+GEN_FUNCTION(rssi_events_parse_print, RSSIData, "metadata_rssi_events.csv",
+             "ts,node_id,network_id,rssi\n", parse_RSSIData_line);
 /* RSSI End */
 
 /* Submode Start */
 GEN_STRUCT(SubmodeData, uint8_t, submode);
 
-GEN_FUNCTION(submode_1min_parse_print, SubmodeData, "operator/metadata_submode_1min_bin.csv",
-             "time_filtered/metadata_submode_1min_bin.csv", 2125013,
-             "ts,node_id,network_id,submode\n", parse_SubmodeData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->submode);
+GEN_FUNCTION(submode_1min_parse_print, SubmodeData, "metadata_submode_1min_bin.csv",
+             "ts,node_id,network_id,submode\n", parse_SubmodeData_line);
 
-GEN_FUNCTION(submode_events_parse_print, SubmodeData, "operator/metadata_submode_events.csv",
-             "time_filtered/metadata_submode_events.csv", 72192,
-             "ts,node_id,network_id,submode\n", parse_SubmodeData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->submode);
+GEN_FUNCTION(submode_events_parse_print, SubmodeData, "metadata_submode_events.csv",
+             "ts,node_id,network_id,submode\n", parse_SubmodeData_line);
 /* Submode End */
 
 /* TX Power Start */
 GEN_STRUCT(TXPowerData, int16_t, tx_power);
 
-GEN_FUNCTION(tx_power_1min_parse_print, TXPowerData, "operator/metadata_tx_power_1min_bin.csv",
-             "time_filtered/metadata_tx_power_1min_bin.csv", 2126380,
-             "ts,node_id,network_id,tx_power\n", parse_TXPowerData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->tx_power);
+GEN_FUNCTION(tx_power_1min_parse_print, TXPowerData, "metadata_tx_power_1min_bin.csv",
+             "ts,node_id,network_id,tx_power\n", parse_TXPowerData_line);
 
-GEN_FUNCTION(tx_power_events_parse_print, TXPowerData, "operator/metadata_tx_power_events.csv",
-             "time_filtered/metadata_tx_power_events.csv", 10094,
-             "ts,node_id,network_id,tx_power\n", parse_TXPowerData_line, "%s,%d,%d,%d\n", date,
-             (*row)->node_id, 2, (*row)->tx_power);
+GEN_FUNCTION(tx_power_events_parse_print, TXPowerData, "metadata_tx_power_events.csv",
+             "ts,node_id,network_id,tx_power\n", parse_TXPowerData_line);
 /* TX Power End */
 
-int main(void)
+#define JOB(family, func) { family, func##_file, func }
+
+static const Job JOBS[] = {
+    JOB("usbmodem", usbmodem_parse_print),
+    JOB("band", band_1min_parse_print),
+    JOB("band", band_events_parse_print),
+    JOB("packetloss", packet_loss_raw_1sec_parse_print),
+    JOB("packetloss", packet_loss_raw_5min_parse_print),
+    JOB("packetloss", packet_loss_5min_parse_print),
+    JOB("celevel", celevel_1min_parse_print),
+    JOB("celevel", celevel_events_parse_print),
+    JOB("cid", cid_1min_parse_print),
+    JOB("cid", cid_events_parse_print),
+    JOB("device_state", device_state_1min_parse_print),
+    JOB("device_state", device_state_events_parse_print),
+    JOB("earfcn", earfcn_1min_parse_print),
+    JOB("earfcn", earfcn_events_parse_print),
+    JOB("imsi", imsi_1min_parse_print),
+    JOB("imsi", imsi_events_parse_print),
+    JOB("ipaddr", ipaddr_1min_parse_print),
+    JOB("ipaddr", ipaddr_events_parse_print),
+    JOB("lac", lac_1min_parse_print),
+    JOB("lac", lac_events_parse_print),
+    JOB("lte_freq", lte_frequency_1min_parse_print),
+    JOB("lte_freq", lte_frequency_events_parse_print),
+    JOB("oper", operator_1min_parse_print),
+    JOB("oper", operator_events_parse_print),
+    JOB("rsrp", rsrp_1min_parse_print),
+    JOB("rsrp", rsrp_events_parse_print),
+    JOB("rsrq", rsrq_1min_parse_print),
+    JOB("rsrq", rsrq_events_parse_print),
+    JOB("rssi", rssi_1min_parse_print),
+    JOB("rssi", rssi_events_parse_print),
+    JOB("submode", submode_1min_parse_print),
+    JOB("submode", submode_events_parse_print),
+    JOB("tx_power", tx_power_1min_parse_print),
+    JOB("tx_power", tx_power_events_parse_print),
+};
+
+#define JOBS_LEN (sizeof(JOBS) / sizeof(JOBS[0]))
+
+static void usage(const char *name)
 {
-    NodeDownTimeLen *mode_data = parse_mode_file();
-
-    if (mode_data) {
-        printf("Successfully parsed mode file!\n");
-    } else {
-        fprintf(stderr, "Error parsing mode file :(!\n");
-        exit(1);
+    fprintf(stderr,
+            "Usage: %s [-f families] [-i in_dir] [-o out_dir] [-d downtime_dir] [-p periods_file] "
+            "[-t threads] "
+            "[-j jobs] [-m memory] [-b]\n"
+            "  -f  Comma separated metadata families to filter, default all:\n"
+            "      ",
+            name);
+    for (size_t i = 0; i < JOBS_LEN; i++) {
+        if (i == 0 || strcmp(JOBS[i].family, JOBS[i - 1].family) != 0)
+            fprintf(stderr, "%s%s", i == 0 ? "" : ",", JOBS[i].family);
     }
+    fprintf(stderr,
+            "\n"
+            "  -i  Directory with the operator files, default operator\n"
+            "  -o  Directory the filtered files are written to, default time_filtered\n"
+            "  -d  Directory of the downtime periods written by filter.py, default %s. Only the\n"
+            "      periods of the sha256 of <in_dir>/%s are used, without them the periods\n"
+            "      are found in the mode file\n"
+            "  -p  Downtime periods to use as they are instead of the ones of -d\n"
+            "  -t  Threads of the downtime filter of every file, 0 for one per CPU, default the\n"
+            "      CPUs divided by the files filtered at the same time\n"
+            "  -j  Files filtered at the same time, default 4\n"
+            "  -m  Memory the files filtered at the same time may use, e.g. 8G, default half\n"
+            "      the physical memory\n"
+            "  -b  Write binary columnar files (.bin) instead of csv, see columnar.py\n",
+            DOWNTIME_DIR, MODE_FILENAME);
+}
 
-    // usbmodem_parse_print(mode_data);
-
-    // band_1min_parse_print(mode_data);
-
-    // band_events_parse_print(mode_data);
-
-    // packet_loss_raw_1sec_parse_print(mode_data);
-
-    // packet_loss_raw_5min_parse_print(mode_data);
-
-    // packet_loss_5min_parse_print(mode_data);
-
-    // celevel_1min_parse_print(mode_data);
-
-    // celevel_events_parse_print(mode_data);
-
-    // cid_1min_parse_print(mode_data);
-
-    // cid_events_parse_print(mode_data);
-
-    // device_state_1min_parse_print(mode_data);
-
-    // device_state_events_parse_print(mode_data);
-
-    // earfcn_1min_parse_print(mode_data);
-
-    // earfcn_events_parse_print(mode_data);
-
-    // imsi_1min_parse_print(mode_data);
-
-    // imsi_events_parse_print(mode_data);
-
-    // ipaddr_1min_parse_print(mode_data);
-
-    // ipaddr_events_parse_print(mode_data);
-
-    // lac_1min_parse_print(mode_data);
-
-    // lac_events_parse_print(mode_data);
-
-    // lte_frequency_1min_parse_print(mode_data);
-
-    lte_frequency_events_parse_print(mode_data);
-
-    operator_1min_parse_print(mode_data);
-
-    operator_events_parse_print(mode_data);
-
-    rsrp_1min_parse_print(mode_data);
-
-    rsrp_events_parse_print(mode_data);
+/* A byte count with an optional K, M or G suffix, 0 if it can not be parsed */
+static size_t parse_size(const char *str)
+{
+    char *end;
+    unsigned long long size = strtoull(str, &end, 10);
+    switch (*end) {
+    case 'G':
+    case 'g':
+        size <<= 10;
+        /* fall through */
+    case 'M':
+    case 'm':
+        size <<= 10;
+        /* fall through */
+    case 'K':
+    case 'k':
+        size <<= 10;
+        end++;
+        break;
+    }
+    return end == str || *end != '\0' ? 0 : size;
+}
 
-    rsrq_1min_parse_print(mode_data);
+static bool family_selected(const char *families, const char *family)
+{
+    if (!families)
+        return true;
+    size_t len = strlen(family);
+    for (const char *p = families; *p;) {
+        const char *comma = strchr(p, ',');
+        size_t field_len = comma ? (size_t)(comma - p) : strlen(p);
+        if (field_len == len && strncmp(p, family, len) == 0)
+            return true;
+        p += field_len + (comma != NULL);
+    }
+    return false;
+}
 
-    rsrq_events_parse_print(mode_data);
+/* Reports the families of -f that no job belongs to */
+static bool families_known(const char *families)
+{
+    bool known = true;
+    for (const char *p = families; *p;) {
+        const char *comma = strchr(p, ',');
+        size_t field_len = comma ? (size_t)(comma - p) : strlen(p);
+        bool found = false;
+        for (size_t i = 0; i < JOBS_LEN && !found; i++) {
+            found = strlen(JOBS[i].family) == field_len &&
+                    strncmp(p, JOBS[i].family, field_len) == 0;
+        }
+        if (!found) {
+            fprintf(stderr, "Unknown family %.*s!\n", (int)field_len, p);
+            known = false;
+        }
+        p += field_len + (comma != NULL);
+    }
+    return known;
+}
 
-    rssi_1min_parse_print(mode_data);
+int main(int argc, char **argv)
+{
+    const char *families = NULL;
+    const char *downtime_dir = DOWNTIME_DIR;
+    const char *periods_file = NULL;
+    JobConfig config = {
+        .in_dir = "operator", .out_dir = "time_filtered", .threads = 0, .format = OUTPUT_CSV
+    };
+    uint32_t concurrent = 4;
+    bool threads_set = false;
+    size_t memory = memory_budget_default();
+
+    int opt;
+    while ((opt = getopt(argc, argv, "f:i:o:d:p:t:j:m:bh")) != -1) {
+        switch (opt) {
+        case 'f':
+            families = optarg;
+            break;
+        case 'i':
+            config.in_dir = optarg;
+            break;
+        case 'o':
+            config.out_dir = optarg;
+            break;
+        case 'd':
+            downtime_dir = optarg;
+            break;
+        case 'p':
+            periods_file = optarg;
+            break;
+        case 't':
+            config.threads = strtoul(optarg, NULL, 10);
+            threads_set = true;
+            break;
+        case 'j':
+            concurrent = strtoul(optarg, NULL, 10);
+            break;
+        case 'm':
+            memory = parse_size(optarg);
+            if (memory == 0) {
+                fprintf(stderr, "Invalid memory budget %s!\n", optarg);
+                return 1;
+            }
+            break;
+        case 'b':
+            config.format = OUTPUT_COLUMNAR;
+            break;
+        case 'h':
+            usage(argv[0]);
+            return 0;
+        default:
+            usage(argv[0]);
+            return 1;
+        }
+    }
+    if (optind < argc) {
+        usage(argv[0]);
+        return 1;
+    }
+    if (families && !families_known(families))
+        return 1;
+
+    const Job *selected[JOBS_LEN];
+    size_t selected_len = 0;
+    for (size_t i = 0; i < JOBS_LEN; i++) {
+        if (family_selected(families, JOBS[i].family))
+            selected[selected_len++] = &JOBS[i];
+    }
+    if (selected_len == 0) {
+        fprintf(stderr, "No files selected by -f %s!\n", families);
+        return 1;
+    }
 
-    rssi_events_parse_print(mode_data);
+    /* The files filtered at the same time share the CPUs */
+    if (!threads_set) {
+        long cpus = sysconf(_SC_NPROCESSORS_ONLN);
+        uint32_t jobs = concurrent == 0 ? 1 : concurrent < selected_len ? concurrent : selected_len;
+        config.threads = cpus > (long)jobs ? cpus / jobs : 1;
+    }
 
-    submode_1min_parse_print(mode_data);
+    /* Reuse the periods filter.py has found for the mode file, they are named by its sha256 */
+    char mode_file[JOB_PATH_LEN];
+    snprintf(mode_file, sizeof(mode_file), "%s/%s", config.in_dir, MODE_FILENAME);
+    char downtime_file[JOB_PATH_LEN];
+    if (!periods_file &&
+        downtime_file_path(downtime_file, sizeof(downtime_file), downtime_dir, mode_file) &&
+        access(downtime_file, R_OK) == 0)
+        periods_file = downtime_file;
+
+    NodeDownTimeLen *mode_data;
+    if (periods_file) {
+        printf("Using the downtime periods of %s\n", periods_file);
+        mode_data = parse_downtime_file(periods_file);
+    } else {
+        mode_data = parse_mode_file(mode_file);
+    }
 
-    submode_events_parse_print(mode_data);
+    if (mode_data) {
+        printf("Successfully parsed mode file!\n");
+    } else {
+        fprintf(stderr, "Error parsing mode file :(!\n");
+        exit(1);
+    }
 
-    tx_power_1min_parse_print(mode_data);
+    MemoryBudget budget;
+    memory_budget_init(&budget, memory);
+    config.mode_data = mode_data;
+    config.budget = &budget;
 
-    tx_power_events_parse_print(mode_data);
+    size_t failed = run_jobs(selected, selected_len, &config, concurrent);
+    if (failed > 0)
+        fprintf(stderr, "%zu of %zu files failed!\n", failed, selected_len);
 
-    for (size_t i = 0; i < mode_data->len; i++) {
-        free(mode_data->arr[i]);
-    }
+    memory_budget_destroy(&budget);
 
-    free(mode_data->arr);
-    free(mode_data);
+    node_down_time_len_free(mode_data);
 
-    return 0;
-}
\ No newline at end of file
+    return failed > 0;
+}
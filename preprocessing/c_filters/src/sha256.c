@@ -0,0 +1,143 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#include <sha256.h>
+#include <stdio.h>
+#include <string.h>
+
+#define ROTR(x, n) (((x) >> (n)) | ((x) << (32 - (n))))
+
+typedef struct sha256_t {
+    uint32_t state[8];
+    uint8_t block[64];
+    size_t block_len;
+    uint64_t total_len;
+} Sha256;
+
+static const uint32_t K[64] = {
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+};
+
+static void sha256_init(Sha256 *sha)
+{
+    static const uint32_t initial[8] = { 0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+                                         0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19 };
+    memcpy(sha->state, initial, sizeof(initial));
+    sha->block_len = 0;
+    sha->total_len = 0;
+}
+
+static void sha256_compress(Sha256 *sha, const uint8_t *block)
+{
+    uint32_t w[64];
+    for (int i = 0; i < 16; i++) {
+        w[i] = (uint32_t)block[i * 4] << 24 | (uint32_t)block[i * 4 + 1] << 16 |
+               (uint32_t)block[i * 4 + 2] << 8 | (uint32_t)block[i * 4 + 3];
+    }
+    for (int i = 16; i < 64; i++) {
+        uint32_t s0 = ROTR(w[i - 15], 7) ^ ROTR(w[i - 15], 18) ^ (w[i - 15] >> 3);
+        uint32_t s1 = ROTR(w[i - 2], 17) ^ ROTR(w[i - 2], 19) ^ (w[i - 2] >> 10);
+        w[i] = w[i - 16] + s0 + w[i - 7] + s1;
+    }
+
+    uint32_t a = sha->state[0], b = sha->state[1], c = sha->state[2], d = sha->state[3];
+    uint32_t e = sha->state[4], f = sha->state[5], g = sha->state[6], h = sha->state[7];
+    for (int i = 0; i < 64; i++) {
+        uint32_t s1 = ROTR(e, 6) ^ ROTR(e, 11) ^ ROTR(e, 25);
+        uint32_t t1 = h + s1 + ((e & f) ^ (~e & g)) + K[i] + w[i];
+        uint32_t t2 = (ROTR(a, 2) ^ ROTR(a, 13) ^ ROTR(a, 22)) + ((a & b) ^ (a & c) ^ (b & c));
+        h = g;
+        g = f;
+        f = e;
+        e = d + t1;
+        d = c;
+        c = b;
+        b = a;
+        a = t1 + t2;
+    }
+    sha->state[0] += a;
+    sha->state[1] += b;
+    sha->state[2] += c;
+    sha->state[3] += d;
+    sha->state[4] += e;
+    sha->state[5] += f;
+    sha->state[6] += g;
+    sha->state[7] += h;
+}
+
+static void sha256_update(Sha256 *sha, const uint8_t *data, size_t len)
+{
+    sha->total_len += len;
+    while (len > 0) {
+        size_t n = 64 - sha->block_len < len ? 64 - sha->block_len : len;
+        memcpy(sha->block + sha->block_len, data, n);
+        sha->block_len += n;
+        data += n;
+        len -= n;
+        if (sha->block_len == 64) {
+            sha256_compress(sha, sha->block);
+            sha->block_len = 0;
+        }
+    }
+}
+
+static void sha256_final(Sha256 *sha, uint8_t digest[32])
+{
+    uint64_t bits = sha->total_len * 8;
+    uint8_t pad[72] = { 0x80 };
+    /* Pad to 56 bytes modulo 64, then the length in bits big endian */
+    size_t pad_len = (sha->block_len < 56 ? 56 : 120) - sha->block_len;
+    for (int i = 0; i < 8; i++)
+        pad[pad_len + i] = (uint8_t)(bits >> (56 - 8 * i));
+    sha256_update(sha, pad, pad_len + 8);
+    for (int i = 0; i < 8; i++) {
+        digest[i * 4] = (uint8_t)(sha->state[i] >> 24);
+        digest[i * 4 + 1] = (uint8_t)(sha->state[i] >> 16);
+        digest[i * 4 + 2] = (uint8_t)(sha->state[i] >> 8);
+        digest[i * 4 + 3] = (uint8_t)sha->state[i];
+    }
+}
+
+bool sha256_file_hex(const char *const filename, char hex[SHA256_HEX_LEN + 1])
+{
+    FILE *fp = fopen(filename, "rb");
+    if (!fp)
+        return false;
+
+    Sha256 sha;
+    sha256_init(&sha);
+    uint8_t buffer[1 << 16];
+    size_t read;
+    while ((read = fread(buffer, 1, sizeof(buffer), fp)) > 0)
+        sha256_update(&sha, buffer, read);
+    bool ok = !ferror(fp);
+    fclose(fp);
+    if (!ok)
+        return false;
+
+    uint8_t digest[32];
+    sha256_final(&sha, digest);
+    for (int i = 0; i < 32; i++)
+        snprintf(hex + i * 2, 3, "%02x", digest[i]);
+    return true;
+}
@@ -0,0 +1,149 @@
+/*
+ *  Copyright (C) 2024 Callum Gran
+ *
+ *  This program is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU General Public License as published by
+ *  the Free Software Foundation, either version 3 of the License, or
+ *  (at your option) any later version.
+ *
+ *  This program is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU General Public License for more details.
+ *
+ *  You should have received a copy of the GNU General Public License
+ *  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+#include <errno.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <writer.h>
+
+#if defined(__BYTE_ORDER__) && __BYTE_ORDER__ != __ORDER_LITTLE_ENDIAN__
+#error "The columnar output writes the columns as they are in memory, which has to be little endian"
+#endif
+
+bool writer_open(BufferedWriter *writer, const char *const path)
+{
+    writer->fd = open(path, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+    if (writer->fd < 0) {
+        fprintf(stderr, "Error opening file with name %s!\n", path);
+        return false;
+    }
+    writer->buf = malloc(WRITER_BUFFER_SIZE);
+    if (!writer->buf) {
+        close(writer->fd);
+        return false;
+    }
+    writer->len = 0;
+    writer->cap = WRITER_BUFFER_SIZE;
+    writer->failed = false;
+    return true;
+}
+
+void writer_flush(BufferedWriter *writer)
+{
+    const char *p = writer->buf;
+    size_t left = writer->failed ? 0 : writer->len;
+    while (left > 0) {
+        ssize_t written = write(writer->fd, p, left);
+        if (written < 0) {
+            if (errno == EINTR)
+                continue;
+            writer->failed = true;
+            break;
+        }
+        p += written;
+        left -= written;
+    }
+    writer->len = 0;
+}
+
+bool writer_close(BufferedWriter *writer)
+{
+    writer_flush(writer);
+    free(writer->buf);
+    if (close(writer->fd) != 0)
+        writer->failed = true;
+    return !writer->failed;
+}
+
+void writer_write(BufferedWriter *writer, const void *data, size_t size)
+{
+    const char *p = data;
+    while (size > 0) {
+        if (writer->len == writer->cap)
+            writer_flush(writer);
+        size_t chunk = writer->cap - writer->len < size ? writer->cap - writer->len : size;
+        memcpy(writer->buf + writer->len, p, chunk);
+        writer->len += chunk;
+        p += chunk;
+        size -= chunk;
+    }
+}
+
+static void write_padding(BufferedWriter *writer, size_t size)
+{
+    static const char zeros[8] = { 0 };
+    writer_write(writer, zeros, size);
+}
+
+/* The next field of a csv header, the name is cut at COLUMNAR_NAME_LEN - 1 characters */
+static const char *header_field(const char *p, char name[COLUMNAR_NAME_LEN])
+{
+    size_t len = strcspn(p, ",\n");
+    memset(name, 0, COLUMNAR_NAME_LEN);
+    memcpy(name, p, len < COLUMNAR_NAME_LEN ? len : COLUMNAR_NAME_LEN - 1);
+    return p[len] == ',' ? p + len + 1 : p + len;
+}
+
+bool columnar_write(const char *const path, const char *header, const Column *columns,
+                    size_t columns_len, const size_t *rows, size_t rows_len)
+{
+    BufferedWriter writer;
+    if (!writer_open(&writer, path))
+        return false;
+
+    uint32_t version = COLUMNAR_VERSION;
+    uint32_t ncols = columns_len;
+    uint64_t nrows = rows_len;
+    writer_write(&writer, COLUMNAR_MAGIC, 8);
+    writer_write(&writer, &version, sizeof(version));
+    writer_write(&writer, &ncols, sizeof(ncols));
+    writer_write(&writer, &nrows, sizeof(nrows));
+
+    /* Every descriptor is a multiple of 8 bytes, so the first column is aligned already */
+    uint64_t offset = 24 + columns_len * (COLUMNAR_NAME_LEN + COLUMNAR_DTYPE_LEN + 8);
+    for (size_t i = 0; i < columns_len; i++) {
+        char name[COLUMNAR_NAME_LEN];
+        char dtype[COLUMNAR_DTYPE_LEN] = { 0 };
+        if (header) {
+            header = header_field(header, name);
+            if (strcmp(name, "network_id") == 0)
+                header = header_field(header, name);
+        } else {
+            header_field(columns[i].name, name);
+        }
+        strncpy(dtype, columns[i].dtype, COLUMNAR_DTYPE_LEN - 1);
+        writer_write(&writer, name, COLUMNAR_NAME_LEN);
+        writer_write(&writer, dtype, COLUMNAR_DTYPE_LEN);
+        writer_write(&writer, &offset, sizeof(offset));
+        offset += (columns[i].size * rows_len + 7) & ~(uint64_t)7;
+    }
+
+    for (size_t i = 0; i < columns_len; i++) {
+        const char *data = columns[i].data;
+        const size_t size = columns[i].size;
+        for (size_t j = 0; j < rows_len; j++) {
+            char *p = writer_reserve(&writer, size);
+            memcpy(p, data + rows[j] * size, size);
+            writer_commit(&writer, p + size);
+        }
+        write_padding(&writer, (8 - size * rows_len % 8) % 8);
+    }
+
+    return writer_close(&writer);
+}
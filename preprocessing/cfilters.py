@@ -0,0 +1,176 @@
+import os
+from typing import Optional, Union
+import numpy as np
+import pandas as pd
+
+# The C filters as a library, build it with `make lib` in c_filters. Importing this module raises
+# ImportError if cffi or the library is missing, so callers can fall back to pandas, e.g. filter.py.
+try:
+    from cffi import FFI
+except ImportError as error:
+    raise ImportError("cfilters needs cffi") from error
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "c_filters", "libcfilters.so")
+
+# See c_filters/include/cfilters.h
+CDEF = """
+typedef struct mapped_file_t MappedFile;
+typedef struct period_index_t PeriodIndex;
+
+typedef struct cf_layout_t {
+    size_t itemsize;
+    size_t ts_offset;
+    size_t node_id_offset;
+    size_t network_id_offset;
+    const size_t *value_offsets;
+    size_t values_len;
+} CfLayout;
+
+MappedFile *cf_open(const char *path);
+size_t cf_rows(const MappedFile *file);
+void cf_close(MappedFile *file);
+size_t cf_parse(const MappedFile *file, const CfLayout *layout, const PeriodIndex *periods,
+                int32_t network_id, char *out);
+void cf_parse_timestamps(const char *strings, size_t width, size_t len, int64_t *out);
+PeriodIndex *cf_period_index(const uint16_t *node_id, const int64_t *start, const int64_t *end, size_t len);
+void cf_period_index_free(PeriodIndex *periods);
+void cf_mask_bad_periods(const int64_t *ts, const uint16_t *node_id, size_t len,
+                         const PeriodIndex *periods, uint32_t threads, uint8_t *keep);
+"""
+
+ffi = FFI()
+ffi.cdef(CDEF)
+try:
+    lib = ffi.dlopen(LIBRARY_PATH)
+except OSError as error:
+    raise ImportError(f"{LIBRARY_PATH} is missing, run `make lib` in c_filters") from error
+
+# The columns every operator file starts with
+KEY_COLUMNS = ["ts", "node_id", "network_id"]
+
+
+def pointer(ctype: str, array: np.ndarray):
+    return ffi.cast(ctype, ffi.from_buffer(array))
+
+
+def to_epoch_ns(ts) -> np.ndarray:
+    """Converts timestamps to int64 nanoseconds since the epoch, the representation of the C filters
+
+    Args:
+        ts: datetime64 values, or "YYYY-MM-DD HH:MM:SS[.fraction]" strings as they are in the files
+
+    Returns:
+        np.ndarray: int64 array
+    """
+    ts = np.asarray(ts)
+    if np.issubdtype(ts.dtype, np.datetime64):
+        return ts.astype("datetime64[ns]").view("i8")
+
+    strings = np.ascontiguousarray(ts.astype("S"))
+    out = np.empty(len(strings), dtype=np.int64)
+    if len(strings):
+        lib.cf_parse_timestamps(
+            ffi.from_buffer(strings), strings.dtype.itemsize, len(strings), pointer("int64_t *", out))
+    return out
+
+
+def period_index(periods: Union[dict, list]):
+    """Builds the C index of downtime periods, freed when the returned object is collected
+
+    Args:
+        periods (Union[dict, list]): An interval index of filter.build_interval_index, or a list of
+            {"node_id", "start_time", "end_time"} periods of filter.find_bad_time_periods
+
+    Returns:
+        The index, to pass to mask_bad_periods and read_csv
+    """
+    if isinstance(periods, dict):
+        node_ids = [node_id for node_id, (starts, _) in periods.items() for _ in starts]
+        starts = np.concatenate([starts for starts, _ in periods.values()] + [np.array([], dtype="datetime64[ns]")])
+        ends = np.concatenate([ends for _, ends in periods.values()] + [np.array([], dtype="datetime64[ns]")])
+    else:
+        node_ids = [period["node_id"] for period in periods]
+        starts = np.asarray([period["start_time"] for period in periods], dtype=object)
+        ends = np.asarray([period["end_time"] for period in periods], dtype=object)
+
+    node_ids = np.asarray(node_ids, dtype=np.uint16)
+    starts, ends = to_epoch_ns(starts), to_epoch_ns(ends)
+    index = lib.cf_period_index(
+        pointer("uint16_t *", node_ids), pointer("int64_t *", starts), pointer("int64_t *", ends), len(node_ids))
+    return ffi.gc(index, lib.cf_period_index_free)
+
+
+def mask_bad_periods(ts, node_id, periods, threads: int = 0) -> np.ndarray:
+    """Marks the rows with start <= ts < end for a downtime period of their node, like
+    filter.in_bad_period. The nodes are spread over a pool of threads.
+
+    Args:
+        ts: Timestamps of the rows, see to_epoch_ns
+        node_id: Node ids of the rows
+        periods: See period_index, or an index built by it
+        threads (int): Number of threads, 0 for one per CPU
+
+    Returns:
+        np.ndarray: bool array, True for the rows inside a period
+    """
+    if isinstance(periods, (dict, list)):
+        periods = period_index(periods)
+    ts = np.ascontiguousarray(to_epoch_ns(ts))
+    node_id = np.ascontiguousarray(np.asarray(node_id), dtype=np.uint16)
+    keep = np.empty(len(ts), dtype=np.uint8)
+    if len(ts):
+        lib.cf_mask_bad_periods(
+            pointer("int64_t *", ts), pointer("uint16_t *", node_id), len(ts), periods, threads,
+            pointer("uint8_t *", keep))
+    return keep == 0
+
+
+def read_csv(path: str, periods=None, network_id: Optional[int] = None) -> np.ndarray:
+    """Reads a "ts,node_id,network_id,..." operator file in C, without the rows in downtime periods
+
+    Args:
+        path (str): The csv file
+        periods: See period_index, None keeps every row
+        network_id (Optional[int]): Only keep the rows of this network
+
+    Returns:
+        np.ndarray: Structured array with ts as datetime64[ns], node_id and network_id as uint16 and
+            the other columns as float64. Values that are not numbers are NaN.
+    """
+    with open(path) as file:
+        columns = file.readline().rstrip("\n").split(",")
+    if columns[:len(KEY_COLUMNS)] != KEY_COLUMNS:
+        raise ValueError(f"{path} does not start with the columns {','.join(KEY_COLUMNS)}")
+
+    value_columns = columns[len(KEY_COLUMNS):]
+    dtype = np.dtype([("ts", "M8[ns]"), ("node_id", "u2"), ("network_id", "u2")]
+                     + [(column, "f8") for column in value_columns])
+    value_offsets = np.array([dtype.fields[column][1] for column in value_columns], dtype=np.uintp)
+    layout = ffi.new("CfLayout *", {
+        "itemsize": dtype.itemsize,
+        "ts_offset": dtype.fields["ts"][1],
+        "node_id_offset": dtype.fields["node_id"][1],
+        "network_id_offset": dtype.fields["network_id"][1],
+        "value_offsets": pointer("size_t *", value_offsets),
+        "values_len": len(value_columns),
+    })
+    if isinstance(periods, (dict, list)):
+        periods = period_index(periods)
+
+    mapped = lib.cf_open(path.encode())
+    if mapped == ffi.NULL:
+        raise OSError(f"Could not read {path}")
+    try:
+        out = np.empty(lib.cf_rows(mapped), dtype=dtype)
+        rows = lib.cf_parse(
+            mapped, layout, periods if periods is not None else ffi.NULL,
+            -1 if network_id is None else network_id, ffi.from_buffer(out))
+    finally:
+        lib.cf_close(mapped)
+    out.resize(rows, refcheck=False)
+    return out
+
+
+def to_frame(table: np.ndarray) -> pd.DataFrame:
+    """Puts a table of read_csv into a dataframe"""
+    return pd.DataFrame({name: table[name] for name in table.dtype.names})
@@ -0,0 +1,68 @@
+import struct
+import numpy as np
+import pandas as pd
+
+# The binary columnar files of the C filters (`main -b`), see columnar_write in
+# c_filters/include/writer.h for the layout
+MAGIC = b"CFCOLUMN"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+DESCRIPTOR = struct.Struct("<32s16sQ")
+
+
+def read_columnar(path: str) -> dict:
+    """Maps the columns of a columnar file into memory, nothing is parsed or copied
+
+    Args:
+        path (str): The .bin file
+
+    Returns:
+        dict: Column name -> read only np.memmap, ts is datetime64[ns]
+    """
+    with open(path, "rb") as file:
+        magic, version, ncols, nrows = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a columnar file")
+        if version != VERSION:
+            raise ValueError(f"{path} has version {version}, only version {VERSION} can be read")
+        descriptors = [DESCRIPTOR.unpack(file.read(DESCRIPTOR.size)) for _ in range(ncols)]
+
+    columns = {}
+    for name, dtype, offset in descriptors:
+        name = name.rstrip(b"\0").decode()
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        if nrows == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(nrows,))
+    return columns
+
+
+def write_columnar(path: str, columns: dict) -> None:
+    """Writes columns in the format of the C filters
+
+    Args:
+        path (str): The .bin file
+        columns (dict): Column name -> array, all of the same length
+    """
+    arrays = [(name, np.ascontiguousarray(values)) for name, values in columns.items()]
+    nrows = len(arrays[0][1]) if arrays else 0
+    offset = HEADER.size + DESCRIPTOR.size * len(arrays)
+    descriptors = []
+    for name, values in arrays:
+        dtype = values.dtype.newbyteorder("<") if values.dtype.byteorder == ">" else values.dtype
+        descriptors.append(DESCRIPTOR.pack(name.encode(), dtype.str.encode(), offset))
+        offset += (values.nbytes + 7) & ~7
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(arrays), nrows))
+        file.writelines(descriptors)
+        for _, values in arrays:
+            file.write(values.astype(values.dtype.newbyteorder("<"), copy=False).tobytes())
+            file.write(b"\0" * (-values.nbytes % 8))
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    """Reads a columnar file into a dataframe, with the columns of the csv the C filters write
+    except network_id"""
+    return pd.DataFrame({name: np.asarray(values) for name, values in read_columnar(path).items()})
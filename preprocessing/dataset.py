@@ -0,0 +1,265 @@
+import os
+import shutil
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from typing import Optional
+
+CHUNK_SIZE = 1000000
+
+# Every stage writes its output partitioned by node and day, i.e.
+# <root>/node_id=4120/day=2023-11-01/part-<uuid>-0.parquet
+PARTITION_COLUMNS = ["node_id", "day"]
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("node_id", pa.uint16()), ("day", pa.string())]), flavor="hive")
+
+# Explicit dtypes for the columns we know about. Columns that are not listed keep the dtype
+# pandas/arrow infers for them.
+DTYPES = {
+    "node_id": "uint16",
+    "network_id": "uint8",
+    "service_id": "uint8",
+    "scnt": "uint16",
+    "rcnt": "uint16",
+    "mode": "uint8",
+    "rtt": "float64",
+    "rtt_avg": "float64",
+    "rssi": "float32",
+    "rsrq": "float32",
+    "rsrp": "float32",
+    "bin_rssi": "float32",
+    "bin_rsrq": "float32",
+    "bin_rsrp": "float32",
+}
+
+
+def is_dataset(path: str) -> bool:
+    """Checks whether a path points to a partitioned dataset (a directory)
+
+    Args:
+        path (str): Path to a csv file, a parquet file or a dataset directory
+
+    Returns:
+        bool: True if the path is a dataset directory
+    """
+    return os.path.isdir(path)
+
+
+def resolve_path(path: str) -> str:
+    """Prefers a dataset directory over a csv file with the same stem,
+    e.g. "./data/metadata_rssi_events.csv" resolves to "./data/metadata_rssi_events" if it exists.
+
+    Args:
+        path (str): Path to a csv file, a parquet file or a dataset directory
+
+    Returns:
+        str: The path that should be read
+    """
+    stem, extension = os.path.splitext(path)
+    if extension == ".csv" and is_dataset(stem):
+        return stem
+    return path
+
+
+def _csv_dtypes(path: str, columns: Optional[list]) -> dict:
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = header if columns is None else columns
+    return {column: DTYPES[column] for column in wanted if column in DTYPES and column != "ts"}
+
+
+def _apply_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    for column, dtype in DTYPES.items():
+        if column in df.columns and df[column].dtype != dtype:
+            if pd.api.types.is_integer_dtype(dtype) and df[column].isna().any():
+                continue
+            df[column] = df[column].astype(dtype)
+    if "ts" in df.columns:
+        df["ts"] = pd.to_datetime(df["ts"])
+    return df
+
+
+def read_dataset(
+    root: str,
+    columns: Optional[list] = None,
+    node_ids: Optional[list] = None,
+    start=None,
+    end=None,
+    sort: bool = True,
+) -> pd.DataFrame:
+    """Reads a node/day partitioned dataset. Only the requested columns are loaded and
+    partitions of other nodes are never opened.
+
+    Args:
+        root (str): The dataset directory
+        columns (Optional[list]): Column projection, None loads every column
+        node_ids (Optional[list]): Only read these nodes
+        start: Only read rows with ts >= start
+        end: Only read rows with ts < end
+        sort (bool): Sort the rows by node_id and ts, like they appear in the source files
+
+    Returns:
+        pd.DataFrame: The rows of the dataset
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+    expression = None
+    if node_ids is not None:
+        expression = ds.field("node_id").isin(list(node_ids))
+    for op, value in ((">=", start), ("<", end)):
+        if value is None:
+            continue
+        bound = pa.scalar(pd.Timestamp(value), type=pa.timestamp("ns"))
+        term = ds.field("ts") >= bound if op == ">=" else ds.field("ts") < bound
+        expression = term if expression is None else expression & term
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+    if columns is None:
+        # The partition columns are stored in the directory names, put them back where they were
+        order = [column["name"] for column in (dataset.schema.pandas_metadata or {}).get("columns", [])]
+        order = [column for column in order if column in df.columns]
+        df = df[order] if order else df.drop(columns=["day"])
+    if sort and "ts" in df.columns:
+        keys = ["node_id", "ts"] if "node_id" in df.columns else ["ts"]
+        df = df.sort_values(by=keys, kind="stable").reset_index(drop=True)
+    return _apply_dtypes(df)
+
+
+def write_dataset(df: pd.DataFrame, root: str, overwrite: bool = False) -> None:
+    """Writes a dataframe into a node/day partitioned dataset. Every call adds new files,
+    so a stage can write its result incrementally one chunk or one node at a time.
+
+    Args:
+        df (pd.DataFrame): Dataframe containing at least ts and node_id
+        root (str): The dataset directory
+        overwrite (bool): Replace the partitions that are written to instead of appending
+    """
+    df = _apply_dtypes(df.copy(deep=False))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column("day", pc.strftime(table["ts"], format="%Y-%m-%d"))
+
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="delete_matching" if overwrite else "overwrite_or_ignore",
+        max_partitions=100000,
+    )
+
+
+def _filter_frame(df: pd.DataFrame, node_ids: Optional[list], start, end) -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    if node_ids is not None:
+        mask &= df["node_id"].isin(list(node_ids))
+    if start is not None:
+        mask &= df["ts"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["ts"] < pd.Timestamp(end)
+    return df[mask]
+
+
+def read_frame(
+    path: str,
+    columns: Optional[list] = None,
+    node_ids: Optional[list] = None,
+    start=None,
+    end=None,
+) -> pd.DataFrame:
+    """Reads the output of any stage, no matter if it is a csv file, a parquet file or a dataset.
+    When rows are filtered, a csv file is read in chunks so only the matching rows are kept in memory.
+
+    Args:
+        path (str): Path to a csv file, a parquet file or a dataset directory
+        columns (Optional[list]): Column projection, None loads every column
+        node_ids (Optional[list]): Only read these nodes
+        start: Only read rows with ts >= start
+        end: Only read rows with ts < end
+
+    Returns:
+        pd.DataFrame: The loaded dataframe with the dtypes from DTYPES
+    """
+    path = resolve_path(path)
+    if is_dataset(path):
+        return read_dataset(path, columns=columns, node_ids=node_ids, start=start, end=end)
+    if path.endswith(".parquet"):
+        df = _apply_dtypes(pd.read_parquet(path, columns=columns))
+        return _filter_frame(df, node_ids, start, end).reset_index(drop=True)
+    dtypes = _csv_dtypes(path, columns)
+    if node_ids is None and start is None and end is None:
+        return _apply_dtypes(pd.read_csv(path, usecols=columns, dtype=dtypes))
+    chunks = [
+        _filter_frame(_apply_dtypes(chunk), node_ids, start, end)
+        for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=CHUNK_SIZE)
+    ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def list_partitions(root: str) -> list:
+    """Lists the partitions of a dataset
+
+    Args:
+        root (str): The dataset directory
+
+    Returns:
+        list: Sorted (node_id, day) tuples
+    """
+    partitions = []
+    for node_dir in os.listdir(root):
+        if not node_dir.startswith("node_id="):
+            continue
+        for day_dir in os.listdir(os.path.join(root, node_dir)):
+            if day_dir.startswith("day="):
+                partitions.append((int(node_dir.split("=")[1]), day_dir.split("=")[1]))
+    return sorted(partitions)
+
+
+def write_frame(df: pd.DataFrame, path: str) -> None:
+    """Writes the output of a stage. Paths ending in .csv or .parquet are written as a single file,
+    anything else is written as a node/day partitioned dataset.
+
+    Args:
+        df (pd.DataFrame): Dataframe to write
+        path (str): Path to a csv file, a parquet file or a dataset directory
+    """
+    if path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    elif path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        if is_dataset(path):
+            shutil.rmtree(path)
+        write_dataset(df, path)
+
+
+def csv_to_dataset(csv_path: str, root: Optional[str] = None, chunksize: int = CHUNK_SIZE) -> str:
+    """Converts a csv file to a dataset without loading the whole file into memory
+
+    Args:
+        csv_path (str): e.g. "time_filtered/metadata_rssi_events.csv"
+        root (Optional[str]): The dataset directory, defaults to the csv path without extension
+        chunksize (int): Number of rows parsed at a time
+
+    Returns:
+        str: The dataset directory
+    """
+    root = root if root is not None else os.path.splitext(csv_path)[0]
+    if is_dataset(root):
+        shutil.rmtree(root)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=_csv_dtypes(csv_path, None)):
+        chunk = chunk.loc[:, ~chunk.columns.str.startswith("Unnamed")]
+        write_dataset(chunk, root)
+    return root
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Convert the csv output of a stage, e.g. python dataset.py time_filtered/*.csv
+    for csv_file in sys.argv[1:]:
+        print(f"Converting {csv_file}")
+        csv_to_dataset(csv_file)
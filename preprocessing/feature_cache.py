@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from typing import Callable, Optional
+
+import dataset
+
+# Ready to train feature matrices, one directory per key with
+#   X.npy     float32, rows x features
+#   y.npy     float32 target
+#   meta.json feature names, target dtype, sources and params
+# The modification time of meta.json is the last use of the entry, the least recently used entries are
+# removed once the cache grows above MAX_BYTES.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "feature-cache")
+MAX_BYTES = 16 * 1024 ** 3
+
+# Remembers the hash of every source by path, size and modification time so an unchanged
+# source is not read again
+SOURCES_FILENAME = "sources.json"
+META_FILENAME = "meta.json"
+CHUNK_SIZE = 1 << 20
+
+TARGET = "is_fault"
+DROP_COLUMNS = ["Unnamed: 0", "is_fault", "ts"]
+# Drop columns that are only there in some datasets, the index of a csv written with it
+OPTIONAL_DROP_COLUMNS = ["Unnamed: 0"]
+
+
+def _file_hash(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(CHUNK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _files(path: str) -> list:
+    if not dataset.is_dataset(path):
+        return [path]
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+
+
+def source_hash(path: str, cache_dir: str = CACHE_DIR) -> str:
+    """The sha256 of a csv or parquet file, or of every file of a dataset directory
+
+    Args:
+        path (str): The source
+        cache_dir (str): Where the hashes of unchanged files are remembered
+
+    Returns:
+        str: Hex digest
+    """
+    memo_path = os.path.join(cache_dir, SOURCES_FILENAME)
+    try:
+        with open(memo_path) as file:
+            memo = json.load(file)
+    except (OSError, ValueError):
+        memo = {}
+
+    sha256 = hashlib.sha256()
+    changed = False
+    for name in _files(path):
+        name = os.path.abspath(name)
+        stat = os.stat(name)
+        known = memo.get(name)
+        if known is None or known[:2] != [stat.st_size, stat.st_mtime_ns]:
+            known = memo[name] = [stat.st_size, stat.st_mtime_ns, _file_hash(name)]
+            changed = True
+        sha256.update(os.path.relpath(name, os.path.abspath(path)).encode())
+        sha256.update(known[2].encode())
+
+    if changed:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{memo_path}.{uuid.uuid4().hex}"
+        with open(tmp_path, "w") as file:
+            json.dump(memo, file)
+        os.replace(tmp_path, memo_path)
+    return sha256.hexdigest()
+
+
+def cache_key(sources: list, params: dict, cache_dir: str = CACHE_DIR) -> str:
+    """Key of the features computed from sources with params, e.g. the interval multiplier,
+    threshold quantile and nodes. Changing a source or a parameter gives a new key.
+
+    Args:
+        sources (list): Paths the features are computed from
+        params (dict): JSON serializable parameters of the computation
+        cache_dir (str): The cache
+
+    Returns:
+        str: Hex digest
+    """
+    description = {
+        "sources": [source_hash(source, cache_dir) for source in sources],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load(key: str, cache_dir: str = CACHE_DIR) -> Optional[tuple]:
+    """Loads a cached feature matrix and marks it as used
+
+    Args:
+        key (str): See cache_key
+        cache_dir (str): The cache
+
+    Returns:
+        Optional[tuple]: (X, y) or None if the key is not cached
+    """
+    entry = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry, META_FILENAME)
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+        X = np.load(os.path.join(entry, "X.npy"))
+        y = np.load(os.path.join(entry, "y.npy"))
+        os.utime(meta_path)
+    except (OSError, ValueError):
+        # Missing, or removed by another process while reading
+        return None
+    return pd.DataFrame(X, columns=meta["columns"], copy=False), pd.Series(y.astype(meta["y_dtype"]), name=meta["target"])
+
+
+def store(key: str, X: pd.DataFrame, y: pd.Series, info: Optional[dict] = None,
+          cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES) -> None:
+    """Stores a feature matrix as float32 and evicts the least recently used entries above max_bytes
+
+    Args:
+        key (str): See cache_key
+        X (pd.DataFrame): Numeric or boolean features
+        y (pd.Series): Target
+        info (Optional[dict]): Saved in meta.json to tell entries apart, e.g. sources and params
+        cache_dir (str): The cache
+        max_bytes (int): Size cap of the cache
+    """
+    entry = os.path.join(cache_dir, key)
+    # Written next to the entry and renamed, readers never see a partial entry
+    tmp_entry = f"{entry}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_entry)
+    try:
+        np.save(os.path.join(tmp_entry, "X.npy"), np.ascontiguousarray(X.to_numpy(dtype=np.float32)))
+        np.save(os.path.join(tmp_entry, "y.npy"), y.to_numpy(dtype=np.float32))
+        meta = {
+            "columns": [str(column) for column in X.columns],
+            "target": y.name,
+            "y_dtype": str(y.dtype),
+            "info": info or {},
+        }
+        with open(os.path.join(tmp_entry, META_FILENAME), "w") as file:
+            json.dump(meta, file, default=str)
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # Stored by another process in the meantime
+        if not os.path.isdir(entry):
+            raise
+    finally:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    evict(cache_dir, max_bytes, keep=key)
+
+
+def _entry_size(entry: str) -> int:
+    return sum(entry_file.stat().st_size for entry_file in os.scandir(entry))
+
+
+def evict(cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES, keep: Optional[str] = None) -> list:
+    """Removes the least recently used entries until the cache is at most max_bytes
+
+    Args:
+        cache_dir (str): The cache
+        max_bytes (int): Size cap of the cache
+        keep (Optional[str]): Key that is never removed, the entry that was just stored
+
+    Returns:
+        list: The removed keys
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.is_dir() or entry.name.endswith(".tmp"):
+            continue
+        try:
+            last_used = os.stat(os.path.join(entry.path, META_FILENAME)).st_mtime
+            entries.append((last_used, entry.name, _entry_size(entry.path)))
+        except OSError:
+            continue
+
+    total = sum(size for _, _, size in entries)
+    removed = []
+    for _, key, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        total -= size
+        removed.append(key)
+    return removed
+
+
+def split_features(df: pd.DataFrame, drop_columns: list = DROP_COLUMNS, target: str = TARGET,
+                   dropna: bool = True, start: int = 0) -> tuple:
+    """X and y of a processed dataset the way the experiments train on it
+
+    Args:
+        df (pd.DataFrame): Processed dataset, e.g. a *_proc.csv
+        drop_columns (list): Columns that are not features, all but OPTIONAL_DROP_COLUMNS must be in df
+        target (str): The target column
+        dropna (bool): Drop rows with a NaN, the first rtt means are NaN
+        start (int): Skip the first rows
+
+    Returns:
+        tuple: (X, y)
+    """
+    df = df.iloc[start:]
+    if dropna:
+        df = df.dropna()
+    X = df.drop(columns=[column for column in drop_columns
+                         if column in df.columns or column not in OPTIONAL_DROP_COLUMNS])
+    return X, df[target]
+
+
+def cached_features(sources: list, params: dict, build: Callable[[], tuple],
+                    cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES) -> tuple:
+    """Returns the cached features of sources and params, build is only called on a miss
+
+    Args:
+        sources (list): Paths the features are computed from
+        params (dict): JSON serializable parameters of the computation
+        build (Callable[[], tuple]): Computes (X, y)
+        cache_dir (str): The cache
+        max_bytes (int): Size cap of the cache
+
+    Returns:
+        tuple: (X, y), X is float32
+    """
+    key = cache_key(sources, params, cache_dir)
+    cached = load(key, cache_dir)
+    if cached is not None:
+        return cached
+    X, y = build()
+    store(key, X, y, {"sources": [os.path.abspath(source) for source in sources], "params": params},
+          cache_dir, max_bytes)
+    return load(key, cache_dir)
+
+
+def _feature_options(drop_columns, target, dropna, start):
+    return {"drop_columns": list(drop_columns), "target": target, "dropna": dropna, "start": start}
+
+
+def load_features(path: str, drop_columns: list = DROP_COLUMNS, target: str = TARGET,
+                  dropna: bool = True, start: int = 0,
+                  cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES) -> tuple:
+    """X and y of a processed dataset, only read and split again if the dataset changed.
+    See split_features for the arguments.
+
+    Returns:
+        tuple: (X, y), X is float32
+    """
+    options = _feature_options(drop_columns, target, dropna, start)
+    return cached_features([path], {"features": options},
+                           lambda: split_features(dataset.read_frame(path), **options),
+                           cache_dir, max_bytes)
+
+
+def store_features(path: str, df: pd.DataFrame, params: Optional[dict] = None,
+                   cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES) -> None:
+    """Caches the default features of a processed dataset right after df was written to path,
+    so the first load_features of it does not parse the file
+
+    Args:
+        path (str): Where df was written
+        df (pd.DataFrame): The processed dataset
+        params (Optional[dict]): The parameters of the processing, e.g. the interval multiplier, threshold
+            quantile and nodes. They are saved with the entry, the hash of path already changes with them.
+        cache_dir (str): The cache
+        max_bytes (int): Size cap of the cache
+    """
+    options = _feature_options(DROP_COLUMNS, TARGET, True, 0)
+    key = cache_key([path], {"features": options}, cache_dir)
+    X, y = split_features(df, **options)
+    store(key, X, y, {"sources": [os.path.abspath(path)], "params": params or {}}, cache_dir, max_bytes)
@@ -1,12 +1,27 @@
 import os
+import argparse
+import hashlib
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
 from collections import defaultdict
+from functools import partial
+from parallel_filter import filter_file, filter_files
+
+# The C filters as a library (see cfilters.py), the numpy search below is used without them
+try:
+    import cfilters
+except ImportError:
+    cfilters = None
 
 CHUNK_SIZE = 1000000
 
 EXCLUDE_FILE_PATH = 'operator_filtered/'
 
+# The downtime periods are shared with the C filters (see c_filters/include/csv.h). Every mode file has its own
+# periods file named by its sha256, so runs on other mode files or networks never overwrite each other's periods.
+DOWNTIME_PATH = 'downtime/'
+PERIODS_FILENAME = 'periods-{digest}.csv'
+
 def get_filenames(folder_path):
     if not os.path.exists(folder_path):
         print(f"The folder '{folder_path}' does not exist.")
@@ -22,41 +37,206 @@ def get_filenames(folder_path):
     return all_filenames
 
 
-def find_bad_time_periods(input_file):
-    df = pd.read_csv(input_file)
-
-    bad_periods = []
-    node_dict = defaultdict(list)
-
-    for _, row in tqdm(df.iterrows(), desc=f"Processing {os.path.basename(input_file)}"):
-        event_type = row["mode"]
-        node_id = row["node_id"]
-        timestamp = row["ts"]
-
-        if event_type == 0 and not node_dict[node_id]:
-            node_dict[node_id].append((timestamp, "start"))
-        elif event_type == 6 and node_dict[node_id]:
-            start_time, _ = node_dict[node_id].pop()
-            bad_periods.append({"node_id": node_id, "start_time": start_time, "end_time": timestamp})
+def mode_transitions(df):
+    """
+    Keeps the mode 0 and mode 6 events that change the state of a node, i.e. what a state machine per node
+    would act on. What is left alternates 0, 6, 0, 6, ... per node.
+    """
+    events = df.loc[df["mode"].isin([0, 6]), ["ts", "node_id", "mode"]]
+
+    # Only the first event of a run of equal modes changes the state of the node
+    previous_mode = events.groupby("node_id")["mode"].shift()
+    transitions = events[events["mode"] != previous_mode]
+
+    # A node starts up, so a leading mode 6 event does nothing
+    first = transitions.groupby("node_id").cumcount() == 0
+    return transitions[~(first & (transitions["mode"] == 6))]
+
+
+def pair_mode_events(df):
+    """
+    Pairs every mode 0 event with the next mode 6 event of the same node. A mode 0 event while the node
+    is already down and a mode 6 event while it is up are ignored, like a state machine per node would.
+    """
+    transitions = mode_transitions(df)
+
+    # A trailing 0 is a node that is still down
+    position = transitions.groupby("node_id").cumcount()
+    starts = transitions[position % 2 == 0].assign(pair=position // 2)
+    ends = transitions[position % 2 == 1].assign(pair=position // 2)
+    periods = ends.reset_index().merge(starts, on=["node_id", "pair"], suffixes=("_end", "_start"))
+
+    # Same order as the periods are closed in the file
+    periods = periods.sort_values(by="index")
+    return periods.rename(columns={"ts_start": "start_time", "ts_end": "end_time"})[["node_id", "start_time", "end_time"]]
+
+
+def open_downtime_starts(df):
+    """
+    Returns node_id -> start of the downtime period that has not ended yet, for the nodes that are down
+    at the end of the mode events.
+    """
+    last = mode_transitions(df).groupby("node_id").last()
+    return last.loc[last["mode"] == 0, "ts"].to_dict()
+
+
+def find_bad_time_periods(input_file, network_id=None):
+    if network_id is None:
+        df = pd.read_csv(input_file, usecols=["ts", "node_id", "mode"])
+    else:
+        # The raw mode file, only the events of one network count
+        df = pd.read_csv(input_file, usecols=["ts", "node_id", "network_id", "mode"])
+        df = df[df["network_id"] == network_id]
+    return pair_mode_events(df).to_dict("records")
+
+
+def file_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(CHUNK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def periods_filename(mode_file, network_id=None):
+    """
+    The name of the periods file of a mode file, the C filters find it by the same name.
+    """
+    digest = file_hash(mode_file)
+    if network_id is not None:
+        digest += f"-network_{network_id}"
+    return PERIODS_FILENAME.format(digest=digest)
+
+
+def load_bad_time_periods(mode_file, downtime_path=DOWNTIME_PATH, network_id=None):
+    """
+    Returns the bad periods of a mode file. They are cached in downtime_path under the hash of the mode file,
+    so they are only recomputed when the mode file changes. The C filters read the same file.
+    With a network_id the mode file is a raw file and only the events of that network are used.
+    """
+    periods_file = os.path.join(downtime_path, periods_filename(mode_file, network_id))
+    if os.path.exists(periods_file):
+        periods = pd.read_csv(periods_file, dtype={"start_time": str, "end_time": str})
+        return periods.to_dict("records")
+
+    periods = find_bad_time_periods(mode_file, network_id)
+
+    os.makedirs(downtime_path, exist_ok=True)
+    tmp_file = f"{periods_file}.{os.getpid()}.tmp"
+    pd.DataFrame(periods, columns=["node_id", "start_time", "end_time"]).to_csv(tmp_file, index=False)
+    os.replace(tmp_file, periods_file)
+    return periods
+
+
+def to_instants(ts):
+    """
+    Timestamps as datetime64[ns] instants, the way the bad periods are compared. Strings may have any number of
+    fraction digits, "2023-11-01 00:00:10" and "2023-11-01 00:00:10.000000" are the same instant.
+    """
+    return pd.to_datetime(np.asarray(ts), format="ISO8601").to_numpy(dtype="datetime64[ns]")
+
+
+def build_interval_index(bad_periods):
+    """
+    Builds a node_id -> (starts, ends) index of the bad periods, as datetime64[ns] instants. The periods of a
+    node are sorted and overlapping periods are merged, so both arrays are sorted and can be binary searched.
+    """
+    node_periods = defaultdict(list)
+    for period in bad_periods:
+        start, end = pd.Timestamp(period["start_time"]), pd.Timestamp(period["end_time"])
+        if start < end:
+            node_periods[period["node_id"]].append((start, end))
+
+    interval_index = {}
+    for node_id, periods in node_periods.items():
+        periods.sort()
+        starts, ends = [periods[0][0]], [periods[0][1]]
+        for start, end in periods[1:]:
+            if start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        interval_index[node_id] = (np.array(starts, dtype="datetime64[ns]"), np.array(ends, dtype="datetime64[ns]"))
+    return interval_index
+
+
+class PeriodMask:
+    """
+    Marks the rows in a bad period of their node, see in_bad_period, for every chunk of a file. The C index of
+    the periods is built on the first chunk and reused. It is not pickled, so every pool worker builds its own
+    once. threads is the number of threads of the C filter, 0 for one per CPU. Pool workers already run one file
+    per CPU and should pass 1.
+    """
+
+    def __init__(self, interval_index, threads=0):
+        self.interval_index = interval_index
+        self.threads = threads
+        self.periods = None
+
+    def __getstate__(self):
+        return {"interval_index": self.interval_index, "threads": self.threads}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __call__(self, chunk):
+        if cfilters is None:
+            return search_bad_periods(chunk, self.interval_index)
+        if self.periods is None:
+            self.periods = cfilters.period_index(self.interval_index)
+        return cfilters.mask_bad_periods(chunk["ts"], chunk["node_id"], self.periods, self.threads)
+
+
+def in_bad_period(chunk, interval_index):
+    """
+    Marks the rows with start <= ts < end for a bad period of their node, in C if the library is built.
+    interval_index is an index of build_interval_index, or a PeriodMask of one when many chunks are filtered.
+
+    Both ways compare the timestamps as instants, see to_instants, so the result does not depend on whether the
+    library is built. Comparing the strings as they are in the files, as the filter used to, differs for the
+    same instant written with another number of fraction digits.
+    """
+    if not isinstance(interval_index, PeriodMask):
+        interval_index = PeriodMask(interval_index)
+    return interval_index(chunk)
+
+
+def search_bad_periods(chunk, interval_index):
+    """
+    Marks the rows with start <= ts < end for a bad period of their node, in one pass over the chunk.
+    """
+    mask = np.zeros(len(chunk), dtype=bool)
+    chunk_ts = to_instants(chunk["ts"])
+    for node_id, rows in chunk.groupby("node_id").indices.items():
+        if node_id not in interval_index:
+            continue
+        starts, ends = interval_index[node_id]
+        ts = chunk_ts[rows]
+        # The last period starting at or before ts is the only one that can contain it
+        idx = np.searchsorted(starts, ts, side="right") - 1
+        mask[rows] = (idx >= 0) & (ts < ends[np.maximum(idx, 0)])
+    return mask
+
+
+def keep_rows(chunk, interval_index):
+    return ~in_bad_period(chunk, interval_index)
+
+
+def filter_csv(input_file, interval_index, output_file=None):
+    output_file = output_file or 'time_filtered/' + os.path.basename(input_file)
+    keep = partial(keep_rows, interval_index=PeriodMask(interval_index))
+    return filter_file(input_file, output_file, keep, CHUNK_SIZE)
 
-    return bad_periods
-
-
-def filter_csv(input_file, bad_periods):
-    for chunk in pd.read_csv(input_file, chunksize=CHUNK_SIZE):
-        for period in tqdm(bad_periods, desc=f"Processing {os.path.basename(input_file)}"):
-            mask = (
-                (chunk["node_id"] == period["node_id"])
-                & (chunk["ts"] >= period["start_time"])
-                & (chunk["ts"] < period["end_time"])
-            )
-            chunk = chunk[~mask]
-
-        chunk.to_csv('time_filtered/' + input_file.split('/')
-                    [1], index=False,  mode='a')
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drop the rows in downtime periods of every file in operator/")
+    parser.add_argument("--workers", type=int, default=None, help="Number of files filtered at once")
+    args = parser.parse_args()
+
     files = get_filenames("operator")
-    bad_time_periods = find_bad_time_periods('operator/metadata_mode_events.csv')
-    for file in files:
-        filter_csv('operator/' + file, bad_time_periods)
+    bad_time_periods = load_bad_time_periods('operator/metadata_mode_events.csv')
+    # Every worker filters one file at a time, so the C filter of a worker runs on one thread
+    periods = PeriodMask(build_interval_index(bad_time_periods), threads=1)
+    jobs = [('operator/' + file, 'time_filtered/' + file) for file in files]
+    filter_files(jobs, partial(keep_rows, interval_index=periods), workers=args.workers, chunksize=CHUNK_SIZE)
@@ -0,0 +1,43 @@
+import os
+import argparse
+from functools import partial
+from filter import PeriodMask, load_bad_time_periods, build_interval_index, keep_rows
+from filter_network_id import network_mask
+from parallel_filter import filter_file, filter_files
+
+CHUNK_SIZE = 1000000
+
+RAW_FILE_PATH = 'data/'
+OUTPUT_FILE_PATH = 'time_filtered/'
+
+
+def keep_network_rows(chunk, interval_index):
+    """
+    The predicates of filter_network_id.py and filter.py applied to the same chunk. A row is kept if it is
+    from network 2 and outside the downtime periods of its node. interval_index is an index of
+    filter.build_interval_index or a filter.PeriodMask of one.
+    """
+    in_network = network_mask(chunk).to_numpy()
+    mask = in_network.copy()
+    mask[in_network] = keep_rows(chunk[in_network], interval_index)
+    return mask
+
+
+def filter_csv(input_file, interval_index, output_file=None):
+    output_file = output_file or OUTPUT_FILE_PATH + os.path.basename(input_file)
+    keep = partial(keep_network_rows, interval_index=PeriodMask(interval_index))
+    return filter_file(input_file, output_file, keep, CHUNK_SIZE)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Filter the raw files in data/ straight into time_filtered/, the same as running "
+                    "filter_network_id.py and filter.py after each other but reading every file once")
+    parser.add_argument("--workers", type=int, default=None, help="Number of files filtered at once")
+    args = parser.parse_args()
+
+    bad_time_periods = load_bad_time_periods(RAW_FILE_PATH + 'metadata_mode_events.csv', network_id=2)
+    # Every worker filters one file at a time, so the C filter of a worker runs on one thread
+    periods = PeriodMask(build_interval_index(bad_time_periods), threads=1)
+    jobs = [(RAW_FILE_PATH + file, OUTPUT_FILE_PATH + file) for file in sorted(os.listdir(RAW_FILE_PATH))]
+    filter_files(jobs, partial(keep_network_rows, interval_index=periods), workers=args.workers, chunksize=CHUNK_SIZE)
@@ -1,6 +1,6 @@
 import os
-import pandas as pd
-from tqdm import tqdm
+import argparse
+from parallel_filter import filter_file, filter_files
 
 CHUNK_SIZE = 1000000
 
@@ -22,17 +22,20 @@ def get_filenames(folder_path):
     return all_filenames
 
 
-def filter_csv(input_file):
-    for chunk in (tqdm(pd.read_csv(input_file, chunksize=CHUNK_SIZE), desc=f"Processing {os.path.basename(input_file)}")):
-        mask = (chunk["network_id"] == 2)
+def network_mask(chunk):
+    return chunk["network_id"] == 2
 
-        chunk = chunk[mask]
 
-        chunk.to_csv('operator/' + input_file.split('/')
-                     [1], index=False,  mode='a')
+def filter_csv(input_file, output_file=None):
+    output_file = output_file or 'operator/' + os.path.basename(input_file)
+    return filter_file(input_file, output_file, network_mask, CHUNK_SIZE)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Keep the rows of network 2 of every file in data/")
+    parser.add_argument("--workers", type=int, default=None, help="Number of files filtered at once")
+    args = parser.parse_args()
+
     files = get_filenames("data")
-    for file in files:
-        filter_csv('data/' + file)
+    jobs = [('data/' + file, 'operator/' + file) for file in files]
+    filter_files(jobs, network_mask, workers=args.workers, chunksize=CHUNK_SIZE)
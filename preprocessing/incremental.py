@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import shutil
+import pandas as pd
+from functools import partial
+from typing import Optional
+import dataset
+import preprocess as pp
+from aggregate_rtt import METADATA_KEYS, filter_and_aggregate
+from filter import PeriodMask, build_interval_index, load_bad_time_periods, open_downtime_starts
+from filter_fused import keep_network_rows
+
+# Everything the incremental mode knows about earlier runs, see load_state
+STATE_FILE = "./incremental_state.json"
+# Next to the state file, the stages write their output here before it is moved into place, see commit
+STAGING_SUFFIX = ".staging"
+
+RAW_FOLDER = "data"
+FILTERED_FOLDER = "time_filtered"
+RTT_FILE = "packetloss_rtt_rawdata_1sec_bins.csv"
+MODE_FILE = "metadata_mode_events.csv"
+
+# The widest rolling window of create_rtt_means, rows this far before the watermark of a node are
+# processed again so the windows of the new rows are complete
+PROCESS_LOOKBACK = "10min"
+
+# How far back metadata is loaded for new RTT rows, see aggregate_rtt.aggregate_partition
+AGGREGATE_LOOKBACK = "1D"
+
+
+def load_state(path: str = STATE_FILE) -> dict:
+    """Loads the high-water marks of earlier runs. Timestamps are stored as iso strings and node ids as
+    strings, since they are json keys.
+
+    {
+        "sources": {"data/<file>.csv": {"<node_id>": "<last ts read>"}},
+        "aggregated": {"<node_id>": "<last ts aggregated>"},
+        "processed": {"<node_id>": {"ts": "<last ts written>", "rtt_bounds": [lower, upper], "rtt_threshold": x}},
+        "pending": [<output of the last stage that is not in place yet, see publish>]
+    }
+
+    Args:
+        path (str): The state file
+
+    Returns:
+        dict: The state, empty if nothing has been ingested yet
+    """
+    if not os.path.exists(path):
+        return {"sources": {}, "aggregated": {}, "processed": {}, "pending": []}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_state(state: dict, path: str = STATE_FILE) -> None:
+    """Writes the state atomically, so an interrupted run leaves the state of the previous run behind
+
+    Args:
+        state (dict): See load_state
+        path (str): The state file
+    """
+    with open(path + ".tmp", "w") as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def publish(move: dict) -> None:
+    """Moves staged output into place. Doing it again after it died halfway gives the same result.
+
+        {"dataset": staging root, "target": root}: the part files are moved into the partitions of root
+        {"replace": staged file, "target": path}: the file replaces path
+        {"append": staged rows, "target": path, "size": size of path before}: path is cut back to size and the
+            rows are appended, so rows of an append that died are not written twice
+
+    Args:
+        move (dict): One of the above
+    """
+    if "dataset" in move:
+        for directory, _, names in os.walk(move["dataset"]):
+            target = os.path.join(move["target"], os.path.relpath(directory, move["dataset"]))
+            for name in names:
+                os.makedirs(target, exist_ok=True)
+                shutil.move(os.path.join(directory, name), os.path.join(target, name))
+        shutil.rmtree(move["dataset"], ignore_errors=True)
+    elif not os.path.exists(move.get("replace", move.get("append"))):
+        # Done already
+        return
+    elif "replace" in move:
+        shutil.move(move["replace"], move["target"])
+    else:
+        with open(move["target"], "r+b") as file, open(move["append"], "rb") as rows:
+            file.truncate(move["size"])
+            file.seek(move["size"])
+            shutil.copyfileobj(rows, file)
+        os.remove(move["append"])
+
+
+def commit(state: dict, moves: list, path: str = STATE_FILE) -> None:
+    """Saves the state together with the moves that put the staged output of a stage in place, then moves it.
+    A run that dies before the state is saved leaves the old watermarks behind and the stage is redone, one
+    that dies afterwards is finished by the next run, see run.
+
+    Args:
+        state (dict): See load_state
+        moves (list): See publish
+        path (str): The state file
+    """
+    state["pending"] = moves
+    save_state(state, path)
+    for move in moves:
+        publish(move)
+    state["pending"] = []
+    save_state(state, path)
+
+
+def watermark(marks: dict, node_id) -> Optional[pd.Timestamp]:
+    ts = marks.get(str(node_id))
+    return None if ts is None else pd.Timestamp(ts)
+
+
+def newer_rows(df: pd.DataFrame, ts: pd.Series, marks: dict) -> pd.Series:
+    """Marks the rows that are newer than the watermark of their node"""
+    marked = df["node_id"].astype(str).map(marks)
+    return marked.isna() | (ts > pd.to_datetime(marked))
+
+
+def ingest_file(
+    input_file: str, out_root: str, keep, marks: dict, hold_back: dict, chunksize: int = dataset.CHUNK_SIZE
+) -> int:
+    """Writes the rows of a raw file that are newer than the watermark of their node to out_root.
+    Rows at or after the start of a downtime period that has not ended yet are held back, whether they end
+    up in the period is only known once the node is up again.
+
+    Args:
+        input_file (str): Raw csv file, e.g. "data/packetloss_rtt_rawdata_1sec_bins.csv"
+        out_root (str): Dataset the filtered rows are written to, the staging root of the filtered dataset
+        keep: Row predicate, e.g. filter_fused.keep_network_rows
+        marks (dict): Watermarks of this file, node_id -> last ts read. Updated in place.
+        hold_back (dict): node_id -> start of the open downtime period of the node
+
+    Returns:
+        int: Number of rows written
+    """
+    rows = 0
+    for chunk in pd.read_csv(input_file, chunksize=chunksize):
+        # The ts strings are written back as they are in the file, so parse a copy
+        ts = pd.to_datetime(chunk["ts"])
+        held = pd.to_datetime(chunk["node_id"].map(hold_back))
+        new = newer_rows(chunk, ts, marks) & (held.isna() | (ts < held))
+        chunk, ts = chunk[new], ts[new]
+        if chunk.empty:
+            continue
+
+        # The rows that have been read, kept or not, are done
+        for node_id, last in ts.groupby(chunk["node_id"]).max().items():
+            marks[str(node_id)] = last.isoformat()
+
+        chunk = chunk[keep(chunk)]
+        if not chunk.empty:
+            dataset.write_dataset(chunk, out_root)
+            rows += len(chunk)
+    return rows
+
+
+def aggregate_new_rows(rtt_root: str, folder_name: str, out_root: str, marks: dict, node_ids: list) -> int:
+    """Aggregates the RTT rows that are newer than the aggregated watermark of their node
+
+    Args:
+        rtt_root (str): Dataset with the filtered 1 second RTT data
+        folder_name (str): Folder with the filtered metadata
+        out_root (str): Dataset the aggregated rows are written to, the staging root of the aggregated dataset
+        marks (dict): node_id -> last ts aggregated. Updated in place.
+        node_ids (list): Nodes to aggregate
+
+    Returns:
+        int: Number of rows written
+    """
+    rows = 0
+    for node_id in node_ids:
+        since = watermark(marks, node_id)
+        df = dataset.read_dataset(rtt_root, node_ids=[node_id], start=since)
+        if since is not None:
+            df = df[df["ts"] > since]
+        if df.empty:
+            continue
+
+        marks[str(node_id)] = df["ts"].max().isoformat()
+        df = filter_and_aggregate(
+            df, folder_name, node_ids=[node_id], start=df["ts"].min() - pd.Timedelta(AGGREGATE_LOOKBACK))
+        if not df.empty:
+            dataset.write_dataset(df, out_root)
+            rows += len(df)
+    return rows
+
+
+def stage_csv(df: pd.DataFrame, path: str, staging_path: str) -> dict:
+    """Stages rows that are appended to a processed csv file. The dummy columns of a batch only cover the hours
+    and weekdays in it, so the columns are aligned with the file and the whole file is staged if new ones appear.
+
+    Args:
+        df (pd.DataFrame): The new rows
+        path (str): The processed csv file
+        staging_path (str): Where the rows are staged
+
+    Returns:
+        dict: The move that appends them, see publish
+    """
+    if not os.path.exists(path):
+        df.to_csv(staging_path, index=False)
+        return {"replace": staging_path, "target": path}
+
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    if set(df.columns) <= set(columns):
+        df.reindex(columns=columns, fill_value=False).to_csv(staging_path, header=False, index=False)
+        return {"append": staging_path, "target": path, "size": os.path.getsize(path)}
+
+    df = pd.concat([pd.read_csv(path), df], ignore_index=True)
+    dummies = [column for column in df.columns if column.startswith(("hour_", "weekday_"))]
+    df[dummies] = df[dummies].astype("boolean").fillna(False).astype(bool)
+    df.to_csv(staging_path, index=False)
+    return {"replace": staging_path, "target": path}
+
+
+def process_new_rows(aggregated_root: str, out_folder: str, state: dict, node_ids: list, staging: str) -> tuple:
+    """Processes the aggregated rows that are newer than the processed watermark of their node and
+    stages them for "<out_folder>/<node_id>_3_months_aggregated_proc.csv", see the "seperate" variant of pipeline.py.
+
+    The outlier bounds and the fault threshold are quantiles over all rows of a node. They are computed
+    on the first run of a node and reused afterwards, so earlier rows keep their labels.
+
+    Args:
+        aggregated_root (str): Dataset with the aggregated rows
+        out_folder (str): Folder with the processed csv files
+        state (dict): node_id -> {"ts", "rtt_bounds", "rtt_threshold"}. Updated in place.
+        node_ids (list): Nodes to process
+        staging (str): Folder the rows are staged in
+
+    Returns:
+        tuple: Number of rows written and the moves that append them, see publish
+    """
+    rows = 0
+    moves = []
+    os.makedirs(staging, exist_ok=True)
+    for node_id in node_ids:
+        node_state = state.get(str(node_id))
+        since = None if node_state is None else pd.Timestamp(node_state["ts"])
+        start = None if since is None else since - pd.Timedelta(PROCESS_LOOKBACK)
+
+        df = dataset.read_dataset(aggregated_root, columns=pp.PROCESS_COLUMNS, node_ids=[node_id], start=start)
+        if df.empty or (since is not None and not (df["ts"] > since).any()):
+            continue
+
+        if node_state is None:
+            df, rtt_bounds, rtt_threshold = pp.process_node(df)
+        else:
+            rtt_bounds, rtt_threshold = tuple(node_state["rtt_bounds"]), node_state["rtt_threshold"]
+            df, _, _ = pp.process_node(df, rtt_bounds, rtt_threshold)
+            # The lookback rows have been written already
+            df = df[df["ts"] > since]
+        if df.empty:
+            continue
+
+        filename = f"{node_id}_3_months_aggregated_proc.csv"
+        moves.append(stage_csv(df, os.path.join(out_folder, filename), os.path.join(staging, filename)))
+        state[str(node_id)] = {
+            "ts": df["ts"].max().isoformat(),
+            "rtt_bounds": [float(bound) for bound in rtt_bounds],
+            "rtt_threshold": float(rtt_threshold),
+        }
+        rows += len(df)
+    return rows, moves
+
+
+def run(
+    node_ids: list,
+    raw_folder: str = RAW_FOLDER,
+    filtered_folder: str = FILTERED_FOLDER,
+    aggregated_root: str = "./oslo_3_month_aggregated",
+    out_folder: str = "./3_month_data",
+    state_file: str = STATE_FILE,
+    metadata_keys: list = METADATA_KEYS,
+) -> dict:
+    """Runs filtering, aggregation and processing over the rows that arrived since the last run.
+    Every stage writes to a staging folder and is committed together with its watermarks, see commit. The output
+    of a stage that dies is dropped and the stage is redone by the next run, no row is written twice.
+
+    Args:
+        node_ids (list): Nodes to aggregate and process
+        raw_folder (str): Folder with the raw csv files
+        filtered_folder (str): Folder the filtered datasets are written to
+        aggregated_root (str): Dataset the aggregated rows are written to
+        out_folder (str): Folder with the processed csv files
+        state_file (str): See load_state
+        metadata_keys (list): Metadata keys to attach, e.g. ["rssi", "rsrq", "rsrp"]
+
+    Returns:
+        dict: Number of rows written per stage
+    """
+    state = load_state(state_file)
+    # Finish the moves of a run that died after its last commit, whatever else is staged was never committed
+    if state.get("pending"):
+        commit(state, state["pending"], state_file)
+    staging = state_file + STAGING_SUFFIX
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(filtered_folder, exist_ok=True)
+    os.makedirs(out_folder, exist_ok=True)
+
+    mode_file = os.path.join(raw_folder, MODE_FILE)
+    periods = load_bad_time_periods(mode_file, network_id=2)
+    keep = partial(keep_network_rows, interval_index=PeriodMask(build_interval_index(periods)))
+    mode_df = pd.read_csv(mode_file, usecols=["ts", "node_id", "network_id", "mode"])
+    hold_back = open_downtime_starts(mode_df[mode_df["network_id"] == 2])
+
+    sources = [RTT_FILE, MODE_FILE]
+    for metadata_key in metadata_keys:
+        sources += [f"metadata_{metadata_key}_events.csv", f"metadata_{metadata_key}_1min_bin.csv"]
+
+    written = {}
+    for source in sources:
+        input_file = os.path.join(raw_folder, source)
+        marks = state["sources"].setdefault(input_file, {})
+        out_root = os.path.join(filtered_folder, os.path.splitext(source)[0])
+        staged_root = os.path.join(staging, os.path.splitext(source)[0])
+        written[source] = ingest_file(input_file, staged_root, keep, marks, hold_back)
+        commit(state, [{"dataset": staged_root, "target": out_root}], state_file)
+
+    rtt_root = os.path.join(filtered_folder, os.path.splitext(RTT_FILE)[0])
+    staged_root = os.path.join(staging, "aggregated")
+    written["aggregated"] = aggregate_new_rows(
+        rtt_root, filtered_folder, staged_root, state["aggregated"], node_ids)
+    commit(state, [{"dataset": staged_root, "target": aggregated_root}], state_file)
+
+    written["processed"], moves = process_new_rows(
+        aggregated_root, out_folder, state["processed"], node_ids, os.path.join(staging, "processed"))
+    commit(state, moves, state_file)
+    shutil.rmtree(staging, ignore_errors=True)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the rows that arrived since the last run")
+    parser.add_argument("--state", default=STATE_FILE, help="File with the watermarks of earlier runs")
+    args = parser.parse_args()
+
+    node_ids = [4143, 4122, 4127, 4147, 4120, 4144, 4125, 4133, 4138, 4121, 4134]
+    for stage, rows in run(node_ids, state_file=args.state).items():
+        print(f"{stage}: {rows} new rows")
@@ -0,0 +1,195 @@
+from collections import deque
+from typing import Optional
+import numpy as np
+import pandas as pd
+import preprocess as pp
+
+# The radio metrics the features are built from, the 1 minute bins of aggregate_rtt
+RADIO_KEYS = ["rssi", "rsrq", "rsrp"]
+
+
+class RollingMean:
+    """Mean of the values in (t - window, t], like pandas' time based rolling(window).mean()"""
+
+    def __init__(self, window: str):
+        self.window = pd.Timedelta(window).value
+        self.values = deque()
+        self.total = 0.0
+
+    def add(self, ts: int, value: float) -> float:
+        self.values.append((ts, value))
+        self.total += value
+        while self.values[0][0] <= ts - self.window:
+            self.total -= self.values.popleft()[1]
+        return self.total / len(self.values)
+
+
+class NodeState:
+    """What the engine remembers about a node, at most the widest window of RTT samples and the
+    radio bins that are not older than the current minute"""
+
+    def __init__(self, windows: list):
+        self.means = [RollingMean(window) for window in windows]
+        self.radio = {key: deque() for key in RADIO_KEYS}
+
+    def add_bin(self, minute: int, key: str, value: float) -> None:
+        bins = self.radio[key]
+        # A later bin of the same minute replaces the earlier one
+        if bins and bins[-1][0] == minute:
+            bins.pop()
+        bins.append((minute, value))
+
+    def radio_value(self, key: str, minute: int) -> Optional[float]:
+        """The last bin at or before minute, the same as the as-of join in aggregate_rtt"""
+        bins = self.radio[key]
+        while len(bins) > 1 and bins[1][0] <= minute:
+            bins.popleft()
+        if not bins or bins[0][0] > minute:
+            return None
+        return bins[0][1]
+
+
+class OnlineFeatureEngine:
+    """Builds the feature vector of preprocess.process_node one record at a time, so a trained model
+    can be run on live traffic, e.g.
+
+        engine = OnlineFeatureEngine(list(model.X.columns), rtt_bounds)
+        engine.update_radio(ts, node_id, "rssi", -71)
+        features = engine.update_rtt(ts, node_id, scnt, rcnt, rtt)
+        if features is not None:
+            driver.pred(engine.to_frame([features]))
+
+    Records have to arrive in time order per node, a radio bin before the RTT samples of its minute.
+    A sample that the batch processing would drop (lost packet, outlier, no or garbage radio values)
+    returns None and does not count towards the rolling means.
+
+    Args:
+        columns (list): Feature names in the order the model expects them. Hour, weekday, node_id and
+            population are either dummies, e.g. hour_13, or integer codes, see preprocess.encode_categorical.
+            Dummy columns of hours, weekdays, nodes and populations that are not listed are ignored.
+        rtt_bounds (tuple): IQR bounds of the rtt in seconds, see preprocess.iqr_bounds
+        multiplier (int): Window multiplier, see preprocess.create_rtt_means
+        population (Optional[dict]): node_id -> population category, samples of other nodes are dropped
+            like the merge of pipeline.add_population drops them
+        population_categories (Optional[list]): The population categories in the order of their codes,
+            the ascending boundaries of preprocess.categorize_population. Needed for a population column.
+
+    Raises:
+        ValueError: If a column is not one the engine builds
+    """
+
+    def __init__(self, columns: list, rtt_bounds: tuple, multiplier: int = 1, population: Optional[dict] = None,
+                 population_categories: Optional[list] = None):
+        self.columns = list(columns)
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        self.rtt_bounds = rtt_bounds
+        self.windows = [pp.scale_window(window, multiplier) for window in pp.RTT_WINDOWS]
+        self.population = population or {}
+        self.population_codes = {category: code for code, category in enumerate(population_categories or [])}
+        self.nodes = {}
+
+        unknown = [column for column in self.columns if not self.builds(column)]
+        if unknown:
+            raise ValueError(f"The engine does not build the columns {unknown}, they would always be 0")
+        self.uses_population = any(column == "population" or column.startswith("population_")
+                                   for column in self.columns)
+
+    def builds(self, column: str) -> bool:
+        """Whether column is a feature the engine builds"""
+        if column in ["rtt", "node_id", "hour", "weekday", *RADIO_KEYS]:
+            return True
+        if column in [f"rtt_{window}_mean" for window in self.windows]:
+            return True
+        if column == "population":
+            return bool(self.population_codes) and set(self.population.values()) <= set(self.population_codes)
+        prefix, _, value = column.rpartition("_")
+        if prefix == "hour":
+            return value.isdigit() and int(value) < 24
+        if prefix == "weekday":
+            return value in pp.WEEKDAYS
+        if prefix == "node_id":
+            return value.isdigit()
+        if prefix == "population":
+            return value in set(map(str, self.population.values()))
+        return False
+
+    def node(self, node_id: int) -> NodeState:
+        if node_id not in self.nodes:
+            self.nodes[node_id] = NodeState(self.windows)
+        return self.nodes[node_id]
+
+    def update_radio(self, ts, node_id: int, metadata_key: str, value: float) -> None:
+        """Consumes a 1 minute radio bin
+
+        Args:
+            ts: Timestamp of the bin
+            node_id (int): Node of the bin
+            metadata_key (str): "rssi", "rsrq" or "rsrp"
+            value (float): The binned value
+        """
+        # A missing value carries the previous bin forward, like build_bin_timeline does
+        if value is None or np.isnan(value):
+            return
+        minute = pd.Timestamp(ts).floor("min").value
+        self.node(node_id).add_bin(minute, metadata_key, value)
+
+    def update_rtt(self, ts, node_id: int, scnt: int, rcnt: int, rtt: float) -> Optional[np.ndarray]:
+        """Consumes a 1 second RTT sample
+
+        Args:
+            ts: Timestamp of the sample
+            node_id (int): Node of the sample
+            scnt (int): Packets sent
+            rcnt (int): Packets received
+            rtt (float): Round trip time in seconds
+
+        Returns:
+            Optional[np.ndarray]: The features in the order of columns, None if the sample is dropped
+        """
+        if scnt != 1 or rcnt != 1:
+            return None
+        lower_bound, upper_bound = self.rtt_bounds
+        if not lower_bound < rtt < upper_bound:
+            return None
+
+        if self.uses_population and node_id not in self.population:
+            return None
+
+        ts = pd.Timestamp(ts)
+        state = self.node(node_id)
+        minute = ts.floor("min").value
+        features = {}
+        for key in RADIO_KEYS:
+            value = state.radio_value(key, minute)
+            if value is None:
+                return None
+            # filter_interval truncates the bins to integers before checking them
+            value = int(value)
+            lower, upper = pp.RADIO_BOUNDS[f"bin_{key}"]
+            if not lower <= value <= upper:
+                return None
+            features[key] = value
+
+        rtt = pp.s_to_ms(rtt)
+        features["rtt"] = rtt
+        features["node_id"] = node_id
+        for window, mean in zip(self.windows, state.means):
+            features[f"rtt_{window}_mean"] = mean.add(ts.value, rtt)
+        features["hour"] = ts.hour
+        features["weekday"] = ts.dayofweek
+        features[f"hour_{ts.hour}"] = True
+        features[f"weekday_{ts.day_name()}"] = True
+        features[f"node_id_{node_id}"] = True
+        if node_id in self.population:
+            features["population"] = self.population_codes.get(self.population[node_id], -1)
+            features[f"population_{self.population[node_id]}"] = True
+
+        vector = np.zeros(len(self.columns))
+        for name, value in features.items():
+            if name in self.index:
+                vector[self.index[name]] = value
+        return vector
+
+    def to_frame(self, vectors: list) -> pd.DataFrame:
+        """Puts feature vectors into a dataframe with the columns the model was trained on"""
+        return pd.DataFrame(np.vstack(vectors), columns=self.columns)
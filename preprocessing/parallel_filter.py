@@ -0,0 +1,70 @@
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+
+CHUNK_SIZE = 1000000
+
+
+def filter_file(input_file, output_file, keep, chunksize=CHUNK_SIZE):
+    """
+    Streams input_file in chunks and writes the rows where keep(chunk) is True to output_file.
+    The rows are written to a temporary file next to the output which is renamed when the whole
+    file is done, so a failed run never leaves a partial output behind. Returns the throughput stats.
+    """
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    start = time.perf_counter()
+    rows_in = 0
+    rows_out = 0
+    try:
+        with open(tmp_file, 'w', newline='') as out:
+            header = True
+            for chunk in pd.read_csv(input_file, chunksize=chunksize):
+                rows_in += len(chunk)
+                chunk = chunk[keep(chunk)]
+                rows_out += len(chunk)
+                chunk.to_csv(out, index=False, header=header)
+                header = False
+            if header:
+                # Empty input, still write the header
+                out.write(','.join(pd.read_csv(input_file, nrows=0).columns) + '\n')
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    seconds = max(time.perf_counter() - start, 1e-9)
+    size = os.path.getsize(input_file)
+    return {
+        "file": os.path.basename(input_file),
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "seconds": seconds,
+        "rows_per_second": rows_in / seconds,
+        "mb_per_second": size / 1e6 / seconds,
+    }
+
+
+def filter_files(jobs, keep, workers=None, chunksize=CHUNK_SIZE):
+    """
+    Filters many files at once on a process pool. jobs is a list of (input_file, output_file) and keep
+    has to be picklable, i.e. a module level function or a functools.partial of one.
+    """
+    stats = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(filter_file, input_file, output_file, keep, chunksize): input_file
+            for input_file, output_file in jobs
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Filtering files"):
+            result = future.result()
+            tqdm.write(format_stats(result))
+            stats.append(result)
+    return sorted(stats, key=lambda result: result["file"])
+
+
+def format_stats(stats):
+    return (f"{stats['file']}: {stats['rows_out']}/{stats['rows_in']} rows kept in {stats['seconds']:.1f}s "
+            f"({stats['rows_per_second']:,.0f} rows/s, {stats['mb_per_second']:.1f} MB/s)")
@@ -0,0 +1,332 @@
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import uuid
+import pandas as pd
+from typing import Optional
+
+import dataset
+import feature_cache
+import preprocess as pp
+
+# The output of every stage is cached as <STAGE_CACHE_DIR>/<key>/data.parquet, the key covers the source and
+# every stage up to and including this one. Pipelines that start with the same stages on the same source share
+# their cached outputs. Entries are evicted like the feature cache, see feature_cache.evict.
+STAGE_CACHE_DIR = os.path.join(feature_cache.CACHE_DIR, "stages")
+MAX_BYTES = feature_cache.MAX_BYTES
+DATA_FILENAME = "data.parquet"
+
+
+def filter_counts(df):
+    # Only keep entries where both scnt and rcnt are 1.
+    return df.loc[(df['scnt'] == 1) & (df['rcnt'] == 1)]
+
+
+def remove_outliers(df, column="rtt"):
+    return pp.remove_outliers_IQR(df, column)
+
+
+def to_ms(df):
+    # Convert the rtt unit from seconds to milliseconds
+    return df.assign(rtt=pp.s_to_ms(df['rtt']))
+
+
+def add_fault(df, quantile=0.90, reference=None):
+    """
+        Labels the rtt above the quantile as a fault. The quantile is taken from the rtt of the reference,
+        the output of another pipeline, e.g. the threshold of node 4144 for node 4120, or from df itself.
+    """
+    threshold = (df if reference is None else reference)["rtt"].quantile(quantile)
+    df['is_fault'] = df['rtt'] > threshold
+    return df
+
+
+def add_population(df, path, minimas, names):
+    """
+        Merges the population of the nodes from path and categorizes it, see preprocess.categorize_population.
+    """
+    population_df = pd.read_csv(path)
+    df = df.merge(population_df[['node_id', 'population']], on='node_id')
+    pp.categorize_population(df, dict(zip(names, minimas)))
+    return df
+
+
+def dropna(df):
+    return df.dropna()
+
+
+# Name -> function(df, **params) returning the output of the stage. A param called "path" is a file the stage
+# reads and a param called "reference" is another pipeline, given as {"source": ..., "stages": [...]}, whose
+# output is passed in its place. Both are part of the cache key, and so are the source of the function and of
+# the modules the stages are written in, see stage_code and modules_code.
+STAGES = {
+    "counts": filter_counts,
+    "outliers": remove_outliers,
+    "ms": to_ms,
+    "fault": add_fault,
+    "population": add_population,
+    "radio": pp.filter_radio_conn_data,
+    "drop": pp.drop_useless_columns,
+    "rtt_means": pp.create_rtt_means,
+    "calendar": pp.add_day_and_hour,
+    "dropna": dropna,
+    "dummies": pp.one_hot_encode,
+    "codes": pp.encode_categorical,
+}
+
+# Name -> version of the stages whose output changed through an external library, e.g. a pandas upgrade that
+# changes a result. Changes to preprocess.py and pipeline.py are covered by modules_code.
+STAGE_VERSIONS = {}
+
+# The modules whose functions the stages call
+STAGE_MODULES = [pp, sys.modules[__name__]]
+
+
+@functools.lru_cache(maxsize=None)
+def stage_code(function) -> str:
+    """The sha256 of the source of a stage function, or of its name if the source is not available
+
+    Args:
+        function: See STAGES
+
+    Returns:
+        str: Hex digest
+    """
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = getattr(function, "__qualname__", repr(function))
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def modules_code() -> str:
+    """The sha256 of the source of STAGE_MODULES. A stage changes through any function it calls, so every stage key
+    changes with a change to any of them.
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for module in STAGE_MODULES:
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+# The stages of the fault threshold, a prefix of node_stages
+THRESHOLD_STAGES = [("counts", {}), ("outliers", {}), ("ms", {})]
+
+
+class Pipeline:
+    """A source and the stages that turn it into a processed dataset, e.g.
+
+        Pipeline("./sep_aggregated/4144_3_months_aggregated.csv", [("counts", {}), ("outliers", {}), ...])
+
+    The output of every stage is cached, run only computes the stages after the last one that is cached.
+    """
+
+    def __init__(self, source: str, stages: list, columns: Optional[list] = pp.PROCESS_COLUMNS,
+                 cache_dir: str = STAGE_CACHE_DIR, max_bytes: int = MAX_BYTES):
+        unknown = [name for name, _ in stages if name not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}, the stages are {list(STAGES)}")
+        self.source = source
+        self.stages = [(name, dict(params)) for name, params in stages]
+        self.columns = columns
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _reference(self, spec: dict) -> "Pipeline":
+        return Pipeline(spec["source"], spec["stages"], spec.get("columns", self.columns), self.cache_dir,
+                        self.max_bytes)
+
+    def keys(self) -> list:
+        """The cache key of the source (first) and of the output of every stage
+
+        Returns:
+            list: Hex digests, one more than there are stages
+        """
+        description = {"source": feature_cache.source_hash(self.source, self.cache_dir), "columns": self.columns}
+        keys = [hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()]
+        for name, params in self.stages:
+            params = dict(params)
+            if "path" in params:
+                params["path"] = feature_cache.source_hash(params["path"], self.cache_dir)
+            if "reference" in params:
+                params["reference"] = self._reference(params["reference"]).keys()[-1]
+            description = {"input": keys[-1], "stage": name, "params": params, "code": stage_code(STAGES[name]),
+                           "modules": modules_code(), "version": STAGE_VERSIONS.get(name, 0)}
+            keys.append(hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest())
+        return keys
+
+    def _load(self, key: str) -> Optional[pd.DataFrame]:
+        path = os.path.join(self.cache_dir, key, DATA_FILENAME)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(os.path.join(self.cache_dir, key, feature_cache.META_FILENAME))
+        except OSError:
+            return None
+        return df
+
+    def _store(self, key: str, df: pd.DataFrame, stage: str) -> None:
+        entry = os.path.join(self.cache_dir, key)
+        # Written next to the entry and renamed, readers never see a partial entry
+        tmp_entry = f"{entry}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_entry)
+        try:
+            df.to_parquet(os.path.join(tmp_entry, DATA_FILENAME))
+            with open(os.path.join(tmp_entry, feature_cache.META_FILENAME), "w") as file:
+                json.dump({"source": os.path.abspath(self.source), "stage": stage}, file)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # Stored by another process in the meantime
+            if not os.path.isdir(entry):
+                raise
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        feature_cache.evict(self.cache_dir, self.max_bytes, keep=key)
+
+    def run(self, verbose: bool = False) -> pd.DataFrame:
+        """Returns the output of the last stage
+
+        Args:
+            verbose (bool): Print the stages that are loaded and computed
+
+        Returns:
+            pd.DataFrame: The processed dataset
+        """
+        keys = self.keys()
+        # The number of stages whose output is cached, the last one is loaded
+        done = len(self.stages)
+        df = None
+        while done > 0:
+            df = self._load(keys[done])
+            if df is not None:
+                break
+            done -= 1
+
+        if df is None:
+            df = dataset.read_frame(self.source, columns=self.columns)
+            # Ensure 'ts' is a datetime type
+            df['ts'] = pd.to_datetime(df['ts'])
+        elif verbose:
+            print(f"Loaded {self.stages[done - 1][0]} of {self.source} from the cache.")
+
+        for index in range(done, len(self.stages)):
+            name, params = self.stages[index]
+            params = dict(params)
+            if "reference" in params:
+                params["reference"] = self._reference(params["reference"]).run(verbose)
+            # The dtypes of the stored output, e.g. is_fault is object after the shift in create_rtt_means and bool
+            # once the last rows are dropped, so the output is the same whether it is computed or loaded
+            df = STAGES[name](df, **params).infer_objects()
+            self._store(keys[index + 1], df, name)
+            if verbose:
+                print(f"Computed {name} of {self.source}.")
+        return df
+
+
+def node_stages(fault: Optional[dict] = None, multiplier: int = 1, encoding: Optional[tuple] = None) -> list:
+    """The stages of the aggregated data of one node, see preprocess.process_node
+
+    Args:
+        fault (Optional[dict]): Params of the fault stage, by default the 0.90 quantile of the node itself
+        multiplier (int): Multiplier of the rtt windows, the interval of the aggregated data in seconds
+        encoding (Optional[tuple]): The last stage, by default dummies of node_id, hour and weekday
+
+    Returns:
+        list: (name, params) of every stage
+    """
+    if encoding is None:
+        encoding = ("dummies", {"str_cols": ["node_id", "weekday"], "dummy_cols": ["hour", "weekday"]})
+    return THRESHOLD_STAGES + [
+        ("fault", fault if fault is not None else {"quantile": 0.90}),
+        ("radio", {}),
+        ("drop", {}),
+        ("rtt_means", {"multiplier": multiplier}),
+        ("calendar", {}),
+        ("dropna", {}),
+        encoding,
+    ]
+
+
+def reference_threshold(node_id: int, quantile: float = 0.90) -> dict:
+    """Params of the fault stage that label with the threshold of another node"""
+    return {"quantile": quantile,
+            "reference": {"source": f"./sep_aggregated/{node_id}_3_months_aggregated.csv", "stages": THRESHOLD_STAGES}}
+
+
+def seperate(categorical: bool) -> list:
+    """Every node on its own, with its own threshold"""
+    node_ids = [4143, 4122, 4127, 4147, 4120, 4144, 4125, 4133, 4138, 4121, 4134]
+    encoding = ("codes", {"columns": ["hour", "weekday"]}) if categorical else None
+    return [(Pipeline(f"./sep_aggregated/{node_id}_3_months_aggregated.csv", node_stages(encoding=encoding)),
+             f"./3_month_data/{node_id}_3_months_aggregated_proc.csv",
+             {"threshold_quantile": 0.90, "nodes": [node_id], "categorical": categorical})
+            for node_id in node_ids]
+
+
+def interval(categorical: bool) -> list:
+    """Node 4144 aggregated over longer intervals, with the threshold of the 1 second data"""
+    encoding = ("codes", {"columns": ["hour", "weekday"]}) if categorical else None
+    return [(Pipeline(f"./interval_aggregated/4144_interval_{multiplier}_3_months_aggregated.csv",
+                      node_stages(reference_threshold(4144), multiplier, encoding)),
+             f"./interval_data/4144_interval_{multiplier}_3_months_aggregated_proc.csv",
+             {"interval": multiplier, "threshold_quantile": 0.90, "nodes": [4144], "categorical": categorical})
+            for multiplier in [2, 3, 4, 5, 10, 15, 30, 60]]
+
+
+def combined(categorical: bool) -> list:
+    """All nodes in one dataset with their population"""
+    population = {"path": "./node_uptime_with_population.csv",
+                  "minimas": [21411, 28632, 35107, 42328],
+                  "names": ["Low", "Mid-Low", "Mid-High", "High"]}
+    if categorical:
+        encoding = ("codes", {"columns": pp.CATEGORICAL_COLUMNS})
+    else:
+        encoding = ("dummies", {"str_cols": ["node_id", "weekday", "population"],
+                                "dummy_cols": ["population", "node_id", "hour", "weekday"]})
+    return [(Pipeline("./oslo_3_month_aggregated.csv", [("population", population)] + node_stages(encoding=encoding)),
+             "./oslo_3_month_aggregated_proc.csv",
+             {"threshold_quantile": 0.90, "categorical": categorical})]
+
+
+def node_for_other(categorical: bool) -> list:
+    """Node 4120 with the threshold of node 4144"""
+    if categorical:
+        encoding = ("codes", {"columns": ["node_id", "hour", "weekday"]})
+    else:
+        encoding = ("dummies", {"str_cols": ["node_id", "weekday"], "dummy_cols": ["node_id", "hour", "weekday"]})
+    return [(Pipeline("./sep_aggregated/4120_3_months_aggregated.csv",
+                      node_stages(reference_threshold(4144), encoding=encoding)),
+             "./4120_3_months_4144_threshold.csv",
+             {"threshold_quantile": 0.90, "nodes": [4120], "threshold_nodes": [4144], "categorical": categorical})]
+
+
+VARIANTS = {
+    "seperate": seperate,
+    "interval": interval,
+    "combined": combined,
+    "node_for_other": node_for_other,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process the aggregated data into the datasets of the experiments")
+    parser.add_argument("variants", nargs="+", choices=list(VARIANTS))
+    parser.add_argument("--categorical", action="store_true",
+                        help="Integer coded population, node_id, hour and weekday instead of dummies")
+    args = parser.parse_args()
+
+    for variant in args.variants:
+        for pipeline, output, params in VARIANTS[variant](args.categorical):
+            print(f"Processing {pipeline.source}")
+            df = pipeline.run(verbose=True)
+            df.to_csv(output, index=False)
+            # The experiments load the features from the cache instead of parsing the csv
+            feature_cache.store_features(output, df, params)
@@ -1,11 +1,35 @@
+import numpy as np
 import pandas as pd 
 
+# Columns of an aggregated file that the processing chain reads. The event columns and their counts
+# are removed by drop_useless_columns anyway, so they are not worth loading.
+PROCESS_COLUMNS = ["ts", "node_id", "scnt", "rcnt", "rtt", "bin_rssi", "bin_rsrq", "bin_rsrp"]
+
+# Rolling windows of create_rtt_means, each one adds a rtt_<window>_mean column
+RTT_WINDOWS = ["2s", "3s", "4s", "5s", "10s", "30s", "1min", "5min", "10min"]
+
+# Valid range of the radio bins, rows outside of it are garbage
+RADIO_BOUNDS = {"bin_rsrp": (-140, -44), "bin_rssi": (-100, -6), "bin_rsrq": (-20, -3)}
+
+# The quotes, parentheses and commas of the ("-71", "-72") tuples in the event columns of older aggregations
+TUPLE_CHARACTERS = str.maketrans("", "", "\"(,)")
+
+# Columns that are either one-hot encoded or kept as integer codes for models with native categorical features
+CATEGORICAL_COLUMNS = ["node_id", "population", "hour", "weekday"]
+
+# Categories of the weekday column in the order of dt.dayofweek
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+USELESS_COLUMNS = ["scnt", "rcnt", "event_rssi", "bin_rssi", "event_rsrq", "bin_rsrq", "event_rsrp", "bin_rsrp", "event_count_rssi", "event_count_rsrq", "event_count_rsrp",
+                   "event_rssi_min", "event_rssi_max", "event_rsrq_min", "event_rsrq_max", "event_rsrp_min", "event_rsrp_max"]
+
 
 def filter_interval(df : pd.DataFrame, column : str, lower_bound : int, upper_bound : int) -> pd.DataFrame:
     """
         This function filters a dataframe column to only contain entries between and inclusive of the lower and upper bounds.
     """
-    df[column] = df[column].apply(lambda x: int(x))
+    # Truncates towards zero like int(), NaN raises
+    df[column] = df[column].astype(np.int64)
     df = df.loc[(lower_bound <= df[column]) & (df[column] <= upper_bound)]
     return df
 
@@ -54,15 +78,19 @@ def get_min_value(tstr):
     return min(nums)
 
 
-def find_avg_rtt_in_timespan(df, window, multiplier=1):
+def min_values(column : pd.Series) -> pd.Series:
     """
-    df: dataframe containing at least ts and rtt.
-        It's important that the df only contains row for a single node.
-    window: 
-        '3s' or '1min' etc ...
-    
+        get_min_value of a whole column, numbers are kept and "-71 -72" strings become their smallest number.
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        return column.copy()
+    return column.astype(str).str.split(" ", expand=True).astype(float).min(axis=1)
+
+
+def scale_window(window, multiplier=1):
+    """
+        Scales a window like '3s' or '1min' by the multiplier, e.g. '3s' becomes '9s' with multiplier 3.
     """
-    df = df.set_index('ts')
     if multiplier != 1:
         if 'min' in window:
             new_window = int(window.replace('min', '')) * multiplier
@@ -70,6 +98,19 @@ def find_avg_rtt_in_timespan(df, window, multiplier=1):
         if 's' in window:
             new_window = int(window.replace('s', '')) * multiplier
             window = f'{new_window}s'
+    return window
+
+
+def find_avg_rtt_in_timespan(df, window, multiplier=1):
+    """
+    df: dataframe containing at least ts and rtt.
+        It's important that the df only contains row for a single node.
+    window: 
+        '3s' or '1min' etc ...
+    
+    """
+    df = df.set_index('ts')
+    window = scale_window(window, multiplier)
 
     df[f'rtt_{window}_mean'] = df['rtt'].rolling(window).mean()
     
@@ -82,12 +123,21 @@ def shift_fault(df):
     df["is_fault"] = df["is_fault"].shift(-1)
     return df
 
-def remove_outliers_IQR(df, column):
+def iqr_bounds(df, column):
     Q1 = df[column].quantile(0.25)
     Q3 = df[column].quantile(0.75)
     IQR = Q3 - Q1
     lower_bound = Q1 - 1.5 * IQR
     upper_bound = Q3 + 1.5 * IQR
+    return lower_bound, upper_bound
+
+
+def remove_outliers_IQR(df, column, bounds=None):
+    """
+        Removes the outliers of a column. The bounds are computed from df unless they are given,
+        e.g. the bounds of an earlier batch of the same node.
+    """
+    lower_bound, upper_bound = bounds if bounds is not None else iqr_bounds(df, column)
             
     df_filtered = df[(df[column] > lower_bound) & (df[column] < upper_bound)]
     return df_filtered
@@ -95,50 +145,202 @@ def remove_outliers_IQR(df, column):
 
 def filter_radio_conn_data(df):
     # Filter away garbage RSSI, RSRQ and RSRP values.
-    df['event_rssi'] = df['event_rssi'].apply(lambda val: "".join(char for char in val if char not in "\"(,)"))
-    df['event_rsrq'] =df['event_rsrq'].apply(lambda val: "".join(char for char in val if char not in "\"(,)"))
-    df['event_rsrp'] = df['event_rsrp'].apply(lambda val: "".join(char for char in val if char not in "\"(,)"))
-    df = filter_interval(df, 'bin_rsrp', -140, -44)
-    df = filter_interval(df, 'bin_rssi', -100, -6)
-    df = filter_interval(df, 'bin_rsrq', -20, -3)
+    for col in ['event_rssi', 'event_rsrq', 'event_rsrp']:
+        # The event columns are not loaded when the columns are projected with PROCESS_COLUMNS,
+        # and newer aggregations store them as numbers instead of tuples
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].str.translate(TUPLE_CHARACTERS)
+    for col, (lower_bound, upper_bound) in RADIO_BOUNDS.items():
+        df = filter_interval(df, col, lower_bound, upper_bound)
     # Use the smallest RSSI, RSRQ and RSRQ values for each entry
-    df['rssi'] = df['bin_rssi'].apply(lambda x: get_min_value(x))
-    df['rsrq'] = df['bin_rsrq'].apply(lambda x: get_min_value(x))
-    df['rsrp'] = df['bin_rsrp'].apply(lambda x: get_min_value(x))
+    df['rssi'] = min_values(df['bin_rssi'])
+    df['rsrq'] = min_values(df['bin_rsrq'])
+    df['rsrp'] = min_values(df['bin_rsrp'])
     return df
 
 
 def categorize_population(df, population_dict):
-    df['population'] = df['population'].apply(lambda x: categorize_column(population_dict, x))
+    """
+        Replaces the population of every row by the category of categorize_column, as a categorical column.
+        Populations below the lowest boundary get the lowest category.
+    """
+    # Ascending boundaries, of equal boundaries categorize_column picks the first one of the dict
+    categories = sorted(enumerate(population_dict.items()), key=lambda item: (item[1][1], -item[0]))
+    names = [name for _, (name, _) in categories]
+    boundaries = [boundary for _, (_, boundary) in categories]
+
+    population = df['population'].to_numpy(dtype=np.float64)
+    codes = np.digitize(population, boundaries) - 1
+    codes[(codes < 0) | np.isnan(population)] = 0
+    df['population'] = pd.Categorical.from_codes(codes, categories=names)
     return df
 
 
+def two_sum(a, b):
+    """
+        a + b as the rounded sum and its rounding error, which add up to the exact sum.
+    """
+    total = a + b
+    b_part = total - a
+    return total, (a - (total - b_part)) + (b - b_part)
+
+
+def compensated_cumsum(values):
+    """
+        The running sums of values, with a 0 first, as pairs (sums, errors) whose sum is a compensated (Kahan)
+        running sum. The values are summed in about sqrt(n) blocks side by side, so only those loops are in python.
+    """
+    n = len(values)
+    width = max(1, int(np.ceil(np.sqrt(n))))
+    blocks = np.zeros(width * width)
+    blocks[:n] = values
+    blocks = blocks.reshape(width, width)
+
+    sums, errors = np.empty_like(blocks), np.empty_like(blocks)
+    total, error = np.zeros(width), np.zeros(width)
+    for column in range(width):
+        total, rounding = two_sum(total, blocks[:, column])
+        error += rounding
+        sums[:, column], errors[:, column] = total, error
+
+    # The running sum of the blocks before every block
+    offsets, offset_errors = np.zeros(width), np.zeros(width)
+    for block in range(1, width):
+        offsets[block], rounding = two_sum(offsets[block - 1], total[block - 1])
+        offset_errors[block] = offset_errors[block - 1] + error[block - 1] + rounding
+    sums, rounding = two_sum(offsets[:, None], sums)
+    errors += offset_errors[:, None] + rounding
+    return (np.concatenate(([0.0], sums.ravel()[:n])), np.concatenate(([0.0], errors.ravel()[:n])))
+
+
+def rolling_means(ts, values, windows):
+    """
+        The means of values over (ts - window, ts] for every window, like rolling(window).mean() on a ts index.
+        ts are the int64 nanoseconds of a single node in ascending order, windows are in nanoseconds.
+        The sums of a window are differences of compensated running sums, see compensated_cumsum. Their error is
+        about 2 eps |sum| + n eps^2 sum(|values|). The means are not bit for bit those of pandas, which sums with
+        Kahan as well, they are within a relative 1e-12 of them.
+    """
+    valid = ~np.isnan(values)
+    sums, errors = compensated_cumsum(np.where(valid, values, 0.0))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(values) + 1)
+
+    means = np.empty((len(windows), len(values)))
+    for i, window in enumerate(windows):
+        start = np.searchsorted(ts, ts - window, side='right')
+        count = counts[end] - counts[start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[i] = ((sums[end] - sums[start]) + (errors[end] - errors[start])) / count
+        means[i, count == 0] = np.nan
+    return means
+
+
 def create_rtt_means(df, multiplier=1):
-    df = df.groupby('node_id').apply(lambda group: shift_fault(group)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "2s", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "3s", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "4s", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "5s", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "10s", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "30s", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "1min", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "5min", multiplier)).reset_index(drop=True)
-    df = df.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, "10min", multiplier)).reset_index(drop=True)
+    """
+        Shifts is_fault of every node one row back (see shift_fault) and adds the rtt_<window>_mean columns of
+        find_avg_rtt_in_timespan for every window of RTT_WINDOWS scaled by the multiplier. All windows of a node
+        are computed in one pass. The rows are sorted by node like groupby('node_id').apply and ts is the first column.
+    """
+    df = df.sort_values('node_id', kind='stable').reset_index(drop=True)
+    df = df[['ts'] + [column for column in df.columns if column != 'ts']]
+    df['is_fault'] = df.groupby('node_id')['is_fault'].shift(-1)
+
+    windows = [scale_window(window, multiplier) for window in RTT_WINDOWS]
+    window_lengths = [pd.Timedelta(window).value for window in windows]
+    ts = df['ts'].to_numpy(dtype='datetime64[ns]').view('i8')
+    rtt = df['rtt'].to_numpy(dtype=np.float64)
+    node_ids = df['node_id'].to_numpy()
+    bounds = [0, *(np.flatnonzero(node_ids[1:] != node_ids[:-1]) + 1), len(df)]
+
+    means = np.empty((len(windows), len(df)))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if np.any(np.diff(ts[start:end]) < 0):
+            raise ValueError(f"The timestamps of node {node_ids[start]} are not sorted")
+        means[:, start:end] = rolling_means(ts[start:end], rtt[start:end], window_lengths)
+    for window, mean in zip(windows, means):
+        df[f'rtt_{window}_mean'] = mean
     return df
 
 
 def add_day_and_hour(df):
-    df['weekday'] = df['ts'].dt.day_name()
-    df['hour'] = df['ts'].apply(lambda x: str(get_hour_from_data_obj(x)))
+    """
+        Adds the weekday of ts as a categorical column and the hour as uint8.
+    """
+    df['weekday'] = pd.Categorical.from_codes(df['ts'].dt.dayofweek, categories=WEEKDAYS)
+    df['hour'] = df['ts'].dt.hour.astype(np.uint8)
     return df
 
 
 def drop_useless_columns(df):
-    df = df.drop(columns=["scnt", "rcnt", "event_rssi", "bin_rssi", "event_rsrq", "bin_rsrq", "event_rsrp", "bin_rsrp", "event_count_rssi", "event_count_rsrq", "event_count_rsrp"])
+    df = df.drop(columns=USELESS_COLUMNS, errors="ignore")
     return df
 
 
 def one_hot_encode(df, str_cols, dummy_cols):
     df = change_col_type_to_str(df, str_cols)
+    for col in dummy_cols:
+        # Dummies for the values that occur, ordered by their text like the dummies of a str column,
+        # e.g. hour_1, hour_10, hour_11 ... hour_2
+        if df[col].dtype != object:
+            values = df[col].astype('category').cat.remove_unused_categories()
+            df[col] = values.cat.reorder_categories(sorted(values.cat.categories, key=str))
     df = pd.get_dummies(df, columns=dummy_cols)
-    return df
\ No newline at end of file
+    return df
+
+
+def encode_categorical(df, columns):
+    """
+        The integer codes of the categorical columns instead of dummies, e.g. for CatBoost, LightGBM and XGBoost which
+        handle categories natively. Categorical columns become their codes (weekday 0 is Monday, population 0 is the
+        lowest category), integer columns like hour and node_id are kept and strings are coded in sorted order.
+    """
+    for col in columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.codes
+        elif df[col].dtype == object:
+            df[col] = pd.Categorical(df[col]).codes
+    return df
+
+
+def process_node(df, rtt_bounds=None, rtt_threshold=None, dummies=True, multiplier=1):
+    """
+        The processing of the aggregated data of one node, the "seperate" variant of pipeline.py.
+        Returns the processed dataframe, the IQR bounds of the rtt in seconds and the fault threshold in
+        milliseconds. Both are computed from df unless they are given. Without dummies hour and weekday are integer
+        codes, see encode_categorical. The multiplier scales the rtt windows, see create_rtt_means.
+    """
+    # Only keep entries where both scnt and rcnt are 1.
+    df = df.loc[(df['scnt'] == 1) & (df['rcnt'] == 1)]
+
+    if rtt_bounds is None:
+        rtt_bounds = iqr_bounds(df, 'rtt')
+    df = remove_outliers_IQR(df, 'rtt', rtt_bounds)
+
+    # Convert the rtt unit from seconds to milliseconds
+    df['rtt'] = df['rtt'].apply(lambda x: s_to_ms(x))
+
+    if rtt_threshold is None:
+        rtt_threshold = df["rtt"].quantile(0.90)
+
+    df['is_fault'] = df['rtt'] > rtt_threshold
+
+    # Ensure 'ts' is a datetime type
+    df['ts'] = pd.to_datetime(df['ts'])
+
+    df = filter_radio_conn_data(df)
+
+    df = drop_useless_columns(df)
+
+    df = create_rtt_means(df, multiplier)
+
+    df = add_day_and_hour(df)
+
+    df.dropna(inplace=True)
+
+    # Finally we can properly convert the categorical data
+    if dummies:
+        df = one_hot_encode(df, ['node_id', 'weekday'], ['hour', 'weekday'])
+    else:
+        df = encode_categorical(df, ['hour', 'weekday'])
+    return df, rtt_bounds, rtt_threshold
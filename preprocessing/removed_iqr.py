@@ -1,8 +1,9 @@
 import pandas as pd
 import preprocess as pp
+import dataset
 
 if __name__ == "__main__":
-    df = pd.read_csv("./oslo_3_month_aggregated.csv")
+    df = dataset.read_frame("./oslo_3_month_aggregated.csv", columns=["scnt", "rcnt", "rtt"])
 
     print("Number of rows before removing outliers:", len(df))
 
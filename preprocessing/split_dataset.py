@@ -33,9 +33,10 @@ def create_distributed_datasets(dir):
             two_week_df = split_data_set_by_time(df, 14)
             two_week_df.to_csv(f"../data/2_week_data/{node_id}_2_week_aggregated_proc.csv", index=False)
 
-def create_centralized_dataset(dir):
+def create_centralized_dataset(dir, node_id_dummies=True):
     """
     This method takes all the 2 week interval files and created a centralized dataset.
+    Without node_id_dummies the node_id column is kept, for models that treat it as a native categorical feature.
     """
     df = None
     for filename in os.listdir(dir):
@@ -47,9 +48,10 @@ def create_centralized_dataset(dir):
                 df = pd.concat([df, pd.read_csv(filepath)], ignore_index=True)
 
     assert df is not None
-    node_id_dummies = pd.get_dummies(df['node_id'], prefix="node_id")
-    df = pd.concat([df, node_id_dummies], axis=1)
-    df = df.drop(columns=['node_id'])
+    if node_id_dummies:
+        dummies = pd.get_dummies(df['node_id'], prefix="node_id")
+        df = pd.concat([df, dummies], axis=1)
+        df = df.drop(columns=['node_id'])
     df.to_csv(dir + "/centralized_2_week_aggregated_proc.csv", index=False)
 
 
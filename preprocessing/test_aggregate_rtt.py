@@ -0,0 +1,113 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from aggregate_rtt import merge_events_to_dataframe, merge_metadata_to_dataframe, filter_and_aggregate, filter_and_aggregate_partitioned
+from dataset import read_dataset
+
+
+@pytest.fixture
+def rtt_df():
+    test_data = {
+    'ts': ['2023-11-01 00:00:10.1', '2023-11-01 00:00:11.2', '2023-11-01 00:00:11.3', '2023-11-01 00:00:12.4', '2023-11-01 00:00:13.5', '2023-11-01 00:00:14.6'],
+    'node_id': [1, 2, 1, 1, 2, 1],
+    'network_id': [2, 2, 2, 2, 2, 2],
+    'rtt' : [0.018055, 0.019393, 0.061758, 0.036384, 0.023214, 0.021111],
+}
+    df = pd.DataFrame(test_data)
+    df['ts'] = pd.to_datetime(df['ts'])
+    df['event_ts'] = df['ts'].dt.floor(freq="s")
+    return df
+
+
+@pytest.fixture
+def event_df():
+    test_data = {
+    'event_ts': ['2023-11-01 00:00:11', '2023-11-01 00:00:11', '2023-11-01 00:00:11', '2023-11-01 00:00:12', '2023-11-01 00:00:13'],
+    'node_id': [1, 1, 2, 1, 2],
+    'network_id': [2, 2, 2, 2, 2],
+    'event_rssi' : [-70, -65, -90, -80, -85],
+}
+    df = pd.DataFrame(test_data)
+    df['event_ts'] = pd.to_datetime(df['event_ts'])
+    return df
+
+
+def test_merge_events(rtt_df, event_df):
+    df = merge_events_to_dataframe(rtt_df, event_df, "event_rssi", "event_count_rssi")
+
+    # The first row of node 1 happens before any of its events
+    assert len(df) == 5
+    assert list(df['rtt']) == [0.019393, 0.061758, 0.036384, 0.023214, 0.021111]
+
+    # Several events in one second are summarized, the last one wins
+    row = df.iloc[1]
+    assert (row['event_rssi'], row['event_count_rssi'], row['event_rssi_min'], row['event_rssi_max']) == (-65, 2, -70, -65)
+
+    # Exact second with one event
+    row = df.iloc[2]
+    assert (row['event_rssi'], row['event_count_rssi'], row['event_rssi_min'], row['event_rssi_max']) == (-80, 1, -80, -80)
+
+
+def test_merge_events_carries_value_per_node(rtt_df, event_df):
+    df = merge_events_to_dataframe(rtt_df, event_df, "event_rssi", "event_count_rssi")
+
+    # Node 1 has no event at 00:00:14, node 2 had a later event which must not leak into node 1
+    row = df.iloc[4]
+    assert row['node_id'] == 1
+    assert (row['event_rssi'], row['event_count_rssi'], row['event_rssi_min'], row['event_rssi_max']) == (-80, 1, -80, -80)
+
+    assert df['event_rssi'].dtype != object
+    assert df['event_count_rssi'].dtype == 'int64'
+
+
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp('2023-11-01 23:00:00')
+    nodes = [4120, 4144]
+    os.makedirs(tmp_path / 'data')
+
+    rtt = []
+    for node_id in nodes:
+        ts = start + pd.to_timedelta(np.arange(0, 7200, 2) + rng.uniform(0, 1, 3600), unit='s').round('us')
+        rtt.append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': 2, 'service_id': 2, 'scnt': 1, 'rcnt': 1, 'rtt': rng.uniform(0.01, 0.05, 3600).round(6)}))
+    pd.concat(rtt).sort_values('ts').to_csv(tmp_path / 'rtt.csv', index=False)
+
+    for metadata_key in ['rssi', 'rsrq', 'rsrp']:
+        events = []
+        bins = []
+        for node_id in nodes:
+            ts = start + pd.to_timedelta(np.sort(rng.uniform(-60, 7200, 500)), unit='s').round('us')
+            events.append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': 2, metadata_key: rng.integers(-100, -10, 500)}))
+            ts = pd.date_range(start - pd.Timedelta(minutes=1), periods=122, freq='min')
+            bins.append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': 2, metadata_key: rng.integers(-100, -10, 122)}))
+        pd.concat(events).sort_values('ts').to_csv(tmp_path / 'data' / f'metadata_{metadata_key}_events.csv', index=False)
+        pd.concat(bins).sort_values('ts').to_csv(tmp_path / 'data' / f'metadata_{metadata_key}_1min_bin.csv', index=False)
+
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize('by_day', [False, True])
+def test_partitioned_matches_in_memory(data_folder, by_day):
+    expected = filter_and_aggregate(pd.read_csv('rtt.csv'), 'data')
+    rows = filter_and_aggregate_partitioned('rtt.csv', 'data', 'aggregated', by_day=by_day, workers=2)
+    df = read_dataset('aggregated')
+
+    assert rows == len(expected)
+    expected = expected.sort_values(['node_id', 'ts']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_one_sweep_matches_one_key_at_a_time(rtt_df, event_df):
+    rsrq_df = event_df.rename(columns={'event_rssi': 'event_rsrq'})
+    rsrq_df['event_rsrq'] = rsrq_df['event_rsrq'] // 5
+    rsrq_df = rsrq_df.iloc[[1, 2, 4]]
+
+    expected = merge_events_to_dataframe(rtt_df, event_df, "event_rssi", "event_count_rssi")
+    expected = merge_events_to_dataframe(expected, rsrq_df, "event_rsrq", "event_count_rsrq")
+    df = merge_metadata_to_dataframe(
+        rtt_df, events=[(event_df, "event_rssi", "event_count_rssi"), (rsrq_df, "event_rsrq", "event_count_rsrq")], bins=[])
+
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
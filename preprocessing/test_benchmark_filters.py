@@ -0,0 +1,42 @@
+import pandas as pd
+from benchmark_filters import FILES, MODE_FILENAME, available, generate, run, same_rows
+
+
+def test_generated_files_have_operator_schemas(tmp_path):
+    rows = generate(str(tmp_path), nodes=3, hours=2, events_per_hour=50, families=["packetloss", "ipaddr"])
+
+    assert rows[MODE_FILENAME] == 3 * 2 * 2
+    assert rows["packetloss_rtt_rawdata_1sec_bins.csv"] == 3 * 2 * 3600
+    assert rows["packetloss_rtt_5min_bins.csv"] == 3 * 2 * 12
+    assert rows["metadata_ipaddr_1min_bin.csv"] == 3 * 2 * 60
+    assert rows["metadata_ipaddr_events.csv"] == 3 * 2 * 50
+
+    for family in ["packetloss", "ipaddr"]:
+        for file_name, _, columns in FILES[family]:
+            df = pd.read_csv(tmp_path / "operator" / file_name)
+            assert list(df.columns) == ["ts", "node_id", "network_id", *columns]
+            assert df["ts"].is_monotonic_increasing
+            assert (df["network_id"] == 2).all()
+    ipaddr = pd.read_csv(tmp_path / "operator" / "metadata_ipaddr_events.csv")
+    assert set(ipaddr["ipaddr_state"]) == {"UP", "DOWN"}
+
+
+def test_run_compares_outputs(tmp_path):
+    generate(str(tmp_path), nodes=3, hours=2, mode_events_per_hour=20, families=["rsrp"])
+    implementations = ["python", "c"] if available("c") else ["python", "python"]
+
+    results = run(str(tmp_path), implementations=implementations)
+
+    assert [(result["family"], result["rows"]) for result in results] == [("rsrp", 3 * 2 * 60 + 3 * 2 * 12)] * 2
+    assert all(result["equal"] and result["peak_rss_mb"] > 0 for result in results)
+    filtered = pd.read_csv(tmp_path / "python" / "metadata_rsrp_1min_bin.csv")
+    assert 0 < len(filtered) < 3 * 2 * 60
+
+
+def test_same_rows_compares_values(tmp_path):
+    pd.DataFrame({"ts": ["2023-11-01 00:00:01.500000"], "node_id": [4120], "rtt": [0.5]}).to_csv(tmp_path / "a.csv", index=False)
+    (tmp_path / "b.csv").write_text("ts,node_id,rtt\n2023-11-01 00:00:01.5,4120,0.500000\n")
+    (tmp_path / "c.csv").write_text("ts,node_id,rtt\n2023-11-01 00:00:01.5,4120,0.6\n")
+
+    assert same_rows(tmp_path / "a.csv", tmp_path / "b.csv")
+    assert not same_rows(tmp_path / "a.csv", tmp_path / "c.csv")
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from filter import build_interval_index, search_bad_periods
+
+try:
+    import cfilters
+except ImportError:
+    pytest.skip("the C filters library is not built, see cfilters.py", allow_module_level=True)
+
+
+def timestamp(seconds):
+    return str(pd.Timestamp('2023-11-01') + pd.Timedelta(seconds=seconds))
+
+
+@pytest.fixture
+def bad_periods():
+    rng = np.random.default_rng(3)
+    bad_periods = []
+    for _ in range(300):
+        start = rng.uniform(0, 10000)
+        bad_periods.append({'node_id': int(rng.integers(0, 5)), 'start_time': timestamp(start), 'end_time': timestamp(start + rng.uniform(0, 200))})
+    return bad_periods
+
+
+def test_timestamps_match_pandas():
+    ts = ['2023-11-01 00:00:10', '2023-11-01 00:00:09.5', '2024-02-29 23:59:59.000001',
+          '1969-12-31 23:59:59.250', '2023-11-01 01:03:03.033443123']
+    assert list(cfilters.to_epoch_ns(np.array(ts, dtype=object))) == [pd.Timestamp(t).value for t in ts]
+    assert list(cfilters.to_epoch_ns(pd.to_datetime(ts, format="ISO8601"))) == [pd.Timestamp(t).value for t in ts]
+
+
+@pytest.mark.parametrize('threads', [1, 4])
+def test_mask_matches_numpy_search(bad_periods, threads):
+    rng = np.random.default_rng(4)
+    chunk = pd.DataFrame({
+    'node_id': rng.integers(0, 7, 5000),
+    'ts': [timestamp(s) for s in rng.uniform(0, 10500, 5000).round(6)],
+})
+    interval_index = build_interval_index(bad_periods)
+
+    expected = search_bad_periods(chunk, interval_index)
+    assert (cfilters.mask_bad_periods(chunk['ts'], chunk['node_id'], interval_index, threads) == expected).all()
+    assert (cfilters.mask_bad_periods(chunk['ts'], chunk['node_id'], bad_periods, threads) == expected).all()
+
+
+def test_read_csv_filters_while_parsing(tmp_path, bad_periods):
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({
+    'ts': [timestamp(s) for s in np.sort(rng.uniform(0, 10500, 2000)).round(6)],
+    'node_id': rng.integers(0, 7, 2000),
+    'network_id': rng.choice([1, 2], 2000),
+    'rtt': rng.uniform(0, 1, 2000).round(6),
+    'state': rng.choice(['UP', 'DOWN'], 2000),
+})
+    df.to_csv(tmp_path / 'events.csv', index=False)
+
+    table = cfilters.read_csv(str(tmp_path / 'events.csv'), bad_periods, network_id=2)
+
+    keep = (df['network_id'] == 2) & ~search_bad_periods(df, build_interval_index(bad_periods))
+    expected = df[keep].reset_index(drop=True)
+    result = cfilters.to_frame(table)
+    assert table.dtype.names == ('ts', 'node_id', 'network_id', 'rtt', 'state')
+    assert (result['ts'] == pd.to_datetime(expected['ts'])).all()
+    assert (result['node_id'] == expected['node_id']).all()
+    assert (result['rtt'] == expected['rtt']).all()
+    # Columns that are not numbers can not be parsed in C
+    assert result['state'].isna().all()
+
+
+def test_read_csv_without_periods_keeps_every_row(tmp_path):
+    pd.DataFrame({'ts': [timestamp(1), timestamp(2)], 'node_id': [1, 2], 'network_id': [2, 2], 'mode': [0, 6]}).to_csv(tmp_path / 'mode.csv', index=False)
+    table = cfilters.read_csv(str(tmp_path / 'mode.csv'))
+    assert list(table['mode']) == [0, 6]
+    assert list(table['node_id']) == [1, 2]
+
+
+def test_read_csv_stops_at_the_end_of_short_lines(tmp_path):
+    with open(tmp_path / 'rtt.csv', 'w') as file:
+        file.write(f'ts,node_id,network_id,rtt\n{timestamp(1)},1,2,0.5\n{timestamp(2)}\n\n{timestamp(3)},3,2,\n{timestamp(4)},4,2,nan\n\n')
+    table = cfilters.read_csv(str(tmp_path / 'rtt.csv'))
+    assert list(table['ts']) == [pd.Timestamp(timestamp(s)) for s in [1, 2, 3, 4]]
+    assert list(table['node_id']) == [1, 0, 3, 4]
+    np.testing.assert_array_equal(table['rtt'], [0.5, np.nan, np.nan, np.nan])
@@ -0,0 +1,96 @@
+import os
+import subprocess
+import numpy as np
+import pandas as pd
+import pytest
+from columnar import read_columnar, read_frame, write_columnar
+
+C_FILTERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "c_filters", "main")
+
+
+@pytest.fixture
+def test_df():
+    test_data = {
+    'ts': ['2023-11-01 00:00:15.270304', '2023-11-01 10:00:00.000001', '2023-11-01 12:00:00.5', '2023-11-02 00:00:00.466253', '2023-11-02 12:00:00'],
+    'node_id': [4120, 4120, 4120, 4144, 4144],
+    'network_id': [2, 2, 2, 2, 2],
+    'service_id': [2, 2, 2, 2, 2],
+    'scnt': [1, 1, 1, 1, 0],
+    'rcnt': [1, 1, 0, 1, 0],
+    'rtt': [0.018055, 0.019393, 0.061758, 0.036384, 0.023214],
+}
+    return pd.DataFrame(test_data)
+
+
+def test_round_trip(test_df, tmp_path):
+    columns = {
+        'ts': pd.to_datetime(test_df['ts'], format='ISO8601').to_numpy(),
+        'node_id': test_df['node_id'].to_numpy(np.uint16),
+        'rcnt': test_df['rcnt'].to_numpy(np.uint8),
+        'rtt': test_df['rtt'].to_numpy(),
+    }
+    write_columnar(str(tmp_path / 'rtt.bin'), columns)
+
+    result = read_columnar(str(tmp_path / 'rtt.bin'))
+    assert list(result) == list(columns)
+    for name, values in columns.items():
+        assert isinstance(result[name], np.memmap)
+        assert result[name].dtype == values.dtype
+        assert (result[name] == values).all()
+
+
+def test_empty_columns(tmp_path):
+    write_columnar(str(tmp_path / 'empty.bin'), {'ts': np.array([], dtype='datetime64[ns]'), 'rtt': np.array([])})
+    assert len(read_frame(str(tmp_path / 'empty.bin'))) == 0
+
+
+@pytest.mark.skipif(not os.path.exists(C_FILTERS), reason="the C filters are not built")
+def test_matches_csv_output(test_df, tmp_path):
+    for folder in ['operator', 'csv', 'bin']:
+        (tmp_path / folder).mkdir()
+    test_df.to_csv(tmp_path / 'operator' / 'packetloss_rtt_rawdata_1sec_bins.csv', index=False)
+    periods = pd.DataFrame({'node_id': [4120], 'start_time': ['2023-11-01 10:00:00'], 'end_time': ['2023-11-01 11:00:00']})
+    periods.to_csv(tmp_path / 'periods.csv', index=False)
+
+    args = [C_FILTERS, '-f', 'packetloss', '-i', str(tmp_path / 'operator'), '-p', str(tmp_path / 'periods.csv')]
+    subprocess.run(args + ['-o', str(tmp_path / 'csv')], check=False, capture_output=True)
+    subprocess.run(args + ['-o', str(tmp_path / 'bin'), '-b'], check=False, capture_output=True)
+
+    expected = pd.read_csv(tmp_path / 'csv' / 'packetloss_rtt_rawdata_1sec_bins.csv')
+    result = read_frame(str(tmp_path / 'bin' / 'packetloss_rtt_rawdata_1sec_bins.bin'))
+    assert len(result) == 4
+    assert list(result.columns) == [column for column in expected.columns if column != 'network_id']
+    assert (result['ts'] == pd.to_datetime(expected['ts'], format='ISO8601')).all()
+    for column in ['node_id', 'service_id', 'scnt', 'rcnt', 'rtt']:
+        assert (result[column] == expected[column]).all()
+
+
+@pytest.mark.skipif(not os.path.exists(C_FILTERS), reason="the C filters are not built")
+def test_blank_lines_are_skipped(test_df, tmp_path):
+    for folder in ['operator', 'csv']:
+        (tmp_path / folder).mkdir()
+    lines = test_df.to_csv(index=False).splitlines()
+    with open(tmp_path / 'operator' / 'packetloss_rtt_rawdata_1sec_bins.csv', 'w') as file:
+        file.write('\n'.join(lines[:3] + [''] + lines[3:]) + '\n\n')
+    pd.DataFrame(columns=['node_id', 'start_time', 'end_time']).to_csv(tmp_path / 'periods.csv', index=False)
+
+    subprocess.run([C_FILTERS, '-f', 'packetloss', '-i', str(tmp_path / 'operator'), '-p', str(tmp_path / 'periods.csv'),
+                    '-o', str(tmp_path / 'csv')], check=False, capture_output=True)
+
+    result = pd.read_csv(tmp_path / 'csv' / 'packetloss_rtt_rawdata_1sec_bins.csv')
+    assert list(pd.to_datetime(result['ts'], format='ISO8601')) == list(pd.to_datetime(test_df['ts'], format='ISO8601'))
+    pd.testing.assert_frame_equal(result.drop(columns='ts'), test_df.drop(columns='ts'))
+
+
+@pytest.mark.skipif(not os.path.exists(C_FILTERS), reason="the C filters are not built")
+def test_ts_is_written_as_it_was_read(test_df, tmp_path):
+    for folder in ['operator', 'csv']:
+        (tmp_path / folder).mkdir()
+    test_df.to_csv(tmp_path / 'operator' / 'packetloss_rtt_rawdata_1sec_bins.csv', index=False)
+    pd.DataFrame(columns=['node_id', 'start_time', 'end_time']).to_csv(tmp_path / 'periods.csv', index=False)
+
+    subprocess.run([C_FILTERS, '-f', 'packetloss', '-i', str(tmp_path / 'operator'), '-p', str(tmp_path / 'periods.csv'),
+                    '-o', str(tmp_path / 'csv')], check=False, capture_output=True)
+
+    # Whole seconds stay without a fraction and every fraction keeps its number of digits
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'csv' / 'packetloss_rtt_rawdata_1sec_bins.csv'), test_df)
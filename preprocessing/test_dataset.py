@@ -0,0 +1,66 @@
+import os
+import pandas as pd
+import pytest
+from dataset import read_dataset, write_dataset, read_frame, write_frame, csv_to_dataset
+
+
+@pytest.fixture
+def test_df():
+    test_data = {
+    'ts': ['2023-11-01 00:00:15.270304', '2023-11-01 23:59:59.463788', '2023-11-02 00:00:00.466253', '2023-11-01 10:00:00.000001', '2023-11-02 12:00:00.5'],
+    'node_id': [4120, 4120, 4120, 4144, 4144],
+    'network_id': [2, 2, 2, 2, 2],
+    'scnt': [1, 1, 1, 1, 0],
+    'rcnt': [1, 1, 0, 1, 0],
+    'rtt': [0.018055, 0.019393, 0.061758, 0.036384, 0.023214],
+}
+    df = pd.DataFrame(test_data)
+    df['ts'] = pd.to_datetime(df['ts'])
+    return df
+
+
+def test_partitioned_by_node_and_day(test_df, tmp_path):
+    root = str(tmp_path / "rtt")
+    write_dataset(test_df, root)
+    assert sorted(os.listdir(root)) == ['node_id=4120', 'node_id=4144']
+    assert sorted(os.listdir(os.path.join(root, 'node_id=4120'))) == ['day=2023-11-01', 'day=2023-11-02']
+
+
+def test_round_trip_keeps_rows_and_dtypes(test_df, tmp_path):
+    root = str(tmp_path / "rtt")
+    write_dataset(test_df, root)
+    df = read_dataset(root)
+    assert list(df.columns) == list(test_df.columns)
+    assert df['node_id'].dtype == 'uint16'
+    assert df['scnt'].dtype == 'uint16'
+    assert df['ts'].dtype == 'datetime64[ns]'
+    pd.testing.assert_series_equal(df['rtt'], test_df['rtt'])
+
+
+def test_projection_and_node_filter(test_df, tmp_path):
+    root = str(tmp_path / "rtt")
+    write_dataset(test_df, root)
+    df = read_dataset(root, columns=['ts', 'rtt'], node_ids=[4144])
+    assert list(df.columns) == ['ts', 'rtt']
+    assert list(df['rtt']) == [0.036384, 0.023214]
+
+
+def test_append_and_time_filter(test_df, tmp_path):
+    root = str(tmp_path / "rtt")
+    write_dataset(test_df.iloc[:3], root)
+    write_dataset(test_df.iloc[3:], root)
+    assert len(read_dataset(root)) == 5
+    df = read_dataset(root, start='2023-11-02', end='2023-11-02 12:00:00')
+    assert list(df['rtt']) == [0.061758]
+
+
+def test_dataset_is_preferred_over_csv(test_df, tmp_path):
+    csv_path = str(tmp_path / "rtt.csv")
+    write_frame(test_df, csv_path)
+    csv_df = read_frame(csv_path, columns=['ts', 'node_id', 'rtt'])
+    assert list(csv_df.columns) == ['ts', 'node_id', 'rtt']
+
+    csv_to_dataset(csv_path, chunksize=2)
+    os.remove(csv_path)
+    df = read_frame(csv_path, columns=['ts', 'node_id', 'rtt'])
+    pd.testing.assert_frame_equal(df, csv_df)
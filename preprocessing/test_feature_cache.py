@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import feature_cache
+
+
+@pytest.fixture
+def proc_df():
+    return pd.DataFrame({
+        'ts': ['2023-11-01 00:00:00', '2023-11-01 00:00:01', '2023-11-01 00:00:02', '2023-11-01 00:00:03'],
+        'rtt': [18.055, 19.393, 61.758, 36.384],
+        'rtt_mean_10': [np.nan, 18.724, 33.068, 39.178],
+        'node_id_4120': [True, True, False, False],
+        'hour': [0, 0, 0, 0],
+        'is_fault': [False, False, True, False],
+    })
+
+
+@pytest.fixture
+def proc_csv(proc_df, tmp_path):
+    path = str(tmp_path / 'data_proc.csv')
+    proc_df.to_csv(path, index=False)
+    return path
+
+
+def test_load_features(proc_df, proc_csv, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    X, y = feature_cache.load_features(proc_csv, cache_dir=cache_dir)
+
+    assert list(X.columns) == ['rtt', 'rtt_mean_10', 'node_id_4120', 'hour']
+    assert (X.dtypes == np.float32).all()
+    assert y.dtype == bool
+    assert y.tolist() == [False, True, False]
+    np.testing.assert_array_equal(X.to_numpy(), proc_df.iloc[1:, 1:5].to_numpy(np.float32))
+
+    # The second load does not read the csv
+    monkeypatch.setattr(feature_cache.dataset, 'read_frame', lambda path: pytest.fail("read the csv again"))
+    cached_X, cached_y = feature_cache.load_features(proc_csv, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(cached_X, X)
+    pd.testing.assert_series_equal(cached_y, y)
+
+
+def test_changed_source_is_rebuilt(proc_df, proc_csv, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    X, _ = feature_cache.load_features(proc_csv, cache_dir=cache_dir)
+
+    proc_df['rtt'] = proc_df['rtt'] * 2
+    proc_df.to_csv(proc_csv, index=False)
+    os.utime(proc_csv, ns=(0, 0))
+    changed_X, _ = feature_cache.load_features(proc_csv, cache_dir=cache_dir)
+
+    np.testing.assert_allclose(changed_X['rtt'], X['rtt'] * 2)
+
+
+def test_params_are_part_of_the_key(proc_csv, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    calls = []
+
+    def build(multiplier):
+        calls.append(multiplier)
+        return pd.DataFrame({'rtt': [1.0 * multiplier]}), pd.Series([True], name='is_fault')
+
+    for multiplier in [1, 2, 1, 2]:
+        X, _ = feature_cache.cached_features([proc_csv], {'interval': multiplier}, lambda: build(multiplier),
+                                             cache_dir=cache_dir)
+        assert X['rtt'].tolist() == [multiplier]
+    assert calls == [1, 2]
+
+
+def test_missing_drop_columns(proc_df):
+    # The csv index is optional, every other column to drop must be there
+    X, _ = feature_cache.split_features(proc_df.assign(**{'Unnamed: 0': range(len(proc_df))}))
+    assert list(X.columns) == ['rtt', 'rtt_mean_10', 'node_id_4120', 'hour']
+    with pytest.raises(KeyError):
+        feature_cache.split_features(proc_df, drop_columns=['Unnamed: 0', 'is_fault', 'ts', 'rssi'])
+
+
+def test_least_recently_used_is_evicted(proc_df, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    X, y = feature_cache.split_features(proc_df)
+    feature_cache.store('a', X, y, cache_dir=cache_dir)
+    entry_size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(cache_dir, 'a')))
+    max_bytes = 2 * entry_size
+
+    feature_cache.store('b', X, y, cache_dir=cache_dir, max_bytes=max_bytes)
+    os.utime(os.path.join(cache_dir, 'a', 'meta.json'), (1, 1))
+    os.utime(os.path.join(cache_dir, 'b', 'meta.json'), (2, 2))
+    # Using a makes b the least recently used entry
+    assert feature_cache.load('a', cache_dir) is not None
+    feature_cache.store('c', X, y, cache_dir=cache_dir, max_bytes=max_bytes)
+
+    assert feature_cache.load('b', cache_dir) is None
+    assert feature_cache.load('a', cache_dir) is not None
+    assert feature_cache.load('c', cache_dir) is not None
+
+
+def test_store_features(proc_df, proc_csv, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    feature_cache.store_features(proc_csv, proc_df, {'threshold_quantile': 0.9}, cache_dir=cache_dir)
+
+    monkeypatch.setattr(feature_cache.dataset, 'read_frame', lambda path: pytest.fail("read the csv"))
+    X, y = feature_cache.load_features(proc_csv, cache_dir=cache_dir)
+    assert len(X) == len(y) == 3
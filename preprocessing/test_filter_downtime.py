@@ -0,0 +1,202 @@
+import os
+import pickle
+import subprocess
+import numpy as np
+import pandas as pd
+import pytest
+from collections import defaultdict
+import filter
+from filter import (PeriodMask, build_interval_index, file_hash, in_bad_period, pair_mode_events, load_bad_time_periods,
+                    periods_filename)
+
+C_FILTERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "c_filters", "main")
+
+
+def timestamp(seconds):
+    return str(pd.Timestamp('2023-11-01') + pd.Timedelta(seconds=seconds))
+
+
+@pytest.fixture
+def bad_periods():
+    return [
+        {'node_id': 1, 'start_time': timestamp(10), 'end_time': timestamp(20)},
+        {'node_id': 1, 'start_time': timestamp(15), 'end_time': timestamp(25)},
+        {'node_id': 1, 'start_time': timestamp(40), 'end_time': timestamp(50)},
+        {'node_id': 2, 'start_time': timestamp(0), 'end_time': timestamp(5)},
+        {'node_id': 2, 'start_time': timestamp(30), 'end_time': timestamp(30)},
+    ]
+
+
+def test_overlapping_periods_are_merged(bad_periods):
+    interval_index = build_interval_index(bad_periods)
+    starts, ends = interval_index[1]
+    assert list(starts) == list(pd.to_datetime([timestamp(10), timestamp(40)]))
+    assert list(ends) == list(pd.to_datetime([timestamp(25), timestamp(50)]))
+    # Empty periods can never contain a row
+    assert len(interval_index[2][0]) == 1
+
+
+def test_bounds_are_half_open(bad_periods):
+    chunk = pd.DataFrame({
+        'node_id': [1, 1, 1, 1, 2, 3],
+        'ts': [timestamp(9.5), timestamp(10), timestamp(24.999999), timestamp(25), timestamp(0), timestamp(12)],
+    })
+    assert list(in_bad_period(chunk, build_interval_index(bad_periods))) == [False, True, True, False, True, False]
+
+
+def test_matches_period_by_period_filter():
+    rng = np.random.default_rng(0)
+    bad_periods = []
+    for _ in range(300):
+        start = rng.uniform(0, 10000)
+        bad_periods.append({'node_id': int(rng.integers(0, 5)), 'start_time': timestamp(start), 'end_time': timestamp(start + rng.uniform(0, 200))})
+    chunk = pd.DataFrame({
+        'node_id': rng.integers(0, 6, 5000),
+        'ts': [timestamp(s) for s in rng.uniform(0, 10500, 5000).round(6)],
+    })
+
+    expected = np.zeros(len(chunk), dtype=bool)
+    ts = pd.to_datetime(chunk["ts"], format="ISO8601")
+    for period in bad_periods:
+        expected |= ((chunk["node_id"] == period["node_id"])
+                     & (ts >= pd.Timestamp(period["start_time"]))
+                     & (ts < pd.Timestamp(period["end_time"]))).to_numpy()
+
+    assert (in_bad_period(chunk, build_interval_index(bad_periods)) == expected).all()
+
+
+def find_bad_time_periods_loop(df):
+    # The original row by row implementation
+    bad_periods = []
+    node_dict = defaultdict(list)
+    for _, row in df.iterrows():
+        if row["mode"] == 0 and not node_dict[row["node_id"]]:
+            node_dict[row["node_id"]].append(row["ts"])
+        elif row["mode"] == 6 and node_dict[row["node_id"]]:
+            bad_periods.append({"node_id": row["node_id"], "start_time": node_dict[row["node_id"]].pop(), "end_time": row["ts"]})
+    return bad_periods
+
+
+@pytest.fixture
+def mode_df():
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'ts': [timestamp(s) for s in np.sort(rng.uniform(0, 10000, 2000)).round(6)],
+        'node_id': rng.integers(0, 6, 2000),
+        'network_id': 2,
+        'mode': rng.choice([0, 6, 3], 2000),
+    })
+
+
+def test_pair_mode_events_matches_row_by_row(mode_df):
+    assert pair_mode_events(mode_df).to_dict("records") == find_bad_time_periods_loop(mode_df)
+
+
+def test_periods_are_cached_by_hash(mode_df, tmp_path):
+    mode_file = str(tmp_path / 'metadata_mode_events.csv')
+    downtime_path = str(tmp_path / 'downtime')
+    mode_df.to_csv(mode_file, index=False)
+
+    periods = load_bad_time_periods(mode_file, downtime_path)
+    assert periods == find_bad_time_periods_loop(mode_df)
+    digest = file_hash(mode_file)
+    assert os.listdir(downtime_path) == [f'periods-{digest}.csv']
+    assert load_bad_time_periods(mode_file, downtime_path) == periods
+
+    # The periods of one network do not replace the periods of all networks
+    mode_df.loc[mode_df.index % 2 == 0, 'network_id'] = 1
+    mode_df.to_csv(mode_file, index=False)
+    digest = file_hash(mode_file)
+    network_periods = load_bad_time_periods(mode_file, downtime_path, network_id=2)
+    assert network_periods == find_bad_time_periods_loop(mode_df[mode_df['network_id'] == 2])
+    assert load_bad_time_periods(mode_file, downtime_path) == find_bad_time_periods_loop(mode_df)
+    assert load_bad_time_periods(mode_file, downtime_path, network_id=2) == network_periods
+    assert f'periods-{digest}-network_2.csv' in os.listdir(downtime_path)
+
+    # A changed mode file gets its own periods
+    mode_df.iloc[:1000].to_csv(mode_file, index=False)
+    assert load_bad_time_periods(mode_file, downtime_path) == find_bad_time_periods_loop(mode_df.iloc[:1000])
+
+
+@pytest.fixture
+def mixed_precision():
+    bad_periods = [
+        {'node_id': 1, 'start_time': '2023-11-01 00:00:10.000000', 'end_time': '2023-11-01 00:00:20.5'},
+        {'node_id': 2, 'start_time': '2023-11-01 00:00:10', 'end_time': '2023-11-01 00:00:20.500000'},
+    ]
+    chunk = pd.DataFrame({
+        'node_id': [1, 1, 1, 1, 2, 2, 2, 2],
+        'ts': ['2023-11-01 00:00:09.999999', '2023-11-01 00:00:10', '2023-11-01 00:00:15', '2023-11-01 00:00:20.500000',
+               '2023-11-01 00:00:10.000000', '2023-11-01 00:00:20.499999', '2023-11-01 00:00:20.5', '2023-11-01 00:00:21'],
+    })
+    return build_interval_index(bad_periods), chunk
+
+
+@pytest.mark.parametrize('use_c', [False, True])
+def test_mixed_precision_is_compared_as_instants(mixed_precision, use_c, monkeypatch):
+    if use_c and filter.cfilters is None:
+        pytest.skip("the C filters library is not built, see cfilters.py")
+    if not use_c:
+        monkeypatch.setattr(filter, 'cfilters', None)
+    interval_index, chunk = mixed_precision
+    # The same instants are equal no matter how many fraction digits they are written with
+    assert list(in_bad_period(chunk, interval_index)) == [False, True, True, False, True, True, False, False]
+    assert list(PeriodMask(interval_index, threads=1)(chunk)) == [False, True, True, False, True, True, False, False]
+
+
+def test_period_mask_builds_the_c_index_once(monkeypatch):
+    if filter.cfilters is None:
+        pytest.skip("the C filters library is not built, see cfilters.py")
+    built = []
+    period_index = filter.cfilters.period_index
+    monkeypatch.setattr(filter.cfilters, 'period_index', lambda index: built.append(index) or period_index(index))
+
+    mask = PeriodMask(build_interval_index([{'node_id': 1, 'start_time': timestamp(10), 'end_time': timestamp(20)}]), threads=1)
+    chunk = pd.DataFrame({'node_id': [1, 1], 'ts': [timestamp(5), timestamp(15)]})
+    assert list(mask(chunk)) == [False, True]
+    assert list(mask(chunk)) == [False, True]
+    assert len(built) == 1
+
+    # A pool worker gets the periods without the C index and builds its own
+    unpickled = pickle.loads(pickle.dumps(mask))
+    assert unpickled.periods is None and unpickled.threads == 1
+    assert list(unpickled(chunk)) == [False, True]
+    assert len(built) == 2
+
+
+@pytest.mark.skipif(not os.path.exists(C_FILTERS), reason="the C filters are not built")
+def test_c_filters_only_use_the_periods_of_the_mode_file(tmp_path):
+    operator = tmp_path / 'operator'
+    operator.mkdir()
+    downtime_path = str(tmp_path / 'downtime')
+    packet_loss = pd.DataFrame({
+        'ts': [timestamp(s) for s in [5, 15, 25, 35]],
+        'node_id': 1, 'network_id': 2, 'service_id': 2, 'scnt': 1, 'rcnt': 1, 'rtt': [0.01, 0.02, 0.03, 0.04],
+    })
+    packet_loss.to_csv(operator / 'packetloss_rtt_rawdata_1sec_bins.csv', index=False)
+    # The other files of the packetloss family, the filter fails without them
+    for name in ['packetloss_rtt_rawdata_5min_bins.csv', 'packetloss_rtt_5min_bins.csv']:
+        packet_loss.rename(columns={'rtt': 'rtt_avg'}).to_csv(operator / name, index=False)
+
+    def run_c_filters():
+        result = subprocess.run([C_FILTERS, '-f', 'packetloss', '-i', str(operator), '-o', str(tmp_path), '-d', downtime_path,
+                                 '-j', '1'], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        return list(pd.to_datetime(pd.read_csv(tmp_path / 'packetloss_rtt_rawdata_1sec_bins.csv')['ts']))
+
+    def write_mode_file(start, end):
+        pd.DataFrame({'ts': [timestamp(start), timestamp(end)], 'node_id': 1, 'network_id': 2, 'mode': [0, 6]}).to_csv(
+            operator / 'metadata_mode_events.csv', index=False)
+
+    write_mode_file(10, 20)
+    load_bad_time_periods(str(operator / 'metadata_mode_events.csv'), downtime_path)
+    assert run_c_filters() == [pd.Timestamp(timestamp(s)) for s in [5, 25, 35]]
+
+    # The periods of the old mode file are not used for a new one, they are found in the mode file
+    write_mode_file(30, 40)
+    assert run_c_filters() == [pd.Timestamp(timestamp(s)) for s in [5, 15, 25]]
+
+    # The periods of the current mode file are read instead of the mode file
+    name = periods_filename(str(operator / 'metadata_mode_events.csv'))
+    pd.DataFrame(columns=['node_id', 'start_time', 'end_time']).to_csv(os.path.join(downtime_path, name), index=False)
+    assert run_c_filters() == [pd.Timestamp(timestamp(s)) for s in [5, 15, 25, 35]]
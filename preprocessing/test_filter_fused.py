@@ -0,0 +1,50 @@
+import filecmp
+import numpy as np
+import pandas as pd
+import pytest
+from filter import load_bad_time_periods, build_interval_index
+from filter import filter_csv as filter_downtime
+from filter_network_id import filter_csv as filter_network
+from filter_fused import filter_csv as filter_fused
+
+
+def timestamp(seconds):
+    return str(pd.Timestamp('2023-11-01') + pd.Timedelta(seconds=seconds))
+
+
+@pytest.fixture
+def raw_folder(tmp_path):
+    rng = np.random.default_rng(2)
+    for folder in ['data', 'operator', 'time_filtered', 'fused', 'downtime', 'raw_downtime']:
+        (tmp_path / folder).mkdir()
+
+    mode = pd.DataFrame({
+    'ts': [timestamp(s) for s in np.sort(rng.uniform(0, 3600, 300)).round(6)],
+    'node_id': rng.choice([4120, 4144, 4150], 300),
+    'network_id': rng.choice([1, 2], 300),
+    'mode': rng.choice([0, 6, 3], 300),
+})
+    mode.to_csv(tmp_path / 'data' / 'metadata_mode_events.csv', index=False)
+
+    rtt = pd.DataFrame({
+    'ts': [timestamp(s) for s in np.sort(rng.uniform(0, 3600, 5000)).round(6)],
+    'node_id': rng.choice([4120, 4144, 4150, 4160], 5000),
+    'network_id': rng.choice([1, 2], 5000),
+    'rtt': rng.uniform(0.01, 0.05, 5000).round(6),
+})
+    rtt.to_csv(tmp_path / 'data' / 'packetloss_rtt_rawdata_1sec_bins.csv', index=False)
+    return tmp_path
+
+
+def test_fused_matches_sequence(raw_folder):
+    for name in ['metadata_mode_events.csv', 'packetloss_rtt_rawdata_1sec_bins.csv']:
+        filter_network(str(raw_folder / 'data' / name), str(raw_folder / 'operator' / name))
+    periods = load_bad_time_periods(str(raw_folder / 'operator' / 'metadata_mode_events.csv'), str(raw_folder / 'downtime'))
+    for name in ['metadata_mode_events.csv', 'packetloss_rtt_rawdata_1sec_bins.csv']:
+        filter_downtime(str(raw_folder / 'operator' / name), build_interval_index(periods), str(raw_folder / 'time_filtered' / name))
+
+    raw_periods = load_bad_time_periods(str(raw_folder / 'data' / 'metadata_mode_events.csv'), str(raw_folder / 'raw_downtime'), network_id=2)
+    assert raw_periods == periods
+    for name in ['metadata_mode_events.csv', 'packetloss_rtt_rawdata_1sec_bins.csv']:
+        filter_fused(str(raw_folder / 'data' / name), build_interval_index(raw_periods), str(raw_folder / 'fused' / name))
+        assert filecmp.cmp(raw_folder / 'time_filtered' / name, raw_folder / 'fused' / name, shallow=False)
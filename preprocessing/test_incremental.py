@@ -0,0 +1,153 @@
+import os
+from functools import partial
+import numpy as np
+import pandas as pd
+import pytest
+import dataset
+import preprocess as pp
+from aggregate_rtt import filter_and_aggregate
+import incremental
+from incremental import run, load_state
+
+START = pd.Timestamp('2023-11-01 10:00:00')
+SPLIT = START + pd.Timedelta(hours=1)
+NODES = [4120, 4144]
+
+
+def raw_data():
+    rng = np.random.default_rng(3)
+    files = {}
+
+    rtt = []
+    for node_id in NODES:
+        ts = START + pd.to_timedelta(np.arange(0, 7200) + rng.uniform(0, 0.9, 7200), unit='s').round('us')
+        rtt.append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': rng.choice([1, 2], 7200, p=[0.1, 0.9]), 'service_id': 2,
+                                 'scnt': 1, 'rcnt': rng.choice([0, 1], 7200, p=[0.05, 0.95]), 'rtt': rng.uniform(0.01, 0.05, 7200).round(6)}))
+    files['packetloss_rtt_rawdata_1sec_bins.csv'] = pd.concat(rtt)
+
+    # 4120 goes down before the split and is only up again after it
+    files['metadata_mode_events.csv'] = pd.DataFrame({
+    'ts': [START + pd.Timedelta(minutes=m) for m in [5, 8, 50, 65, 80, 85, 90]],
+    'node_id': [4120, 4120, 4120, 4120, 4144, 4144, 4144],
+    'network_id': [2, 2, 2, 2, 2, 2, 1],
+    'mode': [0, 6, 0, 6, 0, 6, 0],
+})
+
+    bounds = {'rssi': (-100, -6), 'rsrq': (-20, -3), 'rsrp': (-140, -44)}
+    for metadata_key, (low, high) in bounds.items():
+        events = []
+        bins = []
+        for node_id in NODES:
+            ts = START + pd.to_timedelta(np.sort(rng.uniform(-60, 7200, 300)), unit='s').round('us')
+            events.append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': 2, metadata_key: rng.integers(low, high, 300)}))
+            ts = pd.date_range(START - pd.Timedelta(minutes=1), periods=122, freq='min')
+            bins.append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': 2, metadata_key: rng.integers(low, high, 122)}))
+        files[f'metadata_{metadata_key}_events.csv'] = pd.concat(events)
+        files[f'metadata_{metadata_key}_1min_bin.csv'] = pd.concat(bins)
+
+    return {name: df.sort_values('ts', kind='stable') for name, df in files.items()}
+
+
+def write_raw(files, end=None):
+    for name, df in files.items():
+        if end is not None:
+            df = df[df['ts'] < end]
+        df.to_csv(os.path.join('data', name), index=False)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    return tmp_path
+
+
+def test_second_run_only_appends_new_rows(workdir):
+    files = raw_data()
+    write_raw(files, end=SPLIT)
+    first = run(NODES)
+    state = load_state()
+    first_proc = {node_id: pd.read_csv(f'3_month_data/{node_id}_3_months_aggregated_proc.csv') for node_id in NODES}
+
+    # Running again without new data does nothing
+    assert set(run(NODES).values()) == {0}
+
+    write_raw(files)
+    second = run(NODES)
+    assert second['packetloss_rtt_rawdata_1sec_bins.csv'] > 0
+    assert first['packetloss_rtt_rawdata_1sec_bins.csv'] + second['packetloss_rtt_rawdata_1sec_bins.csv'] < len(files['packetloss_rtt_rawdata_1sec_bins.csv'])
+
+    # The filtered rows are the rows of network 2 outside the downtime periods
+    rtt = dataset.read_dataset('time_filtered/packetloss_rtt_rawdata_1sec_bins')
+    raw = files['packetloss_rtt_rawdata_1sec_bins.csv']
+    down = ((raw['node_id'] == 4120) & (((raw['ts'] >= START + pd.Timedelta(minutes=5)) & (raw['ts'] < START + pd.Timedelta(minutes=8)))
+                                        | ((raw['ts'] >= START + pd.Timedelta(minutes=50)) & (raw['ts'] < START + pd.Timedelta(minutes=65))))) \
+        | ((raw['node_id'] == 4144) & (raw['ts'] >= START + pd.Timedelta(minutes=80)) & (raw['ts'] < START + pd.Timedelta(minutes=85)))
+    expected = raw[(raw['network_id'] == 2) & ~down].sort_values(['node_id', 'ts']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(rtt, expected, check_dtype=False)
+
+    for node_id in NODES:
+        # Same as processing everything at once with the thresholds of the first run
+        aggregated = filter_and_aggregate(rtt[rtt['node_id'] == node_id].copy(), 'time_filtered')
+        node_state = state['processed'][str(node_id)]
+        expected, _, _ = pp.process_node(aggregated[pp.PROCESS_COLUMNS], tuple(node_state['rtt_bounds']), node_state['rtt_threshold'])
+        expected = expected.reset_index(drop=True)
+        # node_id is a string after one_hot_encode, read back from the csv it is a number again
+        expected['node_id'] = expected['node_id'].astype(int)
+
+        df = pd.read_csv(f'3_month_data/{node_id}_3_months_aggregated_proc.csv', parse_dates=['ts'])
+        assert len(df) > len(first_proc[node_id])
+        pd.testing.assert_frame_equal(df[expected.columns], expected, check_dtype=False)
+
+
+def outputs():
+    """The filtered, aggregated and processed rows"""
+    return {
+        'filtered': dataset.read_dataset('time_filtered/packetloss_rtt_rawdata_1sec_bins'),
+        'aggregated': dataset.read_dataset('oslo_3_month_aggregated'),
+        **{node_id: pd.read_csv(f'3_month_data/{node_id}_3_months_aggregated_proc.csv') for node_id in NODES},
+    }
+
+
+def fail_on_call(monkeypatch, module, name, call):
+    """Makes the call-th call of module.name raise, as if the run was killed there"""
+    function = getattr(module, name)
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == call:
+            raise KeyboardInterrupt
+        return function(*args, **kwargs)
+    monkeypatch.setattr(module, name, failing)
+
+
+@pytest.mark.parametrize('module, name, call', [
+    # During the ingestion of the second chunk of the rtt file
+    (dataset, 'write_dataset', 2),
+    # After the first node is aggregated
+    (incremental, 'filter_and_aggregate', 2),
+    # After the processed rows of the first node are appended, before the state is saved
+    (incremental, 'publish', 11),
+])
+def test_killed_run_does_not_write_rows_twice(tmp_path, monkeypatch, module, name, call):
+    files = raw_data()
+    results = {}
+    for folder in ['clean', 'killed']:
+        os.makedirs(tmp_path / folder / 'data')
+        monkeypatch.chdir(tmp_path / folder)
+        write_raw(files, end=SPLIT)
+        run(NODES)
+        write_raw(files)
+        if folder == 'killed':
+            with monkeypatch.context() as patched:
+                fail_on_call(patched, module, name, call)
+                patched.setattr(incremental, 'ingest_file', partial(incremental.ingest_file, chunksize=1000))
+                with pytest.raises(KeyboardInterrupt):
+                    run(NODES)
+        run(NODES)
+        results[folder] = outputs()
+
+    for key, df in results['killed'].items():
+        assert not df.duplicated().any()
+        pd.testing.assert_frame_equal(df, results['clean'][key])
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+import preprocess as pp
+from aggregate_rtt import merge_metadata_to_dataframe
+from online_features import OnlineFeatureEngine
+
+START = pd.Timestamp('2023-11-01 23:40:00')
+NODES = [4120, 4144]
+
+
+@pytest.fixture
+def records():
+    rng = np.random.default_rng(4)
+    rtt = []
+    bins = {key: [] for key in ['rssi', 'rsrq', 'rsrp']}
+    ranges = {'rssi': (-105, -5), 'rsrq': (-22, -2), 'rsrp': (-145, -40)}
+    for node_id in NODES:
+        ts = START + pd.to_timedelta(np.arange(0, 2400) + rng.uniform(0, 0.9, 2400), unit='s').round('us')
+        rtt.append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': 2, 'scnt': 1, 'rcnt': rng.choice([0, 1], 2400, p=[0.05, 0.95]),
+                                 'rtt': rng.lognormal(-3.5, 0.4, 2400).round(6)}))
+        for key, (low, high) in ranges.items():
+            ts = pd.date_range(START + pd.Timedelta(minutes=1), periods=40, freq='min') + pd.Timedelta(seconds=1)
+            values = rng.uniform(low, high, 40).round(1)
+            values[5] = np.nan
+            bins[key].append(pd.DataFrame({'ts': ts, 'node_id': node_id, 'network_id': 2, key: values}))
+    return pd.concat(rtt).sort_values('ts', kind='stable'), {key: pd.concat(frames).sort_values('ts') for key, frames in bins.items()}
+
+
+def merged(rtt, bins):
+    """The RTT samples with the radio bins of their minute, the aggregated data process_node takes"""
+    df = rtt.copy()
+    df['bin_ts'] = df['ts'].dt.floor(freq='min')
+    df['event_ts'] = df['ts'].dt.floor(freq='s')
+    bin_frames = []
+    for key, bin_df in bins.items():
+        bin_df = bin_df.rename(columns={'ts': 'bin_ts', key: f'bin_{key}'})
+        bin_df['bin_ts'] = bin_df['bin_ts'].dt.floor(freq='min')
+        bin_frames.append((bin_df, f'bin_{key}'))
+    return merge_metadata_to_dataframe(df, events=[], bins=bin_frames).drop(columns=['bin_ts', 'event_ts'])
+
+
+def stream(engine, rtt, bins):
+    """Replays everything in time order, a bin at the start of its minute. Returns the emitted features and their ts."""
+    records = [(ts.floor('min'), 0, ('radio', node_id, key, value)) for key, bin_df in bins.items() for ts, node_id, value in zip(bin_df['ts'], bin_df['node_id'], bin_df[key])]
+    records += [(ts, 1, ('rtt', row)) for ts, row in zip(rtt['ts'], rtt.itertuples())]
+    records.sort(key=lambda record: record[:2])
+
+    emitted = []
+    emitted_ts = []
+    for ts, _, record in records:
+        if record[0] == 'radio':
+            engine.update_radio(ts, *record[1:])
+            continue
+        row = record[1]
+        features = engine.update_rtt(ts, row.node_id, row.scnt, row.rcnt, row.rtt)
+        if features is not None:
+            emitted.append(features)
+            emitted_ts.append(ts)
+    return emitted, emitted_ts
+
+
+@pytest.mark.parametrize('dummies', [True, False])
+@pytest.mark.parametrize('multiplier', [1, 3])
+def test_streaming_matches_process_node(records, multiplier, dummies):
+    rtt, bins = records
+    rtt_bounds = pp.iqr_bounds(rtt, 'rtt')
+    df = merged(rtt, bins)
+    for node_id in NODES:
+        expected, _, _ = pp.process_node(df[df['node_id'] == node_id][pp.PROCESS_COLUMNS].copy(), rtt_bounds,
+                                         dummies=dummies, multiplier=multiplier)
+        expected = expected.sort_values('ts').reset_index(drop=True)
+        columns = [column for column in expected.columns if column not in ['ts', 'is_fault']]
+        assert ('hour' in columns) != dummies
+
+        engine = OnlineFeatureEngine(columns, rtt_bounds, multiplier)
+        emitted, emitted_ts = stream(engine, rtt[rtt['node_id'] == node_id],
+                                     {key: bin_df[bin_df['node_id'] == node_id] for key, bin_df in bins.items()})
+
+        # The last sample of the node has no label yet, process_node drops it
+        assert len(emitted) == len(expected) + 1
+        assert emitted_ts[:-1] == list(expected['ts'])
+        result = engine.to_frame(emitted[:-1])
+        assert result.filter(like='_mean').columns.tolist() == [f'rtt_{pp.scale_window(window, multiplier)}_mean' for window in pp.RTT_WINDOWS]
+        pd.testing.assert_frame_equal(result, expected[columns].astype(float), check_exact=False, rtol=1e-9)
+
+
+def test_population_codes():
+    engine = OnlineFeatureEngine(['rtt', 'node_id', 'population', 'population_High', 'hour', 'weekday'], (0.0, 1.0),
+                                 population={4120: 'High', 4144: 'Low'}, population_categories=['Low', 'High'])
+    for node_id in [4120, 4144, 4147]:
+        for key, value in [('rssi', -70), ('rsrq', -10), ('rsrp', -90)]:
+            engine.update_radio(START, node_id, key, value)
+    ts = START + pd.Timedelta(seconds=1)
+    assert list(engine.update_rtt(ts, 4120, 1, 1, 0.02)) == [20.0, 4120, 1, 1, 23, 2]
+    assert list(engine.update_rtt(ts, 4144, 1, 1, 0.02)) == [20.0, 4144, 0, 0, 23, 2]
+    # Like the merge with the populations, nodes without one are dropped
+    assert engine.update_rtt(ts, 4147, 1, 1, 0.02) is None
+
+
+@pytest.mark.parametrize('columns, params', [
+    (['rtt', 'service_id'], {}),
+    (['rtt', 'hour_24'], {}),
+    (['rtt', 'population'], {'population': {4120: 'High'}}),
+    (['rtt', 'population_Mid'], {'population': {4120: 'High'}, 'population_categories': ['Low', 'High']}),
+])
+def test_columns_it_does_not_build(columns, params):
+    with pytest.raises(ValueError):
+        OnlineFeatureEngine(columns, (0.0, 1.0), **params)
@@ -0,0 +1,60 @@
+import os
+import pandas as pd
+import pytest
+from functools import partial
+from parallel_filter import filter_file, filter_files
+from filter_network_id import network_mask
+from filter import keep_rows, build_interval_index
+
+
+@pytest.fixture
+def raw_files(tmp_path):
+    test_data = {
+    'ts': ['2023-11-01 00:00:10.1', '2023-11-01 00:00:11.2', '2023-11-01 00:00:11.3', '2023-11-01 00:00:12.4', '2023-11-01 00:00:13.5', '2023-11-01 00:00:14.6'],
+    'node_id': [4120, 4144, 4120, 4120, 4144, 4120],
+    'network_id': [2, 1, 2, 2, 2, 1],
+    'rtt' : [0.018055, 0.019393, 0.061758, 0.036384, 0.023214, 0.021111],
+}
+    df = pd.DataFrame(test_data)
+    files = []
+    for i in range(3):
+        input_file = str(tmp_path / f'rtt_{i}.csv')
+        df.iloc[i:].to_csv(input_file, index=False)
+        files.append((input_file, str(tmp_path / f'filtered_{i}.csv')))
+    return df, files
+
+
+def test_header_written_once(raw_files):
+    df, [(input_file, output_file), *_] = raw_files
+    stats = filter_file(input_file, output_file, network_mask, chunksize=2)
+
+    out = pd.read_csv(output_file)
+    pd.testing.assert_frame_equal(out, df[df['network_id'] == 2].reset_index(drop=True))
+    assert (stats['rows_in'], stats['rows_out']) == (6, 4)
+    assert stats['rows_per_second'] > 0 and stats['mb_per_second'] > 0
+
+
+def test_failed_file_leaves_no_output(raw_files, tmp_path):
+    _, [(input_file, output_file), *_] = raw_files
+
+    def fail(chunk):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        filter_file(input_file, output_file, fail, chunksize=2)
+    assert not os.path.exists(output_file)
+    assert sorted(os.listdir(tmp_path)) == ['rtt_0.csv', 'rtt_1.csv', 'rtt_2.csv']
+
+
+def test_parallel_matches_sequential(raw_files):
+    _, jobs = raw_files
+    interval_index = build_interval_index([{"node_id": 4120, "start_time": "2023-11-01 00:00:11", "end_time": "2023-11-01 00:00:12.4"}])
+    keep = partial(keep_rows, interval_index=interval_index)
+
+    stats = filter_files(jobs, keep, workers=2, chunksize=2)
+    assert [result['file'] for result in stats] == ['rtt_0.csv', 'rtt_1.csv', 'rtt_2.csv']
+
+    for input_file, output_file in jobs:
+        df = pd.read_csv(input_file)
+        expected = df[keep(df)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(pd.read_csv(output_file), expected)
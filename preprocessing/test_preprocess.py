@@ -1,6 +1,7 @@
+import numpy as np
 import pandas as pd
 import pytest
-from preprocess import shift_fault, find_avg_rtt_in_timespan
+from preprocess import RTT_WINDOWS, add_day_and_hour, categorize_column, categorize_population, create_rtt_means, encode_categorical, filter_radio_conn_data, one_hot_encode, get_min_value, min_values, shift_fault, find_avg_rtt_in_timespan
 
 
 @pytest.fixture
@@ -52,3 +53,100 @@ def test_rtt_aggregation(test_df):
 
     # Fifth is similar to fourth. It own RTT plus the previous two.
     assert means[4] == mean(raw_rtts[2:5])
+
+
+@pytest.mark.parametrize('multiplier', [1, 3])
+def test_rtt_means_match_per_node_windows(multiplier):
+    rng = np.random.default_rng(5)
+    frames = []
+    for node_id in [4144, 4120]:
+        seconds = np.sort(rng.uniform(0, 3000, 2000)).round(3)
+        rtt = rng.uniform(10, 80, 2000).round(3)
+        # Runs of the same value and duplicate timestamps
+        rtt[100:150] = 20.0
+        seconds[300:303] = seconds[300]
+        frames.append(pd.DataFrame({
+        'node_id': node_id,
+        'rtt': rtt,
+        'ts': pd.Timestamp('2023-11-01') + pd.to_timedelta(seconds, unit='s'),
+        'is_fault': rtt > 70,
+    }))
+    df = pd.concat(frames).sort_values('ts', kind='stable')
+
+    expected = df.groupby('node_id').apply(lambda group: shift_fault(group)).reset_index(drop=True)
+    for window in RTT_WINDOWS:
+        expected = expected.groupby('node_id').apply(lambda group: find_avg_rtt_in_timespan(group, window, multiplier)).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(create_rtt_means(df, multiplier), expected, check_exact=False, rtol=1e-12)
+
+
+def test_rtt_means_need_sorted_timestamps(test_df):
+    with pytest.raises(ValueError):
+        create_rtt_means(test_df.iloc[::-1])
+
+
+def test_radio_cleaning():
+    df = pd.DataFrame({
+    'bin_rssi': [-71.7, -120.0, -50.2, -6.9],
+    'bin_rsrq': [-10.0, -10.0, -3.5, -20.2],
+    'bin_rsrp': [-90, -90, -44, -140],
+    'event_rssi': ['("-71", "-72")', '("-1", "-2")', '("-50",)', '("-7", "-6")'],
+})
+    df = filter_radio_conn_data(df)
+
+    # Truncated towards zero before the bounds are checked, -120 is below the lowest rssi
+    assert list(df['rssi']) == [-71, -50, -6]
+    assert list(df['rsrq']) == [-10, -3, -20]
+    assert list(df['rsrp']) == [-90, -44, -140]
+    assert df['rssi'].dtype == np.int64
+    assert list(df['event_rssi']) == ['-71 -72', '-50', '-7 -6']
+
+
+def test_min_values_match_get_min_value():
+    column = pd.Series(['-71 -72.5', '3', '-1 -4 2'], dtype=object)
+    assert list(min_values(column)) == [get_min_value(value) for value in column]
+    assert list(min_values(pd.Series([-71, -3]))) == [-71, -3]
+
+
+def test_day_and_hour(test_df):
+    test_df['ts'] = test_df['ts'] + pd.to_timedelta([0, 1, 2, 3, 4], unit='D') + pd.Timedelta(hours=13)
+    df = add_day_and_hour(test_df)
+
+    assert df['hour'].dtype == np.uint8 and (df['hour'] == 13).all()
+    assert list(df['weekday']) == ['Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    assert isinstance(df['weekday'].dtype, pd.CategoricalDtype)
+
+
+def test_dummies_keep_names_and_order(test_df):
+    test_df['ts'] = test_df['ts'] + pd.to_timedelta([2, 10, 1, 2, 23], unit='h')
+    df = one_hot_encode(add_day_and_hour(test_df), ['node_id', 'weekday'], ['hour', 'weekday'])
+
+    dummies = [column for column in df.columns if column.startswith(('hour_', 'weekday_'))]
+    assert dummies == ['hour_1', 'hour_10', 'hour_2', 'hour_23', 'weekday_Wednesday']
+
+
+def test_population_categories():
+    population_dict = {'Low': 21411, 'Mid-Low': 28632, 'Mid-High': 35107, 'High': 42328}
+    populations = [100, 21411, 28631, 35107, 50000, np.nan]
+    df = pd.DataFrame({'population': populations})
+
+    result = categorize_population(df, population_dict)
+
+    assert result is df
+    assert list(df['population']) == [categorize_column(population_dict, population) for population in populations]
+    assert list(df['population']) == ['Low', 'Low', 'Low', 'Mid-High', 'High', 'Low']
+
+
+def test_encode_categorical(test_df):
+    test_df['ts'] = test_df['ts'] + pd.to_timedelta([0, 1, 2, 3, 4], unit='D')
+    test_df['population'] = [100, 30000, 50000, 30000, 100]
+    df = categorize_population(add_day_and_hour(test_df), {'Low': 0, 'Mid': 25000, 'High': 45000})
+
+    df = encode_categorical(df, ['node_id', 'population', 'hour', 'weekday'])
+
+    # Monday is 0, the categories of the population are in the order of their boundaries
+    assert list(df['weekday']) == [2, 3, 4, 5, 6]
+    assert list(df['population']) == [0, 1, 2, 1, 0]
+    assert list(df['hour']) == [0] * 5 and df['hour'].dtype == np.uint8
+    assert list(df['node_id']) == [1] * 5
+    assert not any(column.startswith(('hour_', 'weekday_')) for column in df.columns)